@@ -1,12 +1,13 @@
 from flask import Flask, jsonify, render_template
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-from config import JWT_SECRET_KEY, JWT_ACCESS_TOKEN_EXPIRES, CORS_ORIGINS
+from config import JWT_SECRET_KEY, JWT_ACCESS_TOKEN_EXPIRES, CORS_ORIGINS, VOTE_JOURNAL_ENABLED
 from routes.user_routes import user_bp
 from routes.admin_routes import admin_bp
+from utils.admission import init_admission
 
 
-def create_app() -> Flask:
+def create_app(open_journal: bool = True) -> Flask:
     app = Flask(__name__, template_folder="templates", static_folder="static")
 
     # JWT Configuration
@@ -17,10 +18,22 @@ def create_app() -> Flask:
     # CORS
     CORS(app, resources={r"/api/*": {"origins": CORS_ORIGINS}})
 
+    # Load shedding before any request reaches MongoDB
+    init_admission(app)
+
     # Blueprints
     app.register_blueprint(user_bp)
     app.register_blueprint(admin_bp)
 
+    # Replay votes left in the local journal by a crashed worker
+    if VOTE_JOURNAL_ENABLED and open_journal:
+        from utils.vote_journal import get_vote_journal
+        get_vote_journal()
+
+    # Build "has voted" filters for active elections in the background
+    from utils.voted_filter import warm_filters
+    warm_filters()
+
     # Template routes
     @app.route("/")
     def index():
@@ -111,7 +124,9 @@ if __name__ == "__main__":
         print("Make sure MongoDB is running on mongodb://localhost:27017")
         print("=" * 50 + "\n")
     
-    app = create_app()
+    # With debug=True this process only runs the reloader; the child it starts serves and opens the journal
+    from werkzeug.serving import is_running_from_reloader
+    app = create_app(open_journal=is_running_from_reloader())
     print("Server starting on http://127.0.0.1:5000")
     print("Press Ctrl+C to stop\n")
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,99 @@
+"""
+ASGI entry point for the async serving mode (SERVER_MODE=async).
+The hot user endpoints (login/OTP verification, elections, candidates, vote,
+vote status) are async Quart handlers on the Motor driver, so a request
+waiting on MongoDB or SMTP does not hold an OS thread. Every other route
+(admin API, pages, static files, result streams) is passed to the Flask app,
+which hypercorn runs in its thread pool.
+
+Run with:  python run.py --mode async
+       or: hypercorn "asgi:create_asgi_app()"
+"""
+from quart import Quart, g, request
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from app import create_app
+from routes.async_user_routes import async_user_bp
+from utils.async_auth import init_async_auth
+from utils.admission import classify, controller as admission_controller, enter_route_class, exit_route_class
+from config import ADMISSION_CONTROL_ENABLED, CORS_ORIGINS
+
+
+def _handles(url_map: Map, scope: dict) -> bool:
+    """True if the async app has a route for this request"""
+    if scope["method"] == "OPTIONS":
+        # CORS preflight stays with Flask-CORS
+        return False
+    try:
+        url_map.bind("localhost").match(scope["path"], scope["method"])
+        return True
+    except HTTPException:
+        return False
+
+
+def _init_async_admission(app: Quart) -> None:
+    """The in-flight limits of utils.admission for the async routes"""
+    if not ADMISSION_CONTROL_ENABLED:
+        return
+
+    @app.before_request
+    async def _admit():
+        route_class = classify(request.path)
+        if route_class is None:
+            return None
+        if not admission_controller.try_admit(route_class):
+            retry_after = str(admission_controller.retry_after(route_class))
+            return {"error": "Server is busy. Please retry shortly."}, 503, {"Retry-After": retry_after}
+        g.admission_class = route_class
+        enter_route_class(route_class)
+        return None
+
+    @app.teardown_request
+    async def _release(exc):
+        route_class = g.pop("admission_class", None)
+        if route_class is not None:
+            exit_route_class()
+            admission_controller.release(route_class)
+
+
+def _init_async_cors(app: Quart) -> None:
+    allowed = [origin.strip() for origin in CORS_ORIGINS.split(",")]
+
+    @app.after_request
+    async def _cors(response):
+        origin = request.headers.get("Origin")
+        if origin and ("*" in allowed or origin in allowed):
+            response.headers["Access-Control-Allow-Origin"] = "*" if "*" in allowed else origin
+            response.headers["Vary"] = "Origin"
+        return response
+
+
+def create_asgi_app():
+    flask_app = create_app()
+    init_async_auth(flask_app)
+
+    async_app = Quart(__name__, static_folder=None)
+    _init_async_admission(async_app)
+    _init_async_cors(async_app)
+    async_app.register_blueprint(async_user_bp)
+
+    flask_asgi = AsyncioWSGIMiddleware(flask_app)
+    url_map = async_app.url_map
+
+    async def dispatch(scope, receive, send):
+        if scope["type"] == "lifespan" or (scope["type"] == "http" and _handles(url_map, scope)):
+            await async_app(scope, receive, send)
+        else:
+            await flask_asgi(scope, receive, send)
+
+    return dispatch
+
+
+def serve(host: str = "0.0.0.0", port: int = 5000) -> None:
+    import asyncio
+    from hypercorn.asyncio import serve as hypercorn_serve
+    from hypercorn.config import Config
+    config = Config()
+    config.bind = [f"{host}:{port}"]
+    asyncio.run(hypercorn_serve(create_asgi_app(), config))
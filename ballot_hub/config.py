@@ -9,9 +9,33 @@ JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "super-secret-change-this")
 JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=8)
 
 # App constants
-PASSWORD_HASH_ROUNDS = 12
 AADHAAR_LENGTH = 12
 
+# Password hashing (bcrypt). The cost is calibrated so one hash takes about
+# PASSWORD_HASH_TARGET_MS, unless PASSWORD_HASH_ROUNDS pins it (0 = calibrate).
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "0"))
+PASSWORD_HASH_TARGET_MS = float(os.getenv("PASSWORD_HASH_TARGET_MS", "250"))
+PASSWORD_HASH_MIN_ROUNDS = int(os.getenv("PASSWORD_HASH_MIN_ROUNDS", "10"))
+PASSWORD_HASH_MAX_ROUNDS = int(os.getenv("PASSWORD_HASH_MAX_ROUNDS", "16"))
+
+# bcrypt runs in a process pool of PASSWORD_HASH_WORKERS (0 = on the request
+# thread); at most PASSWORD_HASH_MAX_QUEUE more hashes may wait before login
+# and registration answer 503
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+# Login throttling: sliding-window attempt limits per account and per client
+# IP, checked before any database read or bcrypt. "memory" counts per worker;
+# "mongo" shares the counters across workers (login_attempts collection).
+LOGIN_LIMIT_ENABLED = os.getenv("LOGIN_LIMIT_ENABLED", "true").lower() == "true"
+LOGIN_LIMIT_BACKEND = os.getenv("LOGIN_LIMIT_BACKEND", "memory").lower()
+LOGIN_LIMIT_WINDOW_SECONDS = int(os.getenv("LOGIN_LIMIT_WINDOW_SECONDS", "300"))
+LOGIN_LIMIT_PER_ACCOUNT = int(os.getenv("LOGIN_LIMIT_PER_ACCOUNT", "10"))
+LOGIN_LIMIT_PER_IP = int(os.getenv("LOGIN_LIMIT_PER_IP", "100"))
+LOGIN_LIMIT_MAX_KEYS = int(os.getenv("LOGIN_LIMIT_MAX_KEYS", "200000"))
+# Take the client IP from the last X-Forwarded-For hop (only behind a reverse proxy)
+LOGIN_LIMIT_TRUST_PROXY = os.getenv("LOGIN_LIMIT_TRUST_PROXY", "false").lower() == "true"
+
 # CORS
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*")
 
@@ -25,6 +49,20 @@ MAIL_PASSWORD = os.getenv("MAIL_PASSWORD", "")
 MAIL_DEFAULT_SENDER = os.getenv("MAIL_DEFAULT_SENDER", os.getenv("MAIL_USERNAME", ""))
 MAIL_SUBJECT_PREFIX = os.getenv("MAIL_SUBJECT_PREFIX", "[BallotHub] ")
 
+# Where outstanding OTPs live: "mongo" (otps collection, shared by all workers)
+# or "memory" (this process only, expired by a timing wheel; single-node only)
+OTP_BACKEND = os.getenv("OTP_BACKEND", "mongo").lower()
+# Wrong codes allowed against one OTP before it is invalidated
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))
+
+# OTP emails are sent by OTP_DISPATCH_WORKERS background threads; login step 1
+# answers 503 once OTP_DISPATCH_MAX_QUEUE sends are waiting. Delivery status is
+# kept for the last OTP_DISPATCH_STATUS_MAX sends.
+OTP_DISPATCH_WORKERS = int(os.getenv("OTP_DISPATCH_WORKERS", "4"))
+OTP_DISPATCH_MAX_QUEUE = int(os.getenv("OTP_DISPATCH_MAX_QUEUE", "500"))
+OTP_DISPATCH_RETRIES = int(os.getenv("OTP_DISPATCH_RETRIES", "1"))
+OTP_DISPATCH_STATUS_MAX = int(os.getenv("OTP_DISPATCH_STATUS_MAX", "10000"))
+
 # SMS Provider Configuration (for OTP)
 # Options: "twilio", "textlocal", "msg91", "fast2sms", "aws_sns", "vonage", "console"
 SMS_PROVIDER = os.getenv("SMS_PROVIDER", "console")  # Default: console (development)
@@ -57,3 +95,109 @@ VONAGE_API_KEY = os.getenv("VONAGE_API_KEY", "")
 VONAGE_API_SECRET = os.getenv("VONAGE_API_SECRET", "")
 VONAGE_SENDER = os.getenv("VONAGE_SENDER", "BallotHub")
 
+
+# Vote tallies
+# "transactional": vote insert and tally $inc commit together (requires a replica set)
+# "eventual": tally $inc runs after the insert; drift is repaired by reconcile_tallies
+TALLY_WRITE_MODE = os.getenv("TALLY_WRITE_MODE", "eventual")
+# Default number of counter stripes per candidate; override per election with `tally_stripes`
+DEFAULT_TALLY_STRIPES = int(os.getenv("DEFAULT_TALLY_STRIPES", "1"))
+TALLY_RECONCILE_WORKERS = int(os.getenv("TALLY_RECONCILE_WORKERS", "4"))
+# Wait before re-measuring drift; only drift seen on both passes is corrected
+TALLY_RECONCILE_SETTLE_SECONDS = float(os.getenv("TALLY_RECONCILE_SETTLE_SECONDS", "2"))
+
+# Group commit for vote ingestion
+# When enabled, concurrent record_vote calls are collected for up to
+# VOTE_BATCH_MAX_DELAY_MS or VOTE_BATCH_MAX_SIZE votes and written with one
+# unordered insert_many. Tallies for a batch are applied after it is
+# acknowledged (eventual consistency, regardless of TALLY_WRITE_MODE).
+VOTE_GROUP_COMMIT = os.getenv("VOTE_GROUP_COMMIT", "false").lower() == "true"
+VOTE_BATCH_MAX_DELAY_MS = int(os.getenv("VOTE_BATCH_MAX_DELAY_MS", "5"))
+VOTE_BATCH_MAX_SIZE = int(os.getenv("VOTE_BATCH_MAX_SIZE", "200"))
+
+# Live results stream (SSE)
+# Poll interval used when MongoDB change streams are unavailable (standalone server)
+RESULTS_POLL_INTERVAL_SECONDS = float(os.getenv("RESULTS_POLL_INTERVAL_SECONDS", "2"))
+RESULTS_STREAM_HEARTBEAT_SECONDS = float(os.getenv("RESULTS_STREAM_HEARTBEAT_SECONDS", "15"))
+# Longest wait between retries of a failing results watcher (doubles from the poll interval)
+RESULTS_WATCHER_MAX_BACKOFF_SECONDS = float(os.getenv("RESULTS_WATCHER_MAX_BACKOFF_SECONDS", "60"))
+
+# Results cache for /api/admin/results
+# Entries are fresh until a vote bumps the election's version or the TTL passes
+# (the TTL bounds staleness from votes recorded by other worker processes).
+# Stale entries are served while one background recompute runs, up to MAX_STALE.
+RESULTS_CACHE_TTL_SECONDS = float(os.getenv("RESULTS_CACHE_TTL_SECONDS", "2"))
+RESULTS_CACHE_MAX_STALE_SECONDS = float(os.getenv("RESULTS_CACHE_MAX_STALE_SECONDS", "10"))
+
+# Audit export of raw votes
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+
+# Turnout buckets: votes are counted in memory and written this often
+TURNOUT_FLUSH_SECONDS = float(os.getenv("TURNOUT_FLUSH_SECONDS", "5"))
+# The approved-voter count (turnout denominator) is recounted at most this often
+TURNOUT_ELIGIBLE_TTL_SECONDS = float(os.getenv("TURNOUT_ELIGIBLE_TTL_SECONDS", "30"))
+
+# Final results
+# Elections are finalized this long after end_date so in-flight votes can land first
+FINALIZE_GRACE_SECONDS = int(os.getenv("FINALIZE_GRACE_SECONDS", "5"))
+# A finalize job's claim is taken over by another worker after this long (its owner is presumed dead)
+FINALIZE_CLAIM_TIMEOUT_SECONDS = int(os.getenv("FINALIZE_CLAIM_TIMEOUT_SECONDS", "600"))
+# How long a finalize job waits for workers' vote journals to drain the election before trying again later
+FINALIZE_JOURNAL_WAIT_SECONDS = int(os.getenv("FINALIZE_JOURNAL_WAIT_SECONDS", "30"))
+
+# In-process election/candidate metadata cache
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "60"))
+
+# Idempotency-Key support for POST /api/vote
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+
+# Per-user cache of which elections the user has voted in (GET /api/vote_status)
+VOTED_CACHE_TTL_SECONDS = float(os.getenv("VOTED_CACHE_TTL_SECONDS", "300"))
+VOTED_CACHE_MAX_USERS = int(os.getenv("VOTED_CACHE_MAX_USERS", "100000"))
+
+# Per-election Bloom filter of voters; a negative skips the votes lookup.
+# Filters are sized for the approved voter count at VOTED_FILTER_FP_RATE,
+# capped at VOTED_FILTER_MAX_BYTES each. Every VOTED_FILTER_REFRESH_SECONDS a
+# filter catches up on votes inserted since its last scan (by vote _id, less
+# VOTED_FILTER_CATCHUP_OVERLAP_SECONDS for clock skew and late inserts); it is
+# only rebuilt from scratch once it holds more voters than it was sized for.
+VOTED_FILTER_ENABLED = os.getenv("VOTED_FILTER_ENABLED", "true").lower() == "true"
+VOTED_FILTER_FP_RATE = float(os.getenv("VOTED_FILTER_FP_RATE", "0.01"))
+VOTED_FILTER_MAX_BYTES = int(os.getenv("VOTED_FILTER_MAX_BYTES", str(8 * 1024 * 1024)))
+VOTED_FILTER_REFRESH_SECONDS = float(os.getenv("VOTED_FILTER_REFRESH_SECONDS", os.getenv("VOTED_FILTER_REBUILD_SECONDS", "30")))
+VOTED_FILTER_CATCHUP_OVERLAP_SECONDS = float(os.getenv("VOTED_FILTER_CATCHUP_OVERLAP_SECONDS", "60"))
+
+# Local write-ahead vote journal
+# When enabled, votes are acknowledged once appended (and flushed) to a
+# memory-mapped segment file owned by this worker; a background drainer
+# replays them into MongoDB in bulk. Takes precedence over VOTE_GROUP_COMMIT.
+VOTE_JOURNAL_ENABLED = os.getenv("VOTE_JOURNAL_ENABLED", "false").lower() == "true"
+VOTE_JOURNAL_DIR = os.getenv("VOTE_JOURNAL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "journal"))
+VOTE_JOURNAL_SEGMENT_BYTES = int(os.getenv("VOTE_JOURNAL_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+VOTE_JOURNAL_DRAIN_INTERVAL_MS = int(os.getenv("VOTE_JOURNAL_DRAIN_INTERVAL_MS", "50"))
+VOTE_JOURNAL_DRAIN_BATCH = int(os.getenv("VOTE_JOURNAL_DRAIN_BATCH", "1000"))
+# Budget for each MongoDB read made before journaling a vote (catalog reload, prior-vote lookup);
+# a prior-vote lookup that runs out of time journals the vote anyway
+VOTE_JOURNAL_CHECK_TIMEOUT_MS = int(os.getenv("VOTE_JOURNAL_CHECK_TIMEOUT_MS", "200"))
+# Each worker republishes which elections its journal still holds votes for at least this often
+VOTE_JOURNAL_HEARTBEAT_SECONDS = float(os.getenv("VOTE_JOURNAL_HEARTBEAT_SECONDS", "10"))
+
+# Admission control / load shedding
+# In-flight limits per route class; limits shrink when recent MongoDB latency
+# for the class exceeds ADMISSION_DB_LATENCY_TARGET_MS. Lower-priority classes
+# may only use part of ADMISSION_MAX_INFLIGHT so /api/vote keeps headroom.
+ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true"
+ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", "64"))
+ADMISSION_CLASS_LIMITS = {
+    "vote": int(os.getenv("ADMISSION_LIMIT_VOTE", "64")),
+    "login": int(os.getenv("ADMISSION_LIMIT_LOGIN", "32")),
+    "read": int(os.getenv("ADMISSION_LIMIT_READ", "32")),
+    "admin": int(os.getenv("ADMISSION_LIMIT_ADMIN", "16")),
+}
+ADMISSION_DB_LATENCY_TARGET_MS = float(os.getenv("ADMISSION_DB_LATENCY_TARGET_MS", "50"))
+
+# Serving mode: "threaded" runs the Flask app on a thread per request;
+# "async" serves the hot user endpoints as asyncio handlers on the Motor
+# driver (requirements-async.txt) and hands every other route to Flask.
+SERVER_MODE = os.getenv("SERVER_MODE", "threaded").lower()
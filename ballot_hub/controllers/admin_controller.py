@@ -1,4 +1,6 @@
-from flask import request, jsonify
+import json
+import queue
+from flask import request, jsonify, Response, stream_with_context
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt
 from bson import ObjectId
 from bson.errors import InvalidId
@@ -12,6 +14,17 @@ from models.election_model import (
     delete_election as model_delete_election
 )
 from models.votes_model import count_votes
+from models.turnout_model import get_turnout_series, forget_eligible_voters
+from models.results_model import get_or_finalize_results
+from utils.results_hub import get_results_hub
+from utils.results_cache import get_cached_results
+from utils.vote_export import export_votes, export_filename
+from utils.admission import controller as admission_controller
+from utils import voted_cache, voted_filter, login_limiter
+from utils.hash_pool import hash_pool, HashingBusyError
+from utils.responses import HASHING_BUSY_RESPONSE, login_limited_response
+from utils.otp_dispatch import otp_dispatcher
+from config import DEFAULT_TALLY_STRIPES, RESULTS_STREAM_HEARTBEAT_SECONDS
 from datetime import datetime
 
 
@@ -19,7 +32,13 @@ def admin_login():
     data = request.get_json() or {}
     username = data.get("username", "").strip()
     password = data.get("password", "")
-    admin = admin_auth(username, password)
+    retry_after = login_limiter.check(f"admin:{username}", login_limiter.client_ip(request))
+    if retry_after:
+        return login_limited_response(retry_after)
+    try:
+        admin = admin_auth(username, password)
+    except HashingBusyError:
+        return HASHING_BUSY_RESPONSE
     if not admin:
         return jsonify({"error": "Invalid admin credentials"}), 401
     token = create_access_token(identity=admin["admin_id"], additional_claims={"role": "admin", "admin_id": admin["admin_id"]})
@@ -36,6 +55,7 @@ def approve_user(user_id: str):
         users.update_one({"_id": ObjectId(user_id)}, {"$set": {"status": "approved"}})
     except InvalidId:
         return jsonify({"error": "Invalid user id"}), 400
+    forget_eligible_voters()
     return jsonify({"message": "User approved"}), 200
 
 
@@ -72,7 +92,13 @@ def create_election():
     if status not in ("active", "inactive"):
         status = "active"
     try:
-        model_create_election(name, start_date, end_date, status)
+        tally_stripes = int(data.get("tally_stripes", DEFAULT_TALLY_STRIPES))
+    except (TypeError, ValueError):
+        return jsonify({"error": "tally_stripes must be a positive integer"}), 400
+    if tally_stripes < 1:
+        return jsonify({"error": "tally_stripes must be a positive integer"}), 400
+    try:
+        model_create_election(name, start_date, end_date, status, tally_stripes)
     except ValueError as e:
         return jsonify({"error": f"Invalid date format: {str(e)}. Expected format: YYYY-MM-DD HH:MM:SS"}), 400
     except Exception as e:
@@ -115,10 +141,160 @@ def election_results(election_id: str):
     if claims.get("role") != "admin":
         return jsonify({"error": "Unauthorized"}), 403
     try:
-        results = count_votes(election_id)
+        ObjectId(election_id)
+    except (InvalidId, TypeError) as e:
+        return jsonify({"error": f"Invalid election id: {str(e)}"}), 400
+    state, snapshot = get_or_finalize_results(election_id)
+    if state == "finalizing":
+        # Live counts until the snapshot is written; not cached, the final ones replace them shortly
+        results, _ = get_cached_results(election_id, count_votes)
+        response = jsonify({"results": results, "final": False, "finalizing": True})
+        response.status_code = 202
+        response.headers["Retry-After"] = "2"
+        response.headers["Cache-Control"] = "no-store"
+        return response
+    if snapshot is not None:
+        # Final results are immutable; the vote checksum doubles as the ETag
+        results, etag = snapshot["results"], snapshot["checksum"][:20]
+        body = {
+            "results": results,
+            "final": True,
+            "total_votes": snapshot["total_votes"],
+            "checksum": snapshot["checksum"],
+        }
+    else:
+        results, etag = get_cached_results(election_id, count_votes)
+        body = {"results": results}
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = jsonify(body)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@jwt_required()
+def election_results_stream(election_id: str):
+    """Server-Sent Events stream of live results: a snapshot, then tally deltas"""
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+    try:
+        ObjectId(election_id)
+    except (InvalidId, TypeError):
+        return jsonify({"error": "Invalid election id"}), 400
+
+    hub = get_results_hub()
+
+    def events():
+        subscription = hub.subscribe(election_id)
+        try:
+            while True:
+                try:
+                    event = subscription.get(timeout=RESULTS_STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            hub.unsubscribe(election_id, subscription)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@jwt_required()
+def election_turnout(election_id: str):
+    """Per-minute turnout series for an election"""
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+    try:
+        turnout = get_turnout_series(election_id)
     except (InvalidId, ValueError) as e:
         return jsonify({"error": f"Invalid election id: {str(e)}"}), 400
-    return jsonify({"results": results}), 200
+    if turnout is None:
+        return jsonify({"error": "Election not found"}), 404
+    return jsonify(turnout), 200
+
+
+@jwt_required()
+def export_election_votes(election_id: str):
+    """Stream an election's raw votes for auditors as NDJSON or CSV, optionally gzipped"""
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+    fmt = request.args.get("format", "ndjson").strip().lower()
+    gzip = request.args.get("gzip", "").lower() in ("1", "true", "yes")
+    try:
+        chunks = export_votes(election_id, fmt, gzip)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not get_collection("elections").find_one({"_id": ObjectId(election_id)}, {"_id": 1}):
+        return jsonify({"error": "Election not found"}), 404
+
+    if gzip:
+        mimetype = "application/gzip"
+    else:
+        mimetype = "application/x-ndjson" if fmt == "ndjson" else "text/csv"
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f'attachment; filename="{export_filename(election_id, fmt, gzip)}"',
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@jwt_required()
+def admission_stats():
+    """Current admission-control limits and state"""
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+    return jsonify(admission_controller.stats()), 200
+
+
+@jwt_required()
+def hashing_stats():
+    """Password hashing pool size, queue depth and latency"""
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+    return jsonify(hash_pool.stats()), 200
+
+
+@jwt_required()
+def login_limit_stats():
+    """Login throttling counters"""
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+    return jsonify(login_limiter.stats()), 200
+
+
+@jwt_required()
+def otp_dispatch_stats():
+    """OTP email queue depth, delivery counts and latency"""
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+    return jsonify(otp_dispatcher.stats()), 200
+
+
+@jwt_required()
+def vote_status_stats():
+    """Hit/miss counters for the voted filter and the per-user voted cache"""
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+    return jsonify({"filter": voted_filter.stats(), "cache": voted_cache.stats()}), 200
 
 
 @jwt_required()
@@ -234,6 +410,7 @@ def delete_user(user_id: str):
         
         if result.deleted_count == 0:
             return jsonify({"error": "User not found or already deleted"}), 404
+        forget_eligible_voters()
             
         return jsonify({"message": "User and their votes have been deleted"}), 200
         
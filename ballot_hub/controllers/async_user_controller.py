@@ -0,0 +1,170 @@
+"""
+Async (Quart) versions of the hot user endpoints for the async serving mode.
+Request validation and response bodies come from user_controller; database
+access goes through the *_async model functions on the Motor driver. Catalog
+lookups are in-memory but may reload from MongoDB when their TTL expires, so
+they run in a worker thread.
+"""
+import asyncio
+from bson import ObjectId
+from bson.errors import InvalidId
+from quart import request, jsonify
+from models.user_model import authenticate_user_async, get_voted_elections_async
+from models.election_model import get_all_active_elections
+from models.candidate_model import get_candidates
+from models.votes_model import record_vote_async
+from models.otp_model import generate_and_send_otp_async, verify_user_otp_async
+from models.results_model import ElectionClosedError
+from utils.async_auth import jwt_required, get_jwt, get_jwt_identity, create_token
+from utils.idempotency import async_idempotent, mark_final
+from utils.hash_pool import HashingBusyError
+from utils import login_limiter
+from utils.responses import HASHING_BUSY_RESPONSE, login_limited_response
+from utils.voted_cache import get_vote_status_async, mark_voted
+from utils.catalog import (
+    get_election as get_cached_election, get_candidate as get_cached_candidate,
+    get_active_elections as get_active_elections_cached
+)
+from database.async_connection import get_async_collection
+from controllers.user_controller import (
+    LOGIN_USER_FIELDS, _otp_sent_response, _user_claims, _token_response,
+    _vote_target_error, _queue_vote_confirmation
+)
+
+
+async def login():
+    data = await request.get_json(silent=True) or {}
+    email = data.get("email", "").strip().lower()
+    password = data.get("password", "")
+    step = data.get("step", "1")
+
+    if step == "1":
+        retry_after = await login_limiter.check_async(f"email:{email}", login_limiter.client_ip(request))
+        if retry_after:
+            return login_limited_response(retry_after)
+        try:
+            user = await authenticate_user_async(email, password)
+        except HashingBusyError:
+            return HASHING_BUSY_RESPONSE
+        if not user:
+            return jsonify({"error": "Invalid credentials"}), 401
+        if user["status"] != "approved":
+            return jsonify({"error": "User not approved yet"}), 403
+        otp_result = await generate_and_send_otp_async(user["user_id"], user.get("email", email), user.get("name", "User"))
+        body, status = _otp_sent_response(user, otp_result)
+        return jsonify(body), status
+
+    elif step == "2":
+        user_id = data.get("user_id", "")
+        otp = data.get("otp", "").strip()
+        if not user_id or not otp:
+            return jsonify({"error": "user_id and otp required"}), 400
+        if not await verify_user_otp_async(user_id, otp):
+            return jsonify({"error": "Invalid or expired OTP"}), 401
+        try:
+            user_id_obj = ObjectId(user_id)
+        except (InvalidId, TypeError):
+            return jsonify({"error": "Invalid user ID"}), 400
+        user = await get_async_collection("users").find_one({"_id": user_id_obj}, LOGIN_USER_FIELDS)
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        if user.get("status") != "approved":
+            return jsonify({"error": "User not approved yet"}), 403
+        token = create_token(user_id, _user_claims(user_id, user))
+        return jsonify(_token_response(token, user_id, user)), 200
+
+    else:
+        return jsonify({"error": "Invalid step"}), 400
+
+
+@jwt_required
+async def list_elections():
+    active_elections = await asyncio.to_thread(get_all_active_elections)
+    return jsonify({"elections": active_elections}), 200
+
+
+@jwt_required
+async def list_candidates(election_id: str):
+    try:
+        candidates = await asyncio.to_thread(get_candidates, election_id)
+    except (InvalidId, ValueError) as e:
+        return jsonify({"error": f"Invalid election id: {str(e)}"}), 400
+    return jsonify({"candidates": candidates}), 200
+
+
+def _user_identity():
+    """The caller's user id, or None if the token is not a user token"""
+    if get_jwt().get("role") != "user":
+        return None
+    return get_jwt_identity() or None
+
+
+@jwt_required
+async def check_vote_status(election_id: str):
+    user_id = _user_identity()
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 403
+    status = await get_vote_status_async(user_id, [election_id], get_voted_elections_async)
+    return jsonify({"has_voted": status[election_id], "election_id": election_id}), 200
+
+
+@jwt_required
+async def check_vote_status_all():
+    user_id = _user_identity()
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 403
+    elections = await asyncio.to_thread(get_active_elections_cached)
+    status = await get_vote_status_async(user_id, [str(doc["_id"]) for doc in elections], get_voted_elections_async)
+    return jsonify({"vote_status": status}), 200
+
+
+@jwt_required
+@async_idempotent
+async def vote():
+    claims = get_jwt()
+    if claims.get("role") != "user":
+        return jsonify({"error": "Unauthorized: Only users can vote"}), 403
+    user_id = get_jwt_identity()
+    if not user_id:
+        return jsonify({"error": "Unauthorized: Invalid user session"}), 403
+
+    data = await request.get_json(silent=True) or {}
+    candidate_id = data.get("candidate_id")
+    election_id = data.get("election_id")
+    if not candidate_id or not election_id:
+        return jsonify({"error": "Both candidate_id and election_id are required"}), 400
+
+    try:
+        election = await asyncio.to_thread(get_cached_election, election_id)
+        if not election:
+            return jsonify({"error": "Election not found"}), 404
+        candidate = await asyncio.to_thread(get_cached_candidate, candidate_id)
+        if not candidate:
+            return jsonify({"error": "Candidate not found"}), 404
+    except Exception as e:
+        print(f"❌ Error fetching election/candidate details: {e}")
+        return jsonify({"error": "Error processing election data"}), 500
+
+    error = _vote_target_error(election_id, election, candidate)
+    if error:
+        return jsonify(error[0]), error[1]
+
+    try:
+        ok = await record_vote_async(user_id, candidate_id, election_id)
+        if not ok:
+            mark_voted(user_id, election_id)
+            mark_final()
+            return jsonify({"error": "You have already voted in this election"}), 400
+    except ElectionClosedError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"❌ Error recording vote: {e}")
+        return jsonify({"error": "Failed to process your vote"}), 500
+
+    _queue_vote_confirmation(claims, election, candidate)
+
+    return jsonify({
+        "message": "Vote recorded successfully!",
+        "candidate": candidate.get('candidate_name'),
+        "election": election.get('election_name')
+    }), 201
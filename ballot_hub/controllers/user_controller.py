@@ -3,18 +3,26 @@ from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identi
 from bson.errors import InvalidId
 from bson import ObjectId
 from datetime import datetime
-from passlib.hash import bcrypt
-from models.user_model import register_user, authenticate_user, check_if_voted_in_election
+from models.user_model import register_user, authenticate_user, get_voted_elections, find_user_by_email, email_key
 from models.election_model import get_all_active_elections
 from models.candidate_model import get_candidates
 from models.votes_model import record_vote
+from models.results_model import ElectionClosedError
+from utils.idempotency import idempotent, mark_final
+from utils.hash_pool import hash_pool, HashingBusyError
+from utils import login_limiter
+from utils.responses import HASHING_BUSY_RESPONSE, login_limited_response
+from utils.voted_cache import get_vote_status, mark_voted
+from utils.catalog import (
+    get_election as get_cached_election, get_candidate as get_cached_candidate,
+    get_active_elections as get_active_elections_cached
+)
 from database.connection import get_collection
 
 
 def _hash_password(password: str) -> str:
     """Hash a password for storing."""
-    return bcrypt.hash(password)
-
+    return hash_pool.hash_password(password)
 
 
 def register():
@@ -30,10 +38,7 @@ def register():
         }), 400
 
     # Check if email already exists (case-insensitive)
-    users = get_collection("users")
-    existing_user = users.find_one({
-        "email": {"$regex": f"^{email}$", "$options": "i"}
-    })
+    existing_user = find_user_by_email(email, {"status": 1})
 
     if existing_user:
         if existing_user.get("status") == "pending":
@@ -51,9 +56,10 @@ def register():
         hashed_password = _hash_password(password)
         
         # Create new user
-        result = users.insert_one({
+        result = get_collection("users").insert_one({
             "name": name,
             "email": email,
+            "email_key": email_key(email),
             "password": hashed_password,
             "status": "pending",
             "voted": False,
@@ -65,6 +71,8 @@ def register():
             "requires_approval": True
         }), 201
 
+    except HashingBusyError:
+        return HASHING_BUSY_RESPONSE
     except Exception as e:
         return jsonify({
             "error": f"Registration failed: {str(e)}"
@@ -81,7 +89,13 @@ def login():
     
     # Step 1: Verify credentials and send OTP
     if step == "1":
-        user = authenticate_user(email, password)
+        retry_after = login_limiter.check(f"email:{email}", login_limiter.client_ip(request))
+        if retry_after:
+            return login_limited_response(retry_after)
+        try:
+            user = authenticate_user(email, password)
+        except HashingBusyError:
+            return HASHING_BUSY_RESPONSE
         if not user:
             return jsonify({"error": "Invalid credentials"}), 401
         if user["status"] != "approved":
@@ -93,24 +107,8 @@ def login():
         user_name = user.get("name", "User")
         
         otp_result = generate_and_send_otp(user["user_id"], user_email, user_name)
-        
-        if not otp_result.get("success"):
-            return jsonify({"error": otp_result.get("message", "Failed to send OTP")}), 500
-        
-        # Mask email for display (e.g., u***@example.com)
-        email_parts = user_email.split("@")
-        if len(email_parts) == 2:
-            masked_email = f"{email_parts[0][0]}***@{email_parts[1]}"
-        else:
-            masked_email = user_email
-        
-        return jsonify({
-            "step": 1,
-            "message": "OTP sent to your registered email address",
-            "user_id": user["user_id"],
-            "email_masked": masked_email,
-            "expires_in": otp_result.get("expires_in", 5)
-        }), 200
+        body, status = _otp_sent_response(user, otp_result)
+        return jsonify(body), status
     
     # Step 2: Verify OTP and issue token
     elif step == "2":
@@ -135,7 +133,7 @@ def login():
         except:
             return jsonify({"error": "Invalid user ID"}), 400
         
-        user = users.find_one({"_id": user_id_obj}, {"name": 1, "email": 1, "status": 1})
+        user = users.find_one({"_id": user_id_obj}, LOGIN_USER_FIELDS)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -144,28 +142,70 @@ def login():
             return jsonify({"error": "User not approved yet"}), 403
         
         # Generate JWT token
-        token = create_access_token(
-            identity=user_id,
-            additional_claims={
-                "role": "user",
-                "user_id": user_id,
-                "email": user.get("email", "")
-            }
-        )
-        
-        return jsonify({
-            "access_token": token,
-            "user": {
-                "user_id": user_id,
-                "name": user.get("name", ""),
-                "email": user.get("email", "")
-            }
-        }), 200
+        token = create_access_token(identity=user_id, additional_claims=_user_claims(user_id, user))
+        return jsonify(_token_response(token, user_id, user)), 200
     
     else:
         return jsonify({"error": "Invalid step"}), 400
 
 
+def _otp_sent_response(user: dict, otp_result: dict):
+    """Login step 1 response body and status once the OTP is stored and queued"""
+    if not otp_result.get("success"):
+        return {"error": otp_result.get("message", "Failed to send OTP")}, 503 if otp_result.get("busy") else 500
+    
+    # Mask email for display (e.g., u***@example.com)
+    user_email = user.get("email", "")
+    email_parts = user_email.split("@")
+    if len(email_parts) == 2:
+        masked_email = f"{email_parts[0][0]}***@{email_parts[1]}"
+    else:
+        masked_email = user_email
+    
+    return {
+        "step": 1,
+        "message": otp_result.get("message", "OTP sent to your registered email address"),
+        "user_id": user["user_id"],
+        "email_masked": masked_email,
+        "delivery_id": otp_result.get("delivery_id"),
+        "expires_in": otp_result.get("expires_in", 5)
+    }, 200
+
+
+def otp_status(delivery_id: str):
+    """Delivery status of the OTP email queued by login step 1"""
+    user_id = request.args.get("user_id", "")
+    from models.otp_model import otp_delivery_status
+    status = otp_delivery_status(delivery_id, user_id)
+    if not status:
+        return jsonify({"error": "Unknown delivery"}), 404
+    return jsonify(status), 200
+
+
+# Projection for the user lookup in login step 2
+LOGIN_USER_FIELDS = {"name": 1, "email": 1, "status": 1}
+
+
+def _user_claims(user_id: str, user: dict) -> dict:
+    return {
+        "role": "user",
+        "user_id": user_id,
+        "email": user.get("email", ""),
+        "name": user.get("name", "")
+    }
+
+
+def _token_response(token: str, user_id: str, user: dict) -> dict:
+    return {
+        "access_token": token,
+        "user": {
+            "user_id": user_id,
+            "name": user.get("name", ""),
+            "email": user.get("email", "")
+        }
+    }
+
+
 @jwt_required()
 def list_elections():
     """List all active elections"""
@@ -192,12 +232,27 @@ def check_vote_status(election_id: str):
     if not user_id:
         return jsonify({"error": "Unauthorized"}), 403
     
-    from models.user_model import check_if_voted_in_election
-    has_voted = check_if_voted_in_election(user_id, election_id)
+    has_voted = get_vote_status(user_id, [election_id], get_voted_elections)[election_id]
     return jsonify({"has_voted": has_voted, "election_id": election_id}), 200
 
 
 @jwt_required()
+def check_vote_status_all():
+    """Voted flag for every active election, from one query (cached per user)"""
+    claims = get_jwt()
+    if claims.get("role") != "user":
+        return jsonify({"error": "Unauthorized"}), 403
+    user_id = get_jwt_identity()
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 403
+
+    election_ids = [str(doc["_id"]) for doc in get_active_elections_cached()]
+    status = get_vote_status(user_id, election_ids, get_voted_elections)
+    return jsonify({"vote_status": status}), 200
+
+
+@jwt_required()
+@idempotent
 def vote():
     try:
         # Authentication and input validation
@@ -216,66 +271,36 @@ def vote():
         if not candidate_id or not election_id:
             return jsonify({"error": "Both candidate_id and election_id are required"}), 400
 
-        # Check if user has already voted in this election
-        if check_if_voted_in_election(user_id, election_id):
-            return jsonify({"error": "You have already voted in this election"}), 400
-
-        # Get user details
+        # Validate candidate and election against the in-memory catalog
         try:
-            users = get_collection("users")
-            user = users.find_one({"_id": ObjectId(user_id)})
-            if not user:
-                return jsonify({"error": "User account not found"}), 404
-        except Exception as e:
-            print(f"❌ Error fetching user details: {e}")
-            return jsonify({"error": "Error processing your request"}), 500
-
-        # Get candidate and election details
-        try:
-            candidates = get_collection("candidates")
-            candidate = candidates.find_one({"_id": ObjectId(candidate_id)})
-            if not candidate:
-                return jsonify({"error": "Candidate not found"}), 404
-
-            elections = get_collection("elections")
-            election = elections.find_one({"_id": ObjectId(election_id)})
+            election = get_cached_election(election_id)
             if not election:
                 return jsonify({"error": "Election not found"}), 404
+            candidate = get_cached_candidate(candidate_id)
+            if not candidate:
+                return jsonify({"error": "Candidate not found"}), 404
         except Exception as e:
             print(f"❌ Error fetching election/candidate details: {e}")
             return jsonify({"error": "Error processing election data"}), 500
 
-        # Record the vote
+        error = _vote_target_error(election_id, election, candidate)
+        if error:
+            return jsonify(error[0]), error[1]
+
+        # Record the vote; the unique (user_id, election_id) index rejects repeat votes
         try:
             ok = record_vote(user_id, candidate_id, election_id)
             if not ok:
-                return jsonify({"error": "Failed to record your vote. Please try again."}), 400
+                mark_voted(user_id, election_id)
+                mark_final()
+                return jsonify({"error": "You have already voted in this election"}), 400
+        except ElectionClosedError as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             print(f"❌ Error recording vote: {e}")
             return jsonify({"error": "Failed to process your vote"}), 500
 
-        # Send confirmation email (non-blocking)
-        try:
-            from utils.email_service import send_vote_confirmation_email
-            from threading import Thread
-            
-            # Start a new thread to send email
-            email_thread = Thread(
-                target=send_vote_confirmation_email,
-                kwargs={
-                    'to_email': user.get('email'),
-                    'user_name': user.get('name', 'Voter'),
-                    'candidate_name': candidate.get('candidate_name', 'the candidate'),
-                    'election_name': election.get('election_name', 'the election')
-                }
-            )
-            email_thread.daemon = True
-            email_thread.start()
-            print(f"ℹ️  Email notification queued for {user.get('email')}")
-            
-        except Exception as e:
-            print(f"⚠️  Failed to queue email notification: {e}")
-            # Continue even if email fails
+        _queue_vote_confirmation(claims, election, candidate)
 
         return jsonify({
             "message": "Vote recorded successfully!",
@@ -287,3 +312,40 @@ def vote():
         print(f"❌ Unexpected error in vote endpoint: {str(e)}")
         return jsonify({"error": "An unexpected error occurred. Please try again."}), 500
 
+
+
+def _vote_target_error(election_id: str, election: dict, candidate: dict):
+    """(body, status) if the candidate/election pair cannot take a vote right now, else None"""
+    if str(candidate.get("election_id")) != election_id:
+        return {"error": "Candidate does not belong to this election"}, 400
+    now = datetime.utcnow()
+    if election.get("status") != "active" or not (election["start_date"] <= now <= election["end_date"]):
+        return {"error": "This election is not open for voting"}, 400
+    return None
+
+
+def _queue_vote_confirmation(claims: dict, election: dict, candidate: dict) -> None:
+    """Send the confirmation email on a daemon thread; recipient comes from the token claims"""
+    try:
+        if not claims.get('email'):
+            raise ValueError("token has no email claim")
+        from utils.email_service import send_vote_confirmation_email
+        from threading import Thread
+        
+        # Start a new thread to send email
+        email_thread = Thread(
+            target=send_vote_confirmation_email,
+            kwargs={
+                'to_email': claims.get('email'),
+                'user_name': claims.get('name') or 'Voter',
+                'candidate_name': candidate.get('candidate_name', 'the candidate'),
+                'election_name': election.get('election_name', 'the election')
+            }
+        )
+        email_thread.daemon = True
+        email_thread.start()
+        print(f"ℹ️  Email notification queued for {claims.get('email')}")
+        
+    except Exception as e:
+        print(f"⚠️  Failed to queue email notification: {e}")
+        # Continue even if email fails
@@ -0,0 +1,27 @@
+"""
+Motor (asyncio) client for the async serving mode.
+Same server and database as connection.py, and the same command listener, so
+admission control sees the database latency of async requests too. Motor
+binds to the event loop that first uses it, so the client is created lazily
+inside the running loop.
+"""
+from config import MONGO_URI, MONGO_DB_NAME
+
+_client = None
+
+
+def get_async_client():
+    global _client
+    if _client is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from utils.admission import DBLatencyListener
+        _client = AsyncIOMotorClient(MONGO_URI, serverSelectionTimeoutMS=5000, event_listeners=[DBLatencyListener()])
+    return _client
+
+
+def get_async_db():
+    return get_async_client()[MONGO_DB_NAME]
+
+
+def get_async_collection(name: str):
+    return get_async_db()[name]
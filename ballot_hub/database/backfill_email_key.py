@@ -0,0 +1,90 @@
+"""
+Give every user a normalized `email_key` (see models.user_model.email_key)
+and index it, so email lookups are an exact index match instead of a
+case-insensitive $regex scan.
+
+The backfill walks users in _id order in batches and records the last _id in
+the `settings` collection after each batch, so an interrupted run resumes
+where it stopped. Once it finishes, lookups stop falling back to the regex.
+init_db runs it on startup; it can also be run by hand:
+
+    python database/backfill_email_key.py
+"""
+import sys
+import os
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+from database.connection import get_collection
+from models.user_model import email_key, EMAIL_KEY_BACKFILL_ID
+
+BATCH_SIZE = 1000
+
+
+def backfill_email_keys(batch_size: int = BATCH_SIZE) -> int:
+    """Set email_key on users that lack it; returns how many were updated in this run"""
+    users = get_collection("users")
+    settings = get_collection("settings")
+    progress = settings.find_one({"_id": EMAIL_KEY_BACKFILL_ID}) or {}
+    if progress.get("done"):
+        return 0
+
+    last_id = progress.get("last_id")
+    if last_id is not None:
+        print(f"↻ Resuming email_key backfill after {last_id}")
+    updated = 0
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = list(users.find(query, {"email": 1, "email_key": 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        ops = [
+            UpdateOne({"_id": user["_id"]}, {"$set": {"email_key": email_key(user["email"])}})
+            for user in batch
+            if user.get("email") and user.get("email_key") != email_key(user["email"])
+        ]
+        if ops:
+            users.bulk_write(ops, ordered=False)
+            updated += len(ops)
+        last_id = batch[-1]["_id"]
+        settings.update_one(
+            {"_id": EMAIL_KEY_BACKFILL_ID},
+            {"$set": {"last_id": last_id}, "$inc": {"updated": len(ops)}},
+            upsert=True,
+        )
+
+    settings.update_one(
+        {"_id": EMAIL_KEY_BACKFILL_ID},
+        {"$set": {"done": True, "completed_at": datetime.utcnow()}},
+        upsert=True,
+    )
+    return updated
+
+
+def ensure_email_key_index() -> bool:
+    """Unique email_key index; falls back to a plain index if legacy users collide"""
+    users = get_collection("users")
+    try:
+        users.create_index(
+            "email_key", unique=True, name="email_key_1",
+            partialFilterExpression={"email_key": {"$type": "string"}},
+        )
+        return True
+    except OperationFailure as e:
+        if e.code not in (11000, 11001):
+            raise
+        print("⚠️  Users share an email differing only in case; run database/fix_email_index.py")
+        users.create_index("email_key", name="email_key_1")
+        return False
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Backfilling users.email_key")
+    print("=" * 60)
+    count = backfill_email_keys()
+    print(f"✓ Updated {count} user(s)")
+    if ensure_email_key_index():
+        print("✓ email_key index is in place")
@@ -0,0 +1,64 @@
+"""
+Count votes recorded before materialized tallies existed into `tallies`.
+count_votes reads results from tallies only once this has finished; until
+then it counts raw votes (see models.tally_model.tallies_backfilled).
+
+Elections are reconciled one at a time in _id order with reconcile_tallies,
+which only corrects drift that holds still across two measurements, so votes
+arriving meanwhile are not double counted. The last election done is
+recorded in the `settings` collection, so an interrupted run resumes where it
+stopped. An election whose drift will not settle stops the run without
+marking it done; run it again once voting has quietened. init_db runs it on
+startup; it can also be run by hand:
+
+    python database/backfill_tallies.py
+"""
+import sys
+import os
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import get_collection
+from models.tally_model import reconcile_tallies, TALLY_BACKFILL_ID
+
+
+def backfill_tallies() -> int:
+    """Reconcile every election's tallies; returns how many counters were corrected in this run"""
+    elections = get_collection("elections")
+    settings = get_collection("settings")
+    progress = settings.find_one({"_id": TALLY_BACKFILL_ID}) or {}
+    if progress.get("done"):
+        return 0
+
+    last_id = progress.get("last_id")
+    if last_id is not None:
+        print(f"↻ Resuming tally backfill after election {last_id}")
+    corrected = 0
+    query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+    for election in elections.find(query, {"_id": 1}).sort("_id", 1):
+        report = reconcile_tallies(str(election["_id"]))
+        corrected += report["corrected"]
+        if report["unconfirmed"]:
+            print(f"⚠️  Votes for election {election['_id']} are still changing; "
+                  "run database/backfill_tallies.py again to finish the tally backfill")
+            return corrected
+        settings.update_one(
+            {"_id": TALLY_BACKFILL_ID},
+            {"$set": {"last_id": election["_id"]}, "$inc": {"corrected": report["corrected"]}},
+            upsert=True,
+        )
+
+    settings.update_one(
+        {"_id": TALLY_BACKFILL_ID},
+        {"$set": {"done": True, "completed_at": datetime.utcnow()}},
+        upsert=True,
+    )
+    return corrected
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Backfilling vote tallies")
+    print("=" * 60)
+    count = backfill_tallies()
+    print(f"✓ Corrected {count} counter(s)")
@@ -0,0 +1,73 @@
+"""
+Benchmark the OTP part of a login (store the OTP, then verify it) on each
+OTP backend: the MongoDB otps collection vs the in-memory timing-wheel store.
+The MongoDB backend writes to a separate benchmark database (never the live
+one). Each of N threads runs store + verify for a fresh user in a loop.
+
+Usage:
+    python database/benchmark_otp_backends.py            # 1, 8 and 32 threads x 5s
+    python database/benchmark_otp_backends.py 4 16       # custom thread counts
+"""
+import sys
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep benchmark data out of the application database
+os.environ.setdefault("MONGO_DB_NAME", "ballot_hub_bench")
+
+from bson import ObjectId
+from database.connection import get_collection
+from utils.otp_service import generate_otp, hash_otp, ensure_otp_indexes
+from utils.otp_store import MongoOtpStore, MemoryOtpStore
+
+DURATION_SECONDS = 5
+DEFAULT_THREADS = [1, 8, 32]
+
+
+def _login_otp_loop(store, stop_at: float, latencies: list) -> None:
+    local = []
+    while time.perf_counter() < stop_at:
+        user_id, otp = str(ObjectId()), generate_otp(6)
+        start = time.perf_counter()
+        store.store(user_id, "bench@example.com", hash_otp(otp), datetime.utcnow() + timedelta(minutes=5))
+        assert store.verify(user_id, hash_otp(otp)), "stored OTP did not verify"
+        local.append(time.perf_counter() - start)
+    latencies.extend(local)
+
+
+def measure(store, threads: int) -> list:
+    latencies = []
+    stop_at = time.perf_counter() + DURATION_SECONDS
+    workers = [threading.Thread(target=_login_otp_loop, args=(store, stop_at, latencies)) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sorted(latencies)
+
+
+def run(thread_counts):
+    get_collection("otps").drop()
+    ensure_otp_indexes()
+    backends = {"mongo": MongoOtpStore(), "memory": MemoryOtpStore()}
+
+    print("=" * 64)
+    print(f"OTP backend benchmark (store + verify per login, {DURATION_SECONDS}s per run)")
+    print("=" * 64)
+    print(f"{'backend':<8} {'threads':>8} {'logins/s':>12} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, store in backends.items():
+        for threads in thread_counts:
+            latencies = measure(store, threads)
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[int(len(latencies) * 0.99)] * 1000
+            print(f"{name:<8} {threads:>8} {len(latencies) / DURATION_SECONDS:>12,.0f} {p50:>9.3f} {p99:>9.3f}")
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or DEFAULT_THREADS
+    run(counts)
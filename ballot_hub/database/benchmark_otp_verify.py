@@ -0,0 +1,96 @@
+"""
+Benchmark OTP verification with and without the otps indexes.
+Seeds a separate benchmark database (never the live one) with N outstanding
+OTPs, then times verify_otp for a sample of them: first against the bare
+collection (collection scan), then after ensure_otp_indexes().
+
+Usage:
+    python database/benchmark_otp_verify.py                 # 1M stored OTPs
+    python database/benchmark_otp_verify.py 10000 100000    # custom sizes
+"""
+import sys
+import os
+import time
+import random
+from datetime import datetime, timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep benchmark data out of the application database
+os.environ.setdefault("MONGO_DB_NAME", "ballot_hub_bench")
+
+from bson import ObjectId
+from database.connection import get_collection
+from utils.otp_service import hash_otp, ensure_otp_indexes
+from utils.otp_store import MongoOtpStore
+
+DEFAULT_SIZES = [1_000_000]
+BATCH_SIZE = 10_000
+# Verifications timed per phase; a collection scan at 1M OTPs is slow, so fewer there
+SAMPLES_UNINDEXED = 20
+SAMPLES_INDEXED = 1000
+
+
+def seed(otp_count: int) -> list:
+    """Store otp_count outstanding OTPs; returns (user_id, code) for each"""
+    otps = get_collection("otps")
+    otps.drop()
+    expires_at = datetime.utcnow() + timedelta(hours=1)
+    issued = []
+    while len(issued) < otp_count:
+        batch = []
+        for _ in range(min(BATCH_SIZE, otp_count - len(issued))):
+            user_id, code = ObjectId(), f"{random.randrange(10 ** 6):06d}"
+            issued.append((str(user_id), code))
+            batch.append({
+                "user_id": user_id, "identifier": "bench@example.com", "otp_hash": hash_otp(code),
+                "expires_at": expires_at, "used": False, "created_at": datetime.utcnow(),
+            })
+        otps.insert_many(batch, ordered=False)
+    return issued
+
+
+def time_verifications(pairs: list) -> list:
+    store = MongoOtpStore()
+    timings = []
+    for user_id, code in pairs:
+        start = time.perf_counter()
+        assert store.verify(user_id, hash_otp(code)), "seeded OTP did not verify"
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)
+
+
+def _plan(user_id: str, code: str) -> str:
+    plan = get_collection("otps").find(MongoOtpStore.match(user_id)).sort(MongoOtpStore.NEWEST_FIRST).explain()["queryPlanner"]["winningPlan"]
+    stages = []
+    while plan:
+        stages.append(plan.get("stage", "?"))
+        plan = plan.get("inputStage")
+    return " <- ".join(stages)
+
+
+def _row(label: str, size: int, timings: list, plan: str) -> None:
+    p50 = timings[len(timings) // 2] * 1000
+    p99 = timings[int(len(timings) * 0.99)] * 1000
+    print(f"{size:>12,} {label:<10} {p50:>9.2f} {p99:>9.2f}  {plan}")
+
+
+def run(sizes):
+    print("=" * 72)
+    print("OTP verification benchmark (MongoDB backend: atomic find_one_and_update)")
+    print("=" * 72)
+    print(f"{'stored OTPs':>12} {'indexes':<10} {'p50 ms':>9} {'p99 ms':>9}  plan")
+    for size in sizes:
+        issued = seed(size)
+        sample = random.sample(issued, min(len(issued), SAMPLES_UNINDEXED + SAMPLES_INDEXED))
+        unindexed, indexed = sample[:SAMPLES_UNINDEXED], sample[SAMPLES_UNINDEXED:]
+
+        _row("none", size, time_verifications(unindexed), _plan(*indexed[0]))
+        ensure_otp_indexes()
+        _row("compound", size, time_verifications(indexed[1:]), _plan(*indexed[0]))
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    run(sizes)
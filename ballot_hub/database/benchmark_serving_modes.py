@@ -0,0 +1,140 @@
+"""
+Benchmark concurrent-connection capacity: threaded Flask vs the async
+(Quart + Motor) serving mode.
+Each mode is started as a subprocess against a separate benchmark database
+(never the live one). N keep-alive connections then hammer
+GET /api/vote_status for a fixed time, each with its own user token. The
+voted cache and filter are disabled in the servers so every request queries
+MongoDB.
+Needs requirements-async.txt installed.
+
+Usage:
+    python database/benchmark_serving_modes.py                 # 50, 200, 1000 connections x 10s
+    python database/benchmark_serving_modes.py 20 100 500      # custom connection counts
+"""
+import sys
+import os
+import time
+import asyncio
+import secrets
+import subprocess
+import urllib.request
+from datetime import datetime, timedelta
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add parent directory to path
+sys.path.insert(0, APP_DIR)
+
+# Keep benchmark data out of the application database
+os.environ.setdefault("MONGO_DB_NAME", "ballot_hub_bench")
+os.environ.setdefault("JWT_SECRET_KEY", secrets.token_urlsafe(48))
+
+from bson import ObjectId
+from database.connection import get_collection
+
+DURATION_SECONDS = 10
+SERVERS = {
+    "threaded": "from app import create_app; create_app().run(host='127.0.0.1', port={port}, threaded=True)",
+    "async": "from asgi import serve; serve(host='127.0.0.1', port={port})",
+}
+SERVER_ENV = {"VOTED_CACHE_MAX_USERS": "0", "VOTED_FILTER_ENABLED": "false", "ADMISSION_CONTROL_ENABLED": "false"}
+
+
+def _seed_election() -> None:
+    now = datetime.utcnow()
+    elections = get_collection("elections")
+    elections.delete_many({})
+    elections.insert_one({
+        "election_name": "Benchmark", "start_date": now - timedelta(hours=1),
+        "end_date": now + timedelta(hours=1), "status": "active",
+    })
+
+
+def _tokens(count: int) -> list:
+    from app import create_app
+    from flask_jwt_extended import create_access_token
+    with create_app().app_context():
+        return [create_access_token(identity=str(ObjectId()), additional_claims={"role": "user"}) for _ in range(count)]
+
+
+def _start(mode: str, port: int) -> subprocess.Popen:
+    env = {**os.environ, **SERVER_ENV}
+    proc = subprocess.Popen([sys.executable, "-c", SERVERS[mode].format(port=port)], cwd=APP_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{mode} server did not start on port {port}")
+
+
+async def _client(port: int, token: str, stop_at: float, latencies: list, errors: list) -> None:
+    request = (f"GET /api/vote_status HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+               f"Authorization: Bearer {token}\r\n\r\n").encode()
+    reader = writer = None
+    while time.perf_counter() < stop_at:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), 5)
+            start = time.perf_counter()
+            writer.write(request)
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+            headers = head.decode("latin-1").lower()
+            length = int(headers.split("content-length:")[1].split("\r\n")[0])
+            await asyncio.wait_for(reader.readexactly(length), 10)
+            if not headers.startswith("http/1.1 200") and not headers.startswith("http/1.0 200"):
+                errors.append(headers.split("\r\n")[0])
+            else:
+                latencies.append(time.perf_counter() - start)
+            if "connection: close" in headers or headers.startswith("http/1.0"):
+                writer.close()
+                writer = None
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def _load(port: int, tokens: list) -> tuple:
+    latencies, errors = [], []
+    stop_at = time.perf_counter() + DURATION_SECONDS
+    await asyncio.gather(*[_client(port, token, stop_at, latencies, errors) for token in tokens])
+    return latencies, errors
+
+
+def run(connection_counts: list):
+    _seed_election()
+    tokens = _tokens(max(connection_counts))
+
+    print("=" * 72)
+    print(f"Serving mode benchmark (GET /api/vote_status, {DURATION_SECONDS}s per run)")
+    print("=" * 72)
+    print(f"{'mode':<10} {'conns':>6} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    for i, mode in enumerate(SERVERS):
+        port = 5100 + i
+        proc = _start(mode, port)
+        try:
+            for conns in connection_counts:
+                latencies, errors = asyncio.run(_load(port, tokens[:conns]))
+                latencies.sort()
+                p50 = latencies[len(latencies) // 2] * 1000 if latencies else float("nan")
+                p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float("nan")
+                print(f"{mode:<10} {conns:>6} {len(latencies) / DURATION_SECONDS:>10,.0f} "
+                      f"{p50:>9.1f} {p99:>9.1f} {len(errors):>8}")
+        finally:
+            proc.terminate()
+            proc.wait(10)
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [50, 200, 1000]
+    run(counts)
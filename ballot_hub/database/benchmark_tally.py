@@ -0,0 +1,95 @@
+"""
+Benchmark the election tally: per-candidate count_documents vs single
+aggregation vs materialized tallies.
+Seeds a separate benchmark database (never the live one) and times each path.
+
+Usage:
+    python database/benchmark_tally.py                 # 10k, 1M and 10M votes
+    python database/benchmark_tally.py 10000 100000    # custom sizes
+"""
+import sys
+import os
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep benchmark data out of the application database
+os.environ.setdefault("MONGO_DB_NAME", "ballot_hub_bench")
+
+from bson import ObjectId
+from database.connection import get_collection
+from models.votes_model import count_votes, count_votes_aggregate, count_votes_per_candidate
+from models.tally_model import reconcile_tallies, TALLY_BACKFILL_ID
+
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+CANDIDATES = 40
+BATCH_SIZE = 10_000
+RUNS = 3
+
+
+def seed(vote_count: int) -> str:
+    """Create one election with CANDIDATES candidates and vote_count votes"""
+    candidates = get_collection("candidates")
+    votes = get_collection("votes")
+    candidates.delete_many({})
+    votes.delete_many({})
+    votes.create_index([("user_id", 1), ("election_id", 1)], unique=True)
+    votes.create_index([("election_id", 1), ("candidate_id", 1)])
+
+    election_oid = ObjectId()
+    candidate_oids = candidates.insert_many([
+        {"candidate_name": f"Candidate {i:02d}", "election_id": election_oid, "photo": ""}
+        for i in range(CANDIDATES)
+    ]).inserted_ids
+
+    inserted = 0
+    while inserted < vote_count:
+        size = min(BATCH_SIZE, vote_count - inserted)
+        votes.insert_many([
+            {
+                "user_id": ObjectId(),
+                "candidate_id": candidate_oids[(inserted + i) % CANDIDATES],
+                "election_id": election_oid,
+            }
+            for i in range(size)
+        ], ordered=False)
+        inserted += size
+
+    # Populate the materialized tallies from the raw votes
+    get_collection("tallies").delete_many({})
+    # Nothing else is writing, so there is no need to wait for votes in flight
+    reconcile_tallies(str(election_oid), settle_seconds=0)
+    # The tallies now hold every vote, so count_votes reads them instead of counting
+    get_collection("settings").update_one({"_id": TALLY_BACKFILL_ID}, {"$set": {"done": True}}, upsert=True)
+    return str(election_oid)
+
+
+def best_of(fn, election_id: str) -> float:
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn(election_id)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(sizes):
+    print("=" * 60)
+    print(f"Tally benchmark ({CANDIDATES} candidates, best of {RUNS})")
+    print("=" * 60)
+    print(f"{'votes':>12} {'per-candidate':>16} {'aggregation':>14} {'tallies':>12}")
+    for size in sizes:
+        election_id = seed(size)
+        expected = count_votes_per_candidate(election_id)
+        assert count_votes_aggregate(election_id) == expected
+        assert count_votes(election_id) == expected
+        old = best_of(count_votes_per_candidate, election_id)
+        agg = best_of(count_votes_aggregate, election_id)
+        tally = best_of(count_votes, election_id)
+        print(f"{size:>12,} {old * 1000:>14.1f}ms {agg * 1000:>12.1f}ms {tally * 1000:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    run(sizes)
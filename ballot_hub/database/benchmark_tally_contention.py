@@ -0,0 +1,59 @@
+"""
+Benchmark tally write contention: 64 concurrent writers voting for one
+candidate, with the counter kept in 1 stripe vs 16 stripes.
+Uses a separate benchmark database (never the live one).
+
+Usage:
+    python database/benchmark_tally_contention.py            # 2000 increments per writer
+    python database/benchmark_tally_contention.py 500        # custom increments per writer
+"""
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep benchmark data out of the application database
+os.environ.setdefault("MONGO_DB_NAME", "ballot_hub_bench")
+
+from bson import ObjectId
+from database.connection import get_collection
+from models.tally_model import increment_tally, get_tallies
+
+WRITERS = 64
+STRIPE_COUNTS = [1, 16]
+DEFAULT_INCREMENTS = 2000
+
+
+def _writer(election_oid: ObjectId, candidate_oid: ObjectId, stripes: int, increments: int) -> None:
+    for _ in range(increments):
+        increment_tally(election_oid, candidate_oid, ObjectId(), stripes=stripes)
+
+
+def run(increments: int):
+    tallies = get_collection("tallies")
+    tallies.create_index([("election_id", 1), ("candidate_id", 1), ("stripe", 1)], unique=True)
+
+    print("=" * 60)
+    print(f"Tally contention benchmark ({WRITERS} writers x {increments} increments, one candidate)")
+    print("=" * 60)
+    print(f"{'stripes':>8} {'seconds':>10} {'increments/s':>14}")
+    for stripes in STRIPE_COUNTS:
+        tallies.delete_many({})
+        election_oid, candidate_oid = ObjectId(), ObjectId()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=WRITERS) as pool:
+            for _ in range(WRITERS):
+                pool.submit(_writer, election_oid, candidate_oid, stripes, increments)
+        elapsed = time.perf_counter() - start
+
+        total = get_tallies(election_oid).get(candidate_oid, 0)
+        assert total == WRITERS * increments, f"lost increments: {total}"
+        print(f"{stripes:>8} {elapsed:>10.2f} {total / elapsed:>14,.0f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_INCREMENTS)
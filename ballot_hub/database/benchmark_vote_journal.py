@@ -0,0 +1,74 @@
+"""
+Benchmark vote acknowledgement throughput: direct insert_one vs the local
+write-ahead journal (acknowledged once flushed to the segment file).
+Uses a separate benchmark database (never the live one).
+
+Usage:
+    python database/benchmark_vote_journal.py              # 16 threads x 1000 votes
+    python database/benchmark_vote_journal.py 32 5000      # custom threads, votes per thread
+"""
+import sys
+import os
+import time
+import tempfile
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep benchmark data out of the application database
+os.environ.setdefault("MONGO_DB_NAME", "ballot_hub_bench")
+
+from bson import ObjectId
+from database.connection import get_collection
+from utils.vote_journal import VoteJournal
+
+
+def _vote(election_oid: ObjectId, candidate_oid: ObjectId) -> dict:
+    return {
+        "user_id": ObjectId(),
+        "candidate_id": candidate_oid,
+        "election_id": election_oid,
+        "timestamp": datetime.utcnow(),
+    }
+
+
+def _timed(threads: int, per_thread: int, write) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for _ in range(threads):
+            pool.submit(lambda: [write() for _ in range(per_thread)])
+    return time.perf_counter() - start
+
+
+def run(threads: int, per_thread: int):
+    votes = get_collection("votes")
+    votes.delete_many({})
+    votes.create_index([("user_id", 1), ("election_id", 1)], unique=True)
+    election_oid, candidate_oid = ObjectId(), ObjectId()
+    total = threads * per_thread
+
+    print("=" * 60)
+    print(f"Vote journal benchmark ({threads} threads x {per_thread} votes)")
+    print("=" * 60)
+
+    direct = _timed(threads, per_thread, lambda: votes.insert_one(_vote(election_oid, candidate_oid)))
+    print(f"{'direct insert_one':<24} {direct:>8.2f}s {total / direct:>12,.0f} votes/s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        journal = VoteJournal(directory)
+        journaled = _timed(threads, per_thread, lambda: journal.append(_vote(election_oid, candidate_oid)))
+        print(f"{'journal append':<24} {journaled:>8.2f}s {total / journaled:>12,.0f} votes/s")
+
+        start = time.perf_counter()
+        while journal.backlog()["pending_votes"]:
+            time.sleep(0.05)
+        print(f"{'journal drain lag':<24} {time.perf_counter() - start:>8.2f}s")
+
+    assert votes.count_documents({"election_id": election_oid}) == 2 * total
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(args[0] if args else 16, args[1] if len(args) > 1 else 1000)
@@ -0,0 +1,45 @@
+"""
+Check with explain() that the login and registration email lookups are
+served by the email_key index (IXSCAN) rather than a collection scan.
+Exits non-zero if either lookup would scan the collection.
+
+Usage:
+    python database/check_email_index.py [email]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import get_collection
+from models.user_model import _email_key_query, _legacy_email_query
+
+
+def _stages(plan: dict) -> list:
+    """Stage names of a query plan tree, root first"""
+    stages = [plan.get("stage")]
+    for child in plan.get("inputStages", []) + [plan[key] for key in ("inputStage", "queryPlan") if key in plan]:
+        stages.extend(_stages(child))
+    return [stage for stage in stages if stage]
+
+
+def check_email_index(email: str = "Someone@Example.com") -> bool:
+    users = get_collection("users")
+    lookups = {
+        "login": users.find(_email_key_query(email)),
+        "registration": users.find(_email_key_query(email), {"status": 1}),
+    }
+    ok = True
+    for name, cursor in lookups.items():
+        stages = _stages(cursor.explain()["queryPlanner"]["winningPlan"])
+        uses_index = "IXSCAN" in stages and "COLLSCAN" not in stages
+        ok = ok and uses_index
+        print(f"{'✓' if uses_index else '✗'} {name:<13} {' <- '.join(stages)}")
+
+    # For comparison: the case-insensitive regex the lookups used to run
+    legacy = _stages(users.find(_legacy_email_query(email)).explain()["queryPlanner"]["winningPlan"])
+    print(f"  {'old regex':<13} {' <- '.join(legacy)}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_email_index(*sys.argv[1:2]) else 1)
@@ -11,7 +11,8 @@ def get_client() -> MongoClient:
     global _client
     if _client is None:
         try:
-            _client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+            from utils.admission import DBLatencyListener
+            _client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000, event_listeners=[DBLatencyListener()])
             # Test connection
             _client.server_info()
         except (ConnectionFailure, ServerSelectionTimeoutError) as e:
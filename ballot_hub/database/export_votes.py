@@ -0,0 +1,47 @@
+"""
+Export an election's raw votes for auditors as NDJSON or CSV.
+Streams from a batched cursor, so memory stays flat for any election size.
+
+Usage:
+    python database/export_votes.py <election_id>                          # NDJSON to stdout
+    python database/export_votes.py <election_id> --format csv --gzip -o votes.csv.gz
+"""
+import sys
+import os
+import argparse
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.vote_export import export_votes, EXPORT_FORMATS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export an election's votes")
+    parser.add_argument("election_id")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    args = parser.parse_args()
+
+    try:
+        chunks = export_votes(args.election_id, args.format, args.gzip)
+    except ValueError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    written = 0
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            out.close()
+    if args.output:
+        print(f"✓ Wrote {written:,} bytes to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
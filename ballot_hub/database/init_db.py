@@ -2,10 +2,8 @@
 Auto-initialize MongoDB database with collections, indexes, and seed data.
 Run this once or let app.py call it on startup.
 """
-import bcrypt
 from datetime import datetime, timedelta
 from database.connection import get_db, get_collection
-from config import PASSWORD_HASH_ROUNDS
 
 
 def init_database():
@@ -18,7 +16,7 @@ def init_database():
         db = get_db()
         
         # Create collections (MongoDB creates them automatically on first insert, but we'll ensure they exist)
-        collections = ["users", "admins", "elections", "candidates", "votes", "otps"]
+        collections = ["users", "admins", "elections", "candidates", "votes", "otps", "tallies", "election_results", "finalize_claims", "vote_journal_backlog", "late_votes", "settings"]
         for coll_name in collections:
             if coll_name not in db.list_collection_names():
                 db.create_collection(coll_name)
@@ -35,7 +33,14 @@ def init_database():
             print("✓ Created email index")
         else:
             print("✓ Email index already exists")
-        
+
+        # Normalized email_key for indexed case-insensitive lookups (resumes an interrupted backfill)
+        from database.backfill_email_key import backfill_email_keys, ensure_email_key_index
+        backfilled = backfill_email_keys()
+        if backfilled:
+            print(f"✓ Backfilled email_key for {backfilled} user(s)")
+        ensure_email_key_index()
+
         # Remove phone_hash index if it exists (no longer needed)
         if 'phone_hash_1' in existing_indexes:
             try:
@@ -44,6 +49,9 @@ def init_database():
             except Exception as e:
                 print(f"⚠️  Could not remove phone_hash index: {e}")
         
+        # Counting approved voters (turnout denominator) and listing pending registrations
+        users.create_index("status")
+
         admins = get_collection("admins")
         admins.create_index("username", unique=True)
         
@@ -55,15 +63,47 @@ def init_database():
         
         votes = get_collection("votes")
         votes.create_index([("user_id", 1), ("election_id", 1)], unique=True)
-        votes.create_index([("candidate_id", 1), ("election_id", 1)])
+        # Covers the $match/$group tally in votes_model.count_votes
+        votes.create_index([("election_id", 1), ("candidate_id", 1)])
+        # Superseded by (election_id, candidate_id): no query filters on candidate_id alone
+        if 'candidate_id_1_election_id_1' in [idx['name'] for idx in votes.list_indexes()]:
+            votes.drop_index('candidate_id_1_election_id_1')
+            print("✓ Removed (candidate_id, election_id) votes index (superseded)")
+
+        tallies = get_collection("tallies")
+        tally_indexes = [idx['name'] for idx in tallies.list_indexes()]
+        if 'election_id_1_candidate_id_1' in tally_indexes:
+            # Pre-striping counters: one document per candidate becomes stripe 0
+            tallies.drop_index('election_id_1_candidate_id_1')
+            tallies.update_many({"stripe": {"$exists": False}}, {"$set": {"stripe": 0}})
+            print("✓ Migrated tallies to striped counters")
+        tallies.create_index([("election_id", 1), ("candidate_id", 1), ("stripe", 1)], unique=True)
+
+        # Count votes recorded before tallies existed (resumes an interrupted backfill)
+        from database.backfill_tallies import backfill_tallies
+        corrected = backfill_tallies()
+        if corrected:
+            print(f"✓ Backfilled tallies: corrected {corrected} counter(s)")
+
+        # OTP lookup index + TTL purge of expired/used OTPs
+        from utils.otp_service import ensure_otp_indexes
+        ensure_otp_indexes()
+
+        from utils.login_limiter import ensure_indexes as ensure_login_limiter_indexes
+        ensure_login_limiter_indexes()
+
+        from models.turnout_model import ensure_turnout_collection
+        if ensure_turnout_collection():
+            print("✓ Turnout buckets use a time-series collection")
+        
+        # Calibrate (or load) the fleet-wide bcrypt cost before the first login needs it
+        from utils.hash_pool import hash_pool
+        print(f"✓ Password hashing cost: {hash_pool.target_rounds()}")
         
         # Seed admin user if not exists
         admin_exists = admins.find_one({"username": "admin"})
         if not admin_exists:
-            admin_password = bcrypt.hashpw(
-                b"AdminPass123",
-                bcrypt.gensalt(rounds=PASSWORD_HASH_ROUNDS)
-            ).decode("utf-8")
+            admin_password = hash_pool.hash_password("AdminPass123")
             admins.insert_one({
                 "username": "admin",
                 "password": admin_password
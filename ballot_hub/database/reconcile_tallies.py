@@ -0,0 +1,50 @@
+"""
+Recompute materialized vote tallies from raw votes and report drift.
+
+Usage:
+    python database/reconcile_tallies.py                # all elections
+    python database/reconcile_tallies.py <election_id>  # one election
+    python database/reconcile_tallies.py --dry-run      # report only, do not fix
+
+Drift is measured twice, TALLY_RECONCILE_SETTLE_SECONDS apart; counters whose
+drift changed in between (votes still being counted) are listed as
+unconfirmed and left alone. Run it again once voting has quietened.
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import get_collection
+from models.tally_model import reconcile_tallies
+
+
+def reconcile(election_ids, fix=True):
+    print("=" * 60)
+    print("Reconciling Vote Tallies" + ("" if fix else " (dry run)"))
+    print("=" * 60)
+
+    if not election_ids:
+        election_ids = [str(e["_id"]) for e in get_collection("elections").find({}, {"_id": 1})]
+
+    total_drift = 0
+    for election_id in election_ids:
+        report = reconcile_tallies(election_id, fix=fix)
+        total_drift += len(report["drift"])
+        for entry in report["unconfirmed"]:
+            print(f"ℹ️  {election_id}: {entry['candidate_id']} changed while checking, skipped")
+        if not report["drift"]:
+            print(f"✓ {election_id}: {report['candidates_checked']} candidate(s), no drift")
+            continue
+        print(f"⚠️  {election_id}: {len(report['drift'])} drifted counter(s)")
+        for entry in report["drift"]:
+            print(f"    {entry['candidate_id']}: tally={entry['tally']} actual={entry['actual']} delta={entry['delta']:+d}")
+
+    print(f"\nDone. {total_drift} drifted counter(s){' corrected' if fix and total_drift else ''}.")
+    return total_drift
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    reconcile(args, fix="--dry-run" not in sys.argv)
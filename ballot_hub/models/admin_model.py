@@ -1,7 +1,7 @@
 from typing import Optional, Dict, Any
-import bcrypt
 from bson import ObjectId
 from database.connection import get_collection
+from utils.hash_pool import hash_pool
 
 
 def admin_login(username: str, password: str) -> Optional[Dict[str, Any]]:
@@ -9,8 +9,12 @@ def admin_login(username: str, password: str) -> Optional[Dict[str, Any]]:
     admin = admins.find_one({"username": username})
     if not admin:
         return None
-    if not bcrypt.checkpw(password.encode("utf-8"), admin["password"].encode("utf-8")):
+    if not hash_pool.verify_password(password, admin["password"]):
         return None
+    admin_oid, old_hash = admin["_id"], admin["password"]
+    hash_pool.rehash_later(password, old_hash, lambda new_hash: admins.update_one(
+        {"_id": admin_oid, "password": old_hash}, {"$set": {"password": new_hash}}
+    ))
     admin["admin_id"] = str(admin["_id"])
     admin.pop("_id", None)
     admin.pop("password", None)
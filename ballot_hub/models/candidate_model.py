@@ -1,6 +1,7 @@
 from typing import List, Dict, Any
 from bson import ObjectId
 from database.connection import get_collection
+from utils import catalog
 
 
 def add_candidate(name: str, election_id: str, photo: str = "") -> bool:
@@ -17,17 +18,13 @@ def add_candidate(name: str, election_id: str, photo: str = "") -> bool:
             "photo": photo,
         }
     )
+    catalog.invalidate_candidates(election_id)
     return True
 
 
 def get_candidates(election_id: str) -> List[Dict[str, Any]]:
-    from bson.errors import InvalidId
-    candidates = get_collection("candidates")
-    try:
-        election_oid = ObjectId(election_id)
-    except (InvalidId, ValueError):
-        raise ValueError(f"Invalid election_id: {election_id}")
-    docs = list(candidates.find({"election_id": election_oid}))
+    """Candidates for an election (served from the catalog cache)"""
+    docs = catalog.get_election_candidates(election_id)
     result: List[Dict[str, Any]] = []
     for doc in docs:
         result.append(
@@ -2,22 +2,29 @@ from typing import Optional, Dict, Any, List
 from datetime import datetime
 from bson import ObjectId
 from database.connection import get_collection
+from config import DEFAULT_TALLY_STRIPES
+from utils import catalog
 
 DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 
-def create_election(election_name: str, start_date: str, end_date: str, status: str = "active") -> bool:
+def create_election(election_name: str, start_date: str, end_date: str, status: str = "active",
+                    tally_stripes: int = DEFAULT_TALLY_STRIPES) -> bool:
     elections = get_collection("elections")
     start_dt = datetime.strptime(start_date, DATETIME_FORMAT)
     end_dt = datetime.strptime(end_date, DATETIME_FORMAT)
+    if tally_stripes < 1:
+        raise ValueError(f"Invalid tally_stripes: {tally_stripes}. Must be at least 1")
     elections.insert_one(
         {
             "election_name": election_name,
             "start_date": start_dt,
             "end_date": end_dt,
             "status": status,
+            "tally_stripes": tally_stripes,
         }
     )
+    catalog.invalidate_elections()
     return True
 
 
@@ -28,16 +35,8 @@ def get_active_election() -> Optional[Dict[str, Any]]:
 
 
 def get_all_active_elections() -> List[Dict[str, Any]]:
-    """Get all active elections that are currently within their date range"""
-    elections = get_collection("elections")
-    now = datetime.utcnow()
-    docs = list(elections.find(
-        {
-            "status": "active",
-            "start_date": {"$lte": now},
-            "end_date": {"$gte": now},
-        }
-    ).sort("start_date", -1))
+    """Get all active elections that are currently within their date range (served from the catalog cache)"""
+    docs = catalog.get_active_elections()
     
     result = []
     for doc in docs:
@@ -97,9 +96,14 @@ def update_election_status(election_id: str, status: str) -> bool:
             {"_id": ObjectId(election_id)},
             {"$set": {"status": status}}
         )
-        return result.modified_count > 0
     except (InvalidId, ValueError):
         raise ValueError(f"Invalid election_id: {election_id}")
+    catalog.invalidate_elections()
+    # Closing out an election after its end time freezes the final results (in the background)
+    from models.results_model import start_finalize
+    if result.matched_count:
+        start_finalize(election_id)
+    return result.modified_count > 0
 
 
 def delete_election(election_id: str) -> Dict[str, Any]:
@@ -132,9 +136,22 @@ def delete_election(election_id: str) -> Dict[str, Any]:
     
     # Delete associated candidates
     candidates.delete_many({"election_id": election_oid})
+
+    # Delete materialized tallies
+    from models.tally_model import delete_tallies
+    from utils.results_cache import invalidate_results
+    delete_tallies(election_oid)
+    invalidate_results(election_id)
+    get_collection("turnout").delete_many({"election_id": election_oid})
+    from models.results_model import forget_election
+    from utils import voted_filter
+    forget_election(election_id)
+    voted_filter.forget_election(election_id)
     
     # Delete the election
     elections.delete_one({"_id": election_oid})
+    catalog.invalidate_elections()
+    catalog.invalidate_candidates(election_id)
     
     return {
         "success": True,
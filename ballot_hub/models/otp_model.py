@@ -2,44 +2,52 @@
 OTP model for managing OTP generation and verification
 """
 from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
-from database.connection import get_collection
-from utils.otp_service import generate_otp, hash_otp, verify_otp as verify_otp_service
-from utils.email_service import send_otp_email
+from utils.otp_service import generate_otp, verify_otp as verify_otp_service
+from utils.otp_dispatch import otp_dispatcher, DispatchQueueFull
+
+
+def _dispatch_otp(user_id: str, email: str, otp: str, user_name: str) -> Dict[str, Any]:
+    """Queue the OTP email (the OTP is already stored) and describe the result"""
+    try:
+        delivery_id = otp_dispatcher.submit(str(user_id), email, otp, user_name)
+    except DispatchQueueFull:
+        return {"success": False, "busy": True, "message": "Too many sign-ins in progress. Please retry shortly."}
+    
+    # Return success (OTP not included in response for security)
+    return {
+        "success": True,
+        "message": "OTP is being sent to your registered email address",
+        "delivery_id": delivery_id,
+        "expires_in": 5  # minutes
+    }
 
 
 def generate_and_send_otp(user_id: str, email: str, user_name: str = "User") -> Dict[str, Any]:
     """
-    Generate OTP, send it to user's email, and store it
-    Returns OTP details (for development/testing)
+    Generate and store an OTP, then queue it for delivery to the user's email.
+    Returns as soon as the OTP is stored; see otp_delivery_status
     """
     from utils.otp_service import store_otp
-    from bson import ObjectId
-    
-    # Convert user_id to ObjectId if it's a string
-    if isinstance(user_id, str):
-        try:
-            user_id = ObjectId(user_id)
-        except:
-            pass
     
     # Generate 6-digit OTP
     otp = generate_otp(6)
     
-    # Send OTP to email
-    sent = send_otp_email(email, otp, user_name)
-    if not sent:
-        return {"success": False, "message": "Failed to send OTP email"}
-    
-    # Store OTP in database (using email as identifier)
+    # Store OTP (using email as identifier) before it can reach the user
     store_otp(str(user_id), email, otp, expires_in_minutes=5)
+    return _dispatch_otp(user_id, email, otp, user_name)
+
+
+async def generate_and_send_otp_async(user_id: str, email: str, user_name: str = "User") -> Dict[str, Any]:
+    """generate_and_send_otp for the async serving mode (OTP stored with the Motor driver)"""
+    from utils.otp_service import store_otp_async
     
-    # Return success (OTP not included in response for security)
-    return {
-        "success": True,
-        "message": "OTP sent to your registered email address",
-        "expires_in": 5  # minutes
-    }
+    otp = generate_otp(6)
+    await store_otp_async(str(user_id), email, otp, expires_in_minutes=5)
+    return _dispatch_otp(user_id, email, otp, user_name)
+
+
+def otp_delivery_status(delivery_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    return otp_dispatcher.status(delivery_id, user_id)
 
 
 def verify_user_otp(user_id: str, otp: str) -> bool:
@@ -49,4 +57,9 @@ def verify_user_otp(user_id: str, otp: str) -> bool:
     return verify_otp_service(user_id, otp)
 
 
+async def verify_user_otp_async(user_id: str, otp: str) -> bool:
+    from utils.otp_service import verify_otp_async
+    return await verify_otp_async(user_id, otp)
+
+
 
@@ -0,0 +1,236 @@
+"""
+Frozen final results.
+Once an election's end_date (plus a short grace period) has passed, its tally
+can no longer change. finalize_election writes an immutable `election_results`
+document with the counts, the total and a checksum over every vote, and from
+then on results are served from that snapshot. record_vote rejects votes for
+elections whose end_date has passed, so a snapshot never goes stale.
+
+Counting and checksumming every vote takes a while for a large election, so
+it runs as a background job (start_finalize). A claim document in
+`finalize_claims` makes sure only one worker runs the job; requests made
+meanwhile are told the election is "finalizing". A claim older than
+FINALIZE_CLAIM_TIMEOUT_SECONDS belongs to a dead worker and is taken over.
+The job first waits for votes still in any worker's vote journal
+(utils.vote_journal); if they do not drain in time it gives up and the next
+request starts it again.
+"""
+import asyncio
+import hashlib
+import os
+import socket
+import threading
+from typing import Dict, Any, Optional, Set, Tuple
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from database.connection import get_collection
+from utils import catalog
+from config import FINALIZE_GRACE_SECONDS, FINALIZE_CLAIM_TIMEOUT_SECONDS, FINALIZE_JOURNAL_WAIT_SECONDS
+
+
+class ElectionClosedError(Exception):
+    """Raised when a vote arrives for an election that is not open; str() is the user-facing reason"""
+
+
+_lock = threading.Lock()
+# Snapshots are immutable, so they are cached for the life of the process
+_snapshots: Dict[str, Dict[str, Any]] = {}
+# Elections this process is finalizing right now
+_jobs: Set[str] = set()
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def get_end_date(election_id: str) -> Optional[datetime]:
+    doc = catalog.get_election(election_id)
+    if not doc or not isinstance(doc.get("end_date"), datetime):
+        return None
+    return doc["end_date"]
+
+
+def _check_open(doc: Optional[Dict[str, Any]]) -> None:
+    now = datetime.utcnow()
+    start_date = (doc or {}).get("start_date")
+    end_date = (doc or {}).get("end_date")
+    if isinstance(end_date, datetime) and now > end_date:
+        raise ElectionClosedError("This election has ended. Votes are no longer accepted.")
+    if doc is None or doc.get("status") != "active" or (isinstance(start_date, datetime) and now < start_date):
+        raise ElectionClosedError("This election is not open for voting")
+
+
+def ensure_election_open(election_id: str) -> None:
+    """
+    Raise ElectionClosedError unless the election is active and within its
+    dates, checked against the catalog so a vote costs no extra read. The
+    dates are compared on every call, so an election stops taking votes the
+    moment it ends; a status change invalidates the catalog in the worker
+    that made it and reaches the others within CATALOG_CACHE_TTL_SECONDS.
+    """
+    _check_open(catalog.get_election(election_id))
+
+
+async def ensure_election_open_async(election_id: str) -> None:
+    """ensure_election_open off the event loop (the catalog blocks while it reloads)"""
+    _check_open(await asyncio.to_thread(catalog.get_election, election_id))
+
+
+def is_finalizable(election_id: str) -> bool:
+    end_date = get_end_date(election_id)
+    return end_date is not None and datetime.utcnow() > end_date + timedelta(seconds=FINALIZE_GRACE_SECONDS)
+
+
+def compute_votes_checksum(election_oid: ObjectId) -> Dict[str, Any]:
+    """
+    Order-independent SHA-256 checksum over (vote_id, user_id, candidate_id).
+    Per-vote digests are summed modulo 2**256, so no sort is needed and the
+    votes are streamed through a batched cursor.
+    """
+    from utils.vote_export import iter_votes
+    acc = 0
+    count = 0
+    for vote in iter_votes(election_oid):
+        line = f"{vote['vote_id']}:{vote['user_id']}:{vote['candidate_id']}".encode("utf-8")
+        acc = (acc + int.from_bytes(hashlib.sha256(line).digest(), "big")) % (1 << 256)
+        count += 1
+    return {"checksum": f"{acc:064x}", "vote_count": count}
+
+
+def finalize_election(election_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Write the immutable result snapshot for an ended election.
+    Idempotent: returns the existing snapshot if one was already written.
+    Returns None if the election does not exist, has not ended yet, or still
+    has journaled votes waiting to drain.
+    """
+    from models.votes_model import count_votes_aggregate
+    existing = get_final_results(election_id)
+    if existing is not None:
+        return existing
+    if not is_finalizable(election_id):
+        return None
+
+    election_oid = ObjectId(election_id)
+    # The catalog may be stale (end_date moved by another worker); the snapshot must not be
+    election = get_collection("elections").find_one({"_id": election_oid})
+    end_date = (election or {}).get("end_date")
+    if not isinstance(end_date, datetime) or datetime.utcnow() <= end_date + timedelta(seconds=FINALIZE_GRACE_SECONDS):
+        catalog.invalidate_elections()
+        return None
+    # Votes acknowledged from a worker's journal before end_date may not be in MongoDB yet
+    from utils.vote_journal import wait_for_backlog
+    if not wait_for_backlog(election_oid, FINALIZE_JOURNAL_WAIT_SECONDS):
+        print(f"⚠️  Election {election_id} still has journaled votes to drain; finalizing later")
+        return None
+
+    # Count from raw votes, not tallies, so drift cannot be frozen in
+    results = count_votes_aggregate(election_id)
+    checksum = compute_votes_checksum(election_oid)
+    snapshot = {
+        "_id": election_oid,
+        "election_id": election_id,
+        "election_name": election.get("election_name", ""),
+        "results": results,
+        "total_votes": sum(r["total_votes"] for r in results),
+        "vote_count": checksum["vote_count"],
+        "checksum": checksum["checksum"],
+        "finalized_at": datetime.utcnow(),
+    }
+    try:
+        get_collection("election_results").insert_one(snapshot)
+    except DuplicateKeyError:
+        # Another worker finalized first; theirs is the snapshot of record
+        return get_final_results(election_id)
+    get_collection("elections").update_one({"_id": election_oid}, {"$set": {"finalized": True}})
+    with _lock:
+        _snapshots[election_id] = snapshot
+    print(f"✓ Finalized election {election_id}: {snapshot['total_votes']} vote(s)")
+    return snapshot
+
+
+def get_final_results(election_id: str) -> Optional[Dict[str, Any]]:
+    """Return the snapshot for a finalized election, or None"""
+    with _lock:
+        snapshot = _snapshots.get(election_id)
+    if snapshot is not None:
+        return snapshot
+    if not is_finalizable(election_id):
+        return None
+    snapshot = get_collection("election_results").find_one({"_id": ObjectId(election_id)})
+    if snapshot is not None:
+        with _lock:
+            _snapshots[election_id] = snapshot
+    return snapshot
+
+
+def _claim_finalize(election_oid: ObjectId) -> bool:
+    """Take the cluster-wide right to finalize an election"""
+    claims = get_collection("finalize_claims")
+    now = datetime.utcnow()
+    try:
+        claims.insert_one({"_id": election_oid, "owner": _OWNER, "claimed_at": now})
+        return True
+    except DuplicateKeyError:
+        pass
+    # Held already; take it over only if its owner has been at it for too long
+    stale = now - timedelta(seconds=FINALIZE_CLAIM_TIMEOUT_SECONDS)
+    return claims.find_one_and_update(
+        {"_id": election_oid, "claimed_at": {"$lt": stale}},
+        {"$set": {"owner": _OWNER, "claimed_at": now}},
+    ) is not None
+
+
+def _finalize_job(election_id: str) -> None:
+    try:
+        finalize_election(election_id)
+    except Exception as e:
+        print(f"❌ Finalizing election {election_id} failed: {e}")
+    finally:
+        try:
+            get_collection("finalize_claims").delete_one({"_id": ObjectId(election_id), "owner": _OWNER})
+        except PyMongoError as e:
+            print(f"⚠️  Could not release finalize claim for {election_id} (expires on its own): {e}")
+        with _lock:
+            _jobs.discard(election_id)
+
+
+def start_finalize(election_id: str) -> str:
+    """
+    Make sure an ended election gets finalized, without waiting for it.
+    Returns "final" once the snapshot exists, "finalizing" while a job runs
+    (here or in another worker), or "open" if the election has not ended.
+    """
+    if get_final_results(election_id) is not None:
+        return "final"
+    if not is_finalizable(election_id):
+        return "open"
+    with _lock:
+        if election_id in _jobs:
+            return "finalizing"
+        _jobs.add(election_id)
+    try:
+        claimed = _claim_finalize(ObjectId(election_id))
+    except Exception:
+        with _lock:
+            _jobs.discard(election_id)
+        raise
+    if not claimed:
+        with _lock:
+            _jobs.discard(election_id)
+        # The other worker's job may have finished in the meantime
+        return "final" if get_final_results(election_id) is not None else "finalizing"
+    threading.Thread(target=_finalize_job, args=(election_id,), name=f"finalize-{election_id}", daemon=True).start()
+    return "finalizing"
+
+
+def get_or_finalize_results(election_id: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """(state, snapshot) as for start_finalize, with the snapshot only in the "final" state"""
+    state = start_finalize(election_id)
+    return state, get_final_results(election_id) if state == "final" else None
+
+
+def forget_election(election_id: str) -> None:
+    """Drop cached state and the snapshot for a deleted election"""
+    with _lock:
+        _snapshots.pop(election_id, None)
+    get_collection("election_results").delete_one({"_id": ObjectId(election_id)})
+    get_collection("finalize_claims").delete_one({"_id": ObjectId(election_id)})
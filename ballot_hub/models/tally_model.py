@@ -0,0 +1,228 @@
+"""
+Materialized per-candidate vote tallies.
+Each candidate's count is spread across N stripe documents keyed by
+(election_id, candidate_id, stripe) and maintained with $inc by record_vote,
+so concurrent voters for a popular candidate do not all contend on one
+document. Reads sum the stripes in O(candidates * stripes).
+Votes recorded before tallies existed are counted into them by
+database/backfill_tallies.py; until it has finished, count_votes counts raw
+votes instead (tallies_backfilled).
+"""
+import time
+import zlib
+from typing import Dict, Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from bson import ObjectId
+from database.connection import get_collection
+from config import TALLY_RECONCILE_WORKERS, TALLY_RECONCILE_SETTLE_SECONDS, DEFAULT_TALLY_STRIPES
+
+# election_id -> stripe count; stripe counts are set at creation and never change
+_stripe_cache: Dict[ObjectId, int] = {}
+# settings document recording the progress of database/backfill_tallies.py
+TALLY_BACKFILL_ID = "tally_backfill"
+# Set once the backfill has finished; until then results are counted from raw votes
+_tallies_backfilled = False
+
+
+def tallies_backfilled() -> bool:
+    """True once every election's tallies include the votes recorded before tallies existed"""
+    global _tallies_backfilled
+    if not _tallies_backfilled:
+        progress = get_collection("settings").find_one({"_id": TALLY_BACKFILL_ID}, {"done": 1})
+        _tallies_backfilled = bool(progress and progress.get("done"))
+    return _tallies_backfilled
+
+
+def _cache_stripes(election_oid: ObjectId, doc: Optional[Dict[str, Any]]) -> int:
+    stripes = max(1, int((doc or {}).get("tally_stripes", DEFAULT_TALLY_STRIPES)))
+    _stripe_cache[election_oid] = stripes
+    return stripes
+
+
+def get_stripe_count(election_oid: ObjectId) -> int:
+    """Stripe count for an election, read from its `tally_stripes` field"""
+    stripes = _stripe_cache.get(election_oid)
+    if stripes is None:
+        elections = get_collection("elections")
+        stripes = _cache_stripes(election_oid, elections.find_one({"_id": election_oid}, {"tally_stripes": 1}))
+    return stripes
+
+
+async def get_stripe_count_async(election_oid: ObjectId) -> int:
+    stripes = _stripe_cache.get(election_oid)
+    if stripes is None:
+        from database.async_connection import get_async_collection
+        elections = get_async_collection("elections")
+        stripes = _cache_stripes(election_oid, await elections.find_one({"_id": election_oid}, {"tally_stripes": 1}))
+    return stripes
+
+
+def pick_stripe(user_oid: ObjectId, stripes: int) -> int:
+    """Stable stripe for a voter; the same user always lands on the same stripe"""
+    return zlib.crc32(user_oid.binary) % stripes
+
+
+def _stripe_filter(election_oid: ObjectId, candidate_oid: ObjectId, user_oid: ObjectId, stripes: int) -> Dict[str, Any]:
+    return {"election_id": election_oid, "candidate_id": candidate_oid, "stripe": pick_stripe(user_oid, stripes)}
+
+
+def increment_tally(election_oid: ObjectId, candidate_oid: ObjectId, user_oid: ObjectId,
+                    amount: int = 1, stripes: Optional[int] = None, session=None) -> None:
+    """Add amount to one stripe of a candidate's counter, creating it if needed"""
+    if stripes is None:
+        stripes = get_stripe_count(election_oid)
+    tallies = get_collection("tallies")
+    tallies.update_one(
+        _stripe_filter(election_oid, candidate_oid, user_oid, stripes),
+        {"$inc": {"count": amount}},
+        upsert=True,
+        session=session,
+    )
+
+
+async def increment_tally_async(election_oid: ObjectId, candidate_oid: ObjectId, user_oid: ObjectId,
+                                amount: int = 1) -> None:
+    """increment_tally on the Motor driver (async serving mode)"""
+    from database.async_connection import get_async_collection
+    stripes = await get_stripe_count_async(election_oid)
+    await get_async_collection("tallies").update_one(
+        _stripe_filter(election_oid, candidate_oid, user_oid, stripes),
+        {"$inc": {"count": amount}},
+        upsert=True,
+    )
+
+
+def increment_tallies(vote_docs: List[Dict[str, Any]], session=None) -> None:
+    """Apply the tally increments for a batch of inserted votes in one bulk write"""
+    from pymongo import UpdateOne
+    increments: Dict[tuple, int] = {}
+    for doc in vote_docs:
+        election_oid = doc["election_id"]
+        stripe = pick_stripe(doc["user_id"], get_stripe_count(election_oid))
+        key = (election_oid, doc["candidate_id"], stripe)
+        increments[key] = increments.get(key, 0) + 1
+    if not increments:
+        return
+    tallies = get_collection("tallies")
+    tallies.bulk_write([
+        UpdateOne(
+            {"election_id": election_oid, "candidate_id": candidate_oid, "stripe": stripe},
+            {"$inc": {"count": amount}},
+            upsert=True,
+        )
+        for (election_oid, candidate_oid, stripe), amount in increments.items()
+    ], ordered=False, session=session)
+
+
+def get_tallies(election_oid: ObjectId) -> Dict[ObjectId, int]:
+    """Return {candidate_id: count} for an election, summed across stripes"""
+    tallies = get_collection("tallies")
+    totals: Dict[ObjectId, int] = {}
+    for doc in tallies.find({"election_id": election_oid}, {"candidate_id": 1, "count": 1}):
+        totals[doc["candidate_id"]] = totals.get(doc["candidate_id"], 0) + doc.get("count", 0)
+    return totals
+
+
+def delete_tallies(election_oid: ObjectId) -> int:
+    _stripe_cache.pop(election_oid, None)
+    tallies = get_collection("tallies")
+    return tallies.delete_many({"election_id": election_oid}).deleted_count
+
+
+def _count_chunk(election_oid: ObjectId, candidate_oids: List[ObjectId]) -> Dict[ObjectId, int]:
+    """Recount raw votes for a subset of candidates"""
+    votes = get_collection("votes")
+    pipeline = [
+        {"$match": {"election_id": election_oid, "candidate_id": {"$in": candidate_oids}}},
+        {"$group": {"_id": "$candidate_id", "total_votes": {"$sum": 1}}},
+    ]
+    counts = {oid: 0 for oid in candidate_oids}
+    for doc in votes.aggregate(pipeline):
+        counts[doc["_id"]] = doc["total_votes"]
+    return counts
+
+
+def _measure_drift(election_oid: ObjectId, candidate_oids: List[ObjectId], workers: int) -> Dict[ObjectId, Dict[str, int]]:
+    """{candidate_id: {"tally", "actual"}} for counters that disagree with the raw votes"""
+    # Tallies are read before votes are counted: votes are inserted before
+    # their $inc, so a vote in flight can only make a counter look low, never high
+    stored = get_tallies(election_oid)
+    chunk_size = max(1, -(-len(candidate_oids) // workers))
+    chunks = [candidate_oids[i:i + chunk_size] for i in range(0, len(candidate_oids), chunk_size)]
+    actual: Dict[ObjectId, int] = {}
+    if chunks:
+        with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+            for counts in pool.map(lambda chunk: _count_chunk(election_oid, chunk), chunks):
+                actual.update(counts)
+    drift = {}
+    for candidate_oid in candidate_oids:
+        if stored.get(candidate_oid, 0) != actual.get(candidate_oid, 0):
+            drift[candidate_oid] = {"tally": stored.get(candidate_oid, 0), "actual": actual.get(candidate_oid, 0)}
+    return drift
+
+
+def reconcile_tallies(election_id: str, workers: Optional[int] = None, fix: bool = True,
+                      settle_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Recompute tallies from raw votes and report drift against the stored counters.
+    Candidates are split into chunks that are recounted in parallel.
+    While an election is live, a vote inserted but not yet counted looks like
+    drift, so drifted counters are measured again after settle_seconds and
+    only drift that is unchanged on both passes is reported (and, when fix is
+    True, applied to stripe 0); the rest is returned as "unconfirmed".
+    """
+    from bson.errors import InvalidId
+    try:
+        election_oid = ObjectId(election_id)
+    except (InvalidId, ValueError):
+        raise ValueError(f"Invalid election_id: {election_id}")
+
+    workers = workers or TALLY_RECONCILE_WORKERS
+    if settle_seconds is None:
+        settle_seconds = TALLY_RECONCILE_SETTLE_SECONDS
+    candidates = get_collection("candidates")
+    votes = get_collection("votes")
+
+    candidate_oids = [doc["_id"] for doc in candidates.find({"election_id": election_oid}, {"_id": 1})]
+    # Votes for candidates that no longer exist still need to be accounted for
+    for oid in votes.distinct("candidate_id", {"election_id": election_oid}):
+        if oid not in candidate_oids:
+            candidate_oids.append(oid)
+    for oid in get_tallies(election_oid):
+        if oid not in candidate_oids:
+            candidate_oids.append(oid)
+
+    first = _measure_drift(election_oid, candidate_oids, workers)
+    second: Dict[ObjectId, Dict[str, int]] = {}
+    if first:
+        time.sleep(settle_seconds)
+        second = _measure_drift(election_oid, list(first), workers)
+
+    drift, unconfirmed = [], []
+    for candidate_oid, measured in first.items():
+        delta = measured["actual"] - measured["tally"]
+        again = second.get(candidate_oid)
+        entry = {"candidate_id": str(candidate_oid), **(again or measured), "delta": delta}
+        if again is not None and again["actual"] - again["tally"] == delta:
+            drift.append(entry)
+        else:
+            unconfirmed.append(entry)
+
+    if fix and drift:
+        tallies = get_collection("tallies")
+        for entry in drift:
+            tallies.update_one(
+                {"election_id": election_oid, "candidate_id": ObjectId(entry["candidate_id"]), "stripe": 0},
+                {"$inc": {"count": entry["delta"]}},
+                upsert=True,
+            )
+        from utils.results_cache import bump_results_version
+        bump_results_version(election_id)
+
+    return {
+        "election_id": election_id,
+        "candidates_checked": len(candidate_oids),
+        "drift": drift,
+        "unconfirmed": unconfirmed,
+        "corrected": len(drift) if fix else 0,
+    }
@@ -0,0 +1,199 @@
+"""
+Per-minute turnout buckets for each election.
+record_vote adds one count to the election's current minute, so turnout
+curves are read with a small range query instead of scanning `votes`.
+Counts are aggregated in memory per (election, minute) and written every
+TURNOUT_FLUSH_SECONDS, so a burst of votes costs one write per minute
+bucket per flush rather than one per vote. On MongoDB 5.0+ `turnout` is a
+time-series collection and each flush writes one measurement per bucket;
+on older servers it is a regular collection of (election_id, minute, count)
+documents maintained with upsert + $inc. Counts not yet flushed are lost if
+the worker dies; turnout is a display, and the votes themselves are not.
+"""
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from database.connection import get_client, get_db, get_collection
+from config import TURNOUT_FLUSH_SECONDS, TURNOUT_ELIGIBLE_TTL_SECONDS
+
+TURNOUT_COLLECTION = "turnout"
+
+# Cached result of _is_timeseries(); the collection type does not change at runtime
+_timeseries: Optional[bool] = None
+
+_lock = threading.Lock()
+# (election_id, minute) -> votes counted by this worker and not yet written
+_pending: Dict[Tuple[ObjectId, datetime], int] = {}
+_flusher: Optional[threading.Thread] = None
+
+# (expires_at, count) for the approved-voter count; approvals change it rarely
+_eligible: Optional[Tuple[float, int]] = None
+
+
+def _server_supports_timeseries() -> bool:
+    version = get_client().server_info().get("versionArray", [0])
+    return version[0] >= 5
+
+
+def ensure_turnout_collection() -> bool:
+    """Create the turnout collection and its indexes. Returns True if time-series."""
+    global _timeseries
+    db = get_db()
+    if TURNOUT_COLLECTION not in db.list_collection_names():
+        if _server_supports_timeseries():
+            db.create_collection(
+                TURNOUT_COLLECTION,
+                timeseries={"timeField": "minute", "metaField": "election_id", "granularity": "minutes"},
+            )
+        else:
+            db.create_collection(TURNOUT_COLLECTION)
+    _timeseries = None
+    if _is_timeseries():
+        get_collection(TURNOUT_COLLECTION).create_index([("election_id", 1), ("minute", 1)])
+        return True
+    get_collection(TURNOUT_COLLECTION).create_index([("election_id", 1), ("minute", 1)], unique=True)
+    return False
+
+
+def _is_timeseries() -> bool:
+    global _timeseries
+    if _timeseries is None:
+        info = next(get_db().list_collections(filter={"name": TURNOUT_COLLECTION}), None)
+        _timeseries = bool(info and info.get("type") == "timeseries")
+    return _timeseries
+
+
+def record_turnout(election_oid: ObjectId, timestamp: datetime) -> None:
+    """Count one vote in the bucket for the minute containing timestamp (written by the next flush)"""
+    global _flusher
+    key = (election_oid, timestamp.replace(second=0, microsecond=0))
+    with _lock:
+        _pending[key] = _pending.get(key, 0) + 1
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="turnout-flush", daemon=True)
+            _flusher.start()
+
+
+def _requeue(counts: Dict[Tuple[ObjectId, datetime], int]) -> None:
+    with _lock:
+        for key, count in counts.items():
+            _pending[key] = _pending.get(key, 0) + count
+
+
+def flush_turnout() -> int:
+    """Write the buffered counts, one write per (election, minute); returns how many"""
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    if not pending:
+        return 0
+    keys = list(pending)
+    turnout = get_collection(TURNOUT_COLLECTION)
+    try:
+        if _is_timeseries():
+            turnout.insert_many([
+                {"election_id": election_oid, "minute": minute, "count": pending[(election_oid, minute)]}
+                for election_oid, minute in keys
+            ], ordered=False)
+        else:
+            turnout.bulk_write([
+                UpdateOne({"election_id": election_oid, "minute": minute},
+                          {"$inc": {"count": pending[(election_oid, minute)]}}, upsert=True)
+                for election_oid, minute in keys
+            ], ordered=False)
+    except BulkWriteError as e:
+        # Only the failed writes go back; the rest were applied
+        failed = [keys[err["index"]] for err in (e.details or {}).get("writeErrors", [])]
+        _requeue({key: pending[key] for key in failed})
+        raise
+    except PyMongoError:
+        _requeue(pending)
+        raise
+    return len(keys)
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(TURNOUT_FLUSH_SECONDS)
+        try:
+            flush_turnout()
+        except Exception as e:
+            print(f"⚠️  Turnout flush failed, will retry: {e}")
+
+
+def get_turnout_buckets(election_oid: ObjectId, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    """Return [{minute, count}] for minutes in [start, end], ascending (including unflushed counts)"""
+    turnout = get_collection(TURNOUT_COLLECTION)
+    match = {"election_id": election_oid, "minute": {"$gte": start, "$lte": end}}
+    # Measurements from several workers (and flushes) share a minute, so they are summed
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": "$minute", "count": {"$sum": "$count"}}},
+    ]
+    counts = {doc["_id"]: doc["count"] for doc in turnout.aggregate(pipeline)}
+    with _lock:
+        for (pending_election, minute), count in _pending.items():
+            if pending_election == election_oid and start <= minute <= end:
+                counts[minute] = counts.get(minute, 0) + count
+    return [{"minute": minute, "count": counts[minute]} for minute in sorted(counts)]
+
+
+def count_eligible_voters() -> int:
+    """Number of approved voters, recounted at most every TURNOUT_ELIGIBLE_TTL_SECONDS"""
+    global _eligible
+    cached = _eligible
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    count = get_collection("users").count_documents({"status": "approved"})
+    _eligible = (time.monotonic() + TURNOUT_ELIGIBLE_TTL_SECONDS, count)
+    return count
+
+
+def forget_eligible_voters() -> None:
+    """Recount on the next read (this worker approved or removed a voter)"""
+    global _eligible
+    _eligible = None
+
+
+def get_turnout_series(election_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Votes per minute and cumulative turnout for an election's polling window.
+    Turnout percentage is relative to the number of approved voters.
+    Returns None if the election does not exist.
+    """
+    from bson.errors import InvalidId
+    try:
+        election_oid = ObjectId(election_id)
+    except (InvalidId, ValueError):
+        raise ValueError(f"Invalid election_id: {election_id}")
+
+    elections = get_collection("elections")
+    election = elections.find_one({"_id": election_oid}, {"start_date": 1, "end_date": 1})
+    if not election:
+        return None
+
+    end = min(election["end_date"], datetime.utcnow())
+    buckets = get_turnout_buckets(election_oid, election["start_date"], end)
+    eligible = count_eligible_voters()
+
+    series = []
+    cumulative = 0
+    for bucket in buckets:
+        cumulative += bucket["count"]
+        series.append({
+            "minute": bucket["minute"].isoformat(),
+            "votes": bucket["count"],
+            "cumulative": cumulative,
+            "turnout_pct": round(cumulative * 100.0 / eligible, 2) if eligible else 0.0,
+        })
+
+    return {
+        "election_id": election_id,
+        "eligible_voters": eligible,
+        "total_votes": cumulative,
+        "series": series,
+    }
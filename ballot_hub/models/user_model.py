@@ -1,19 +1,55 @@
-from typing import Optional, Dict, Any
-import bcrypt
+import re
+from typing import Optional, Dict, Any, Iterable, List, Set, Tuple
 from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 from datetime import datetime
 from database.connection import get_collection
-from config import PASSWORD_HASH_ROUNDS
+from utils.hash_pool import hash_pool
 
 
 def _hash_password(plain_password: str) -> str:
-    salt = bcrypt.gensalt(rounds=PASSWORD_HASH_ROUNDS)
-    return bcrypt.hashpw(plain_password.encode("utf-8"), salt).decode("utf-8")
+    return hash_pool.hash_password(plain_password)
 
 
 def _verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+    return hash_pool.verify_password(plain_password, hashed_password)
+
+
+# settings document recording the progress of database/backfill_email_key.py
+EMAIL_KEY_BACKFILL_ID = "email_key_backfill"
+# Set once the backfill has finished; until then a miss on email_key falls back to a regex lookup
+_email_keys_backfilled = False
+
+
+def email_key(email: str) -> str:
+    """Normalized email every lookup matches on (indexed as users.email_key)"""
+    return (email or "").strip().lower()
+
+
+def _email_key_query(email: str) -> Dict[str, Any]:
+    # Served by the unique email_key index (see database/check_email_index.py)
+    return {"email_key": email_key(email)}
+
+
+def _legacy_email_query(email: str) -> Dict[str, Any]:
+    # Case-insensitive match for users the backfill has not reached yet
+    return {"email_key": {"$exists": False}, "email": {"$regex": f"^{re.escape(email_key(email))}$", "$options": "i"}}
+
+
+def _backfill_complete(progress: Optional[Dict[str, Any]]) -> bool:
+    global _email_keys_backfilled
+    if progress and progress.get("done"):
+        _email_keys_backfilled = True
+    return _email_keys_backfilled
+
+
+def find_user_by_email(email: str, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    users = get_collection("users")
+    user = users.find_one(_email_key_query(email), projection)
+    if user is None and not _email_keys_backfilled:
+        if not _backfill_complete(get_collection("settings").find_one({"_id": EMAIL_KEY_BACKFILL_ID})):
+            user = users.find_one(_legacy_email_query(email), projection)
+    return user
 
 
 def register_user(name: str, email: str, password: str, status: str = "pending") -> Dict[str, Any]:
@@ -41,13 +77,10 @@ def register_user(name: str, email: str, password: str, status: str = "pending")
     hashed_password = _hash_password(password)
     users = get_collection("users")
     
-    # Check for existing approved user with this email (case-insensitive)
-    existing_approved = users.find_one({
-        "email": {"$regex": f"^{email}$", "$options": "i"},
-        "status": "approved"
-    })
+    # Check for existing approved user with this email
+    existing = find_user_by_email(email, {"status": 1})
     
-    if existing_approved:
+    if existing and existing.get("status") == "approved":
         return {
             "success": False, 
             "message": "This email is already registered. Please use a different email or log in.",
@@ -59,6 +92,7 @@ def register_user(name: str, email: str, password: str, status: str = "pending")
         user_data = {
             "name": name,
             "email": email,  # Store in lowercase
+            "email_key": email_key(email),
             "password": hashed_password,
             "status": status,
             "voted": False,
@@ -78,12 +112,9 @@ def register_user(name: str, email: str, password: str, status: str = "pending")
         error_msg = str(e).lower()
         if "duplicate key error" in error_msg:
             # Check if it's a pending user
-            pending_user = users.find_one({
-                "email": {"$regex": f"^{email}$", "$options": "i"},
-                "status": "pending"
-            })
+            existing = find_user_by_email(email, {"status": 1})
             
-            if pending_user:
+            if existing and existing.get("status") == "pending":
                 return {
                     "success": False,
                     "message": "This email is already registered and pending approval. Please wait for admin approval.",
@@ -102,20 +133,26 @@ def register_user(name: str, email: str, password: str, status: str = "pending")
         }
 
 
-def authenticate_user(email: str, password: str) -> Optional[Dict[str, Any]]:
-    users = get_collection("users")
-    
-    # Find user with case-insensitive email match
-    user = users.find_one({
-        "email": {"$regex": f"^{email}$", "$options": "i"}
-    })
-    
+def check_credentials(user: Optional[Dict[str, Any]], password: str) -> Optional[Dict[str, Any]]:
+    """The public user dict if password matches the stored user document, else None"""
     if not user:
         return None
         
     if not _verify_password(password, user["password"]):
         return None
-        
+    _rehash_if_needed(user, password)
+    return _public_user(user)
+
+
+def _rehash_if_needed(user: Dict[str, Any], password: str) -> None:
+    """Move the stored hash to the current target cost (in the background) after a good login"""
+    user_oid, old_hash = user["_id"], user["password"]
+    hash_pool.rehash_later(password, old_hash, lambda new_hash: get_collection("users").update_one(
+        {"_id": user_oid, "password": old_hash}, {"$set": {"password": new_hash}}
+    ))
+
+
+def _public_user(user: Dict[str, Any]) -> Dict[str, Any]:
     # Add user_id and ensure consistent email case
     user["user_id"] = str(user["_id"])
     user["email"] = user["email"].lower()  # Ensure consistent case
@@ -125,6 +162,27 @@ def authenticate_user(email: str, password: str) -> Optional[Dict[str, Any]]:
     return user
 
 
+def authenticate_user(email: str, password: str) -> Optional[Dict[str, Any]]:
+    return check_credentials(find_user_by_email(email), password)
+
+
+async def authenticate_user_async(email: str, password: str) -> Optional[Dict[str, Any]]:
+    """authenticate_user on the Motor driver; bcrypt runs in the hashing pool"""
+    from database.async_connection import get_async_collection
+    users = get_async_collection("users")
+    user = await users.find_one(_email_key_query(email))
+    if user is None and not _email_keys_backfilled:
+        progress = await get_async_collection("settings").find_one({"_id": EMAIL_KEY_BACKFILL_ID})
+        if not _backfill_complete(progress):
+            user = await users.find_one(_legacy_email_query(email))
+    if not user:
+        return None
+    if not await hash_pool.verify_password_async(password, user["password"]):
+        return None
+    _rehash_if_needed(user, password)
+    return _public_user(user)
+
+
 def mark_user_voted(user_id: str) -> bool:
     from bson.errors import InvalidId
     users = get_collection("users")
@@ -149,15 +207,52 @@ def check_if_voted(user_id: str) -> bool:
 
 def check_if_voted_in_election(user_id: str, election_id: str) -> bool:
     """Check if user has already voted in a specific election"""
+    return election_id in get_voted_elections(user_id, [election_id])
+
+
+
+def get_voted_elections(user_id: str, election_ids: List[str]) -> Set[str]:
+    """
+    Of the given elections, the ids the user has voted in. Elections the
+    voted filter rules out are skipped; the rest take one $in query covered
+    by the unique (user_id, election_id) index on votes.
+    """
+    query, positives = _voted_query(user_id, election_ids)
+    if query is None:
+        return set()
+    votes = get_collection("votes")
+    return _voted_result(votes.find(query, {"_id": 0, "election_id": 1}), positives)
+
+
+async def get_voted_elections_async(user_id: str, election_ids: List[str]) -> Set[str]:
+    """get_voted_elections on the Motor driver"""
+    from database.async_connection import get_async_collection
+    query, positives = _voted_query(user_id, election_ids)
+    if query is None:
+        return set()
+    docs = await get_async_collection("votes").find(query, {"_id": 0, "election_id": 1}).to_list(length=None)
+    return _voted_result(docs, positives)
+
+
+def _voted_query(user_id: str, election_ids: List[str]) -> Tuple[Optional[Dict[str, Any]], Set[str]]:
+    """(votes filter, ids the voted filter reported positive); the filter is None if no lookup is needed"""
     from bson.errors import InvalidId
-    from database.connection import get_collection as get_coll
-    votes = get_coll("votes")
+    from utils import voted_filter
     try:
-        vote = votes.find_one({
-            "user_id": ObjectId(user_id),
-            "election_id": ObjectId(election_id)
-        })
-        return vote is not None
+        user_oid = ObjectId(user_id)
     except (InvalidId, ValueError):
-        return False
+        return None, set()
+    valid_ids = [election_id for election_id in election_ids if ObjectId.is_valid(election_id)]
+    candidates, positives = voted_filter.maybe_voted(user_oid, valid_ids)
+    if not candidates:
+        return None, set()
+    query = {"user_id": user_oid, "election_id": {"$in": [ObjectId(election_id) for election_id in candidates]}}
+    return query, positives
+
 
+def _voted_result(docs: Iterable[Dict[str, Any]], positives: Set[str]) -> Set[str]:
+    from utils import voted_filter
+    voted = {str(doc["election_id"]) for doc in docs}
+    # Elections without a filter yet were looked up unfiltered; they are not false positives
+    voted_filter.record_false_positives(len(positives - voted))
+    return voted
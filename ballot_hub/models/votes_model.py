@@ -1,11 +1,20 @@
+import asyncio
 from typing import Dict, Any, List
 from datetime import datetime
+import pymongo
 from bson import ObjectId
-from pymongo.errors import DuplicateKeyError
-from database.connection import get_collection
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from database.connection import get_client, get_collection
+from models.tally_model import increment_tally, increment_tally_async, get_tallies, tallies_backfilled
+from models.turnout_model import record_turnout
+from models.results_model import ensure_election_open, ensure_election_open_async
+from utils.results_cache import bump_results_version
+from utils.voted_cache import mark_voted
+from utils import voted_filter
+from config import TALLY_WRITE_MODE, VOTE_GROUP_COMMIT, VOTE_JOURNAL_ENABLED, VOTE_JOURNAL_CHECK_TIMEOUT_MS
 
 
-def record_vote(user_id: str, candidate_id: str, election_id: str) -> bool:
+def _new_vote_doc(user_id: str, candidate_id: str, election_id: str) -> Dict[str, Any]:
     from bson.errors import InvalidId
     try:
         user_oid = ObjectId(user_id)
@@ -13,33 +22,190 @@ def record_vote(user_id: str, candidate_id: str, election_id: str) -> bool:
         election_oid = ObjectId(election_id)
     except (InvalidId, ValueError):
         raise ValueError(f"Invalid ID format: user_id={user_id}, candidate_id={candidate_id}, election_id={election_id}")
+    return {
+        "user_id": user_oid,
+        "candidate_id": candidate_oid,
+        "election_id": election_oid,
+        "timestamp": datetime.utcnow(),
+    }
+
+
+def record_vote(user_id: str, candidate_id: str, election_id: str) -> bool:
+    vote_doc = _new_vote_doc(user_id, candidate_id, election_id)
+    if VOTE_JOURNAL_ENABLED:
+        return _record_vote_journaled(vote_doc)
+    # Raises ElectionClosedError unless the election is open right now; final snapshots never change
+    ensure_election_open(election_id)
+    if VOTE_GROUP_COMMIT:
+        from utils.vote_batcher import get_vote_batcher
+        ok = get_vote_batcher().submit(vote_doc)
+    elif TALLY_WRITE_MODE == "transactional":
+        ok = _record_vote_transactional(vote_doc)
+    else:
+        ok = _record_vote_eventual(vote_doc)
+    if ok:
+        on_vote_recorded(vote_doc)
+    return ok
+
+
+def _record_vote_journaled(vote_doc: Dict[str, Any]) -> bool:
+    """
+    Acknowledged once journaled (False for a prior vote); the drainer applies
+    side effects after replay. Any MongoDB read on this path is bounded, so a
+    stalled server cannot hold up votes.
+    """
+    from utils.vote_journal import get_vote_journal
+    # Answered from the catalog; a reload that times out keeps the stale catalog
+    with pymongo.timeout(VOTE_JOURNAL_CHECK_TIMEOUT_MS / 1000.0):
+        ensure_election_open(str(vote_doc["election_id"]))
+    ok = get_vote_journal().append(vote_doc)
+    if ok:
+        _remember_voter(vote_doc)
+    return ok
+
+
+def _record_vote_eventual(vote_doc: Dict[str, Any]) -> bool:
+    """Insert the vote, then bump its tally; a failed $inc leaves drift for reconcile_tallies"""
+    votes = get_collection("votes")
+    try:
+        votes.insert_one(vote_doc)
+    except DuplicateKeyError:
+        return False
+    try:
+        increment_tally(vote_doc["election_id"], vote_doc["candidate_id"], vote_doc["user_id"])
+    except PyMongoError as e:
+        print(f"⚠️  Tally update failed for election {vote_doc['election_id']}: {e}")
+    return True
+
+
+def _record_vote_transactional(vote_doc: Dict[str, Any]) -> bool:
+    """Insert the vote and bump its tally in one transaction (replica set only)"""
     votes = get_collection("votes")
+
+    def _txn(session):
+        votes.insert_one(vote_doc, session=session)
+        increment_tally(vote_doc["election_id"], vote_doc["candidate_id"], vote_doc["user_id"], session=session)
+
+    with get_client().start_session() as session:
+        try:
+            session.with_transaction(_txn)
+        except DuplicateKeyError:
+            return False
+    return True
+
+
+def _remember_voter(vote_doc: Dict[str, Any]) -> None:
+    """Make this process answer "has voted" for the user without a lookup"""
+    election_id = str(vote_doc["election_id"])
+    voted_filter.add(vote_doc["user_id"], election_id)
+    mark_voted(str(vote_doc["user_id"]), election_id)
+
+
+def on_vote_recorded(vote_doc: Dict[str, Any]) -> None:
+    """
+    Derived state to update once a vote has been acknowledged, for every
+    write path (sync, async, group commit, journal drain). In-memory only,
+    so it is safe to call from the event loop.
+    """
+    _remember_voter(vote_doc)
+    bump_results_version(str(vote_doc["election_id"]))
+    record_turnout(vote_doc["election_id"], vote_doc["timestamp"])
+
+
+async def record_vote_async(user_id: str, candidate_id: str, election_id: str) -> bool:
+    """
+    record_vote for the async serving mode. The default (eventual) path runs
+    on the Motor driver; the journal, group-commit and transactional modes
+    block on local I/O or a shared batch, so they run in a worker thread.
+    """
+    if VOTE_JOURNAL_ENABLED or VOTE_GROUP_COMMIT or TALLY_WRITE_MODE == "transactional":
+        return await asyncio.to_thread(record_vote, user_id, candidate_id, election_id)
+    from database.async_connection import get_async_collection
+    vote_doc = _new_vote_doc(user_id, candidate_id, election_id)
+    await ensure_election_open_async(election_id)
     try:
-        votes.insert_one(
-            {
-                "user_id": user_oid,
-                "candidate_id": candidate_oid,
-                "election_id": election_oid,
-                "timestamp": datetime.utcnow(),
-            }
-        )
-        return True
+        await get_async_collection("votes").insert_one(vote_doc)
     except DuplicateKeyError:
         return False
+    try:
+        await increment_tally_async(vote_doc["election_id"], vote_doc["candidate_id"], vote_doc["user_id"])
+    except PyMongoError as e:
+        print(f"⚠️  Tally update failed for election {vote_doc['election_id']}: {e}")
+    on_vote_recorded(vote_doc)
+    return True
 
 
 def count_votes(election_id: str) -> List[Dict[str, Any]]:
+    """
+    Read an election's results from the materialized tallies.
+    Cost is O(candidates); raw votes are not touched once the tally backfill
+    (database/backfill_tallies.py) has finished, and counted until then.
+    """
+    try:
+        election_oid = ObjectId(election_id)
+    except Exception:
+        return []
+    if not tallies_backfilled():
+        return count_votes_aggregate(election_id)
+    candidates = get_collection("candidates")
+    candidate_list = list(candidates.find({"election_id": election_oid}, {"candidate_name": 1}))
+    return _build_results(candidate_list, get_tallies(election_oid))
+
+
+def count_votes_aggregate(election_id: str) -> List[Dict[str, Any]]:
+    """
+    Tally an election in a single aggregation over the votes collection.
+    Uses the (election_id, candidate_id) index, so the cost is one index
+    scan per call instead of one count_documents per candidate.
+    """
     try:
         election_oid = ObjectId(election_id)
     except Exception:
         return []
     candidates = get_collection("candidates")
     votes = get_collection("votes")
-    
+
     # Get all candidates for this election
+    candidate_list = list(candidates.find({"election_id": election_oid}, {"candidate_name": 1}))
+
+    pipeline = [
+        {"$match": {"election_id": election_oid}},
+        {"$group": {"_id": "$candidate_id", "total_votes": {"$sum": 1}}},
+    ]
+    counts = {doc["_id"]: doc["total_votes"] for doc in votes.aggregate(pipeline)}
+    return _build_results(candidate_list, counts)
+
+
+def _build_results(candidate_list: List[Dict[str, Any]], counts: Dict[ObjectId, int]) -> List[Dict[str, Any]]:
+    results = []
+    for candidate in candidate_list:
+        candidate_oid = candidate["_id"]
+        results.append({
+            "candidate_id": str(candidate_oid),
+            "candidate_name": candidate.get("candidate_name", ""),
+            "total_votes": counts.get(candidate_oid, 0)
+        })
+
+    # Sort by votes descending, then by name ascending
+    results.sort(key=lambda x: (-x["total_votes"], x["candidate_name"]))
+    return results
+
+
+def count_votes_per_candidate(election_id: str) -> List[Dict[str, Any]]:
+    """
+    Legacy tally: one count_documents per candidate.
+    Kept for benchmarking against count_votes_aggregate.
+    """
+    try:
+        election_oid = ObjectId(election_id)
+    except Exception:
+        return []
+    candidates = get_collection("candidates")
+    votes = get_collection("votes")
+
     candidate_list = list(candidates.find({"election_id": election_oid}))
     results = []
-    
+
     for candidate in candidate_list:
         candidate_oid = candidate["_id"]
         vote_count = votes.count_documents({
@@ -51,8 +217,6 @@ def count_votes(election_id: str) -> List[Dict[str, Any]]:
             "candidate_name": candidate.get("candidate_name", ""),
             "total_votes": vote_count
         })
-    
-    # Sort by votes descending, then by name ascending
+
     results.sort(key=lambda x: (-x["total_votes"], x["candidate_name"]))
     return results
-
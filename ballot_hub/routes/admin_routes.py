@@ -2,7 +2,9 @@ from flask import Blueprint
 from controllers.admin_controller import (
     admin_login, approve_user, add_candidate, create_election, election_results,
     list_users, list_all_elections, update_election, delete_election, delete_user,
-    reject_user
+    reject_user, election_results_stream, election_turnout,
+    export_election_votes, admission_stats, vote_status_stats,
+    hashing_stats, login_limit_stats, otp_dispatch_stats
 )
 
 admin_bp = Blueprint("admin_bp", __name__)
@@ -17,6 +19,14 @@ admin_bp.add_url_rule("/api/admin/create_election", view_func=create_election, m
 admin_bp.add_url_rule("/api/admin/update_election", view_func=update_election, methods=["PUT"])
 admin_bp.add_url_rule("/api/admin/delete_election/<string:election_id>", view_func=delete_election, methods=["DELETE"])
 admin_bp.add_url_rule("/api/admin/results/<string:election_id>", view_func=election_results, methods=["GET"])
+admin_bp.add_url_rule("/api/admin/results/<string:election_id>/stream", view_func=election_results_stream, methods=["GET"])
+admin_bp.add_url_rule("/api/admin/turnout/<string:election_id>", view_func=election_turnout, methods=["GET"])
+admin_bp.add_url_rule("/api/admin/export/<string:election_id>", view_func=export_election_votes, methods=["GET"])
+admin_bp.add_url_rule("/api/admin/stats/admission", view_func=admission_stats, methods=["GET"])
+admin_bp.add_url_rule("/api/admin/stats/hashing", view_func=hashing_stats, methods=["GET"])
+admin_bp.add_url_rule("/api/admin/stats/login_limits", view_func=login_limit_stats, methods=["GET"])
+admin_bp.add_url_rule("/api/admin/stats/otp_dispatch", view_func=otp_dispatch_stats, methods=["GET"])
+admin_bp.add_url_rule("/api/admin/stats/vote_status", view_func=vote_status_stats, methods=["GET"])
 admin_bp.add_url_rule("/api/admin/delete_user/<string:user_id>", view_func=delete_user, methods=["DELETE"])
 admin_bp.add_url_rule("/api/admin/reject_user/<string:user_id>", view_func=reject_user, methods=["DELETE"])
 
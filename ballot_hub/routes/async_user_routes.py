@@ -0,0 +1,14 @@
+from quart import Blueprint
+from controllers.async_user_controller import (
+    login, list_elections, list_candidates, vote, check_vote_status, check_vote_status_all
+)
+
+async_user_bp = Blueprint("async_user_bp", __name__)
+
+# Hot user routes served by async handlers (SERVER_MODE=async); URLs match routes/user_routes.py
+async_user_bp.add_url_rule("/api/login", view_func=login, methods=["POST"])
+async_user_bp.add_url_rule("/api/elections", view_func=list_elections, methods=["GET"])
+async_user_bp.add_url_rule("/api/candidates/<string:election_id>", view_func=list_candidates, methods=["GET"])
+async_user_bp.add_url_rule("/api/vote", view_func=vote, methods=["POST"])
+async_user_bp.add_url_rule("/api/vote_status", view_func=check_vote_status_all, methods=["GET"])
+async_user_bp.add_url_rule("/api/vote_status/<string:election_id>", view_func=check_vote_status, methods=["GET"])
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from controllers.user_controller import register, login, list_elections, list_candidates, vote, check_vote_status
+from controllers.user_controller import register, login, list_elections, list_candidates, vote, check_vote_status, check_vote_status_all, otp_status
 from database.connection import get_collection
 from utils.phone_validator import normalize_phone, hash_phone
 
@@ -8,9 +8,11 @@ user_bp = Blueprint("user_bp", __name__)
 # User routes
 user_bp.add_url_rule("/api/register", view_func=register, methods=["POST"])
 user_bp.add_url_rule("/api/login", view_func=login, methods=["POST"])
+user_bp.add_url_rule("/api/otp_status/<string:delivery_id>", view_func=otp_status, methods=["GET"])
 user_bp.add_url_rule("/api/elections", view_func=list_elections, methods=["GET"])
 user_bp.add_url_rule("/api/candidates/<string:election_id>", view_func=list_candidates, methods=["GET"])
 user_bp.add_url_rule("/api/vote", view_func=vote, methods=["POST"])
+user_bp.add_url_rule("/api/vote_status", view_func=check_vote_status_all, methods=["GET"])
 user_bp.add_url_rule("/api/vote_status/<string:election_id>", view_func=check_vote_status, methods=["GET"])
 
 @user_bp.route("/api/check_availability", methods=["POST"])
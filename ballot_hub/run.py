@@ -1,7 +1,9 @@
 """
 Simple run script for BallotHub
 Just run: python run.py
+Async serving mode: python run.py --mode async   (needs requirements-async.txt)
 """
+import argparse
 import os
 import sys
 
@@ -16,7 +18,13 @@ if not os.getenv("JWT_SECRET_KEY"):
     os.environ["JWT_SECRET_KEY"] = secrets.token_urlsafe(48)
 
 if __name__ == "__main__":
-    from app import create_app
+    from config import SERVER_MODE
+    
+    parser = argparse.ArgumentParser(description="Run the BallotHub server")
+    parser.add_argument("--mode", choices=["threaded", "async"], default=SERVER_MODE,
+                        help="threaded: Flask, one thread per request; async: asyncio handlers on Motor")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
     
     print("=" * 60)
     print("BallotHub - Secure Online Voting System")
@@ -40,22 +48,28 @@ if __name__ == "__main__":
         if response.lower() != 'y':
             sys.exit(1)
     
-    # Create and run app
-    app = create_app()
     print("=" * 60)
-    print("Server starting on http://127.0.0.1:5000")
+    print(f"Server starting on http://127.0.0.1:{args.port} ({args.mode} mode)")
     print("=" * 60)
     print("\nAvailable pages:")
-    print("  • User Register: http://127.0.0.1:5000/register")
-    print("  • User Login:    http://127.0.0.1:5000/login")
-    print("  • Vote:          http://127.0.0.1:5000/vote")
-    print("  • Admin Login:   http://127.0.0.1:5000/admin")
-    print("  • Admin Dashboard: http://127.0.0.1:5000/admin/dashboard")
+    print(f"  • User Register: http://127.0.0.1:{args.port}/register")
+    print(f"  • User Login:    http://127.0.0.1:{args.port}/login")
+    print(f"  • Vote:          http://127.0.0.1:{args.port}/vote")
+    print(f"  • Admin Login:   http://127.0.0.1:{args.port}/admin")
+    print(f"  • Admin Dashboard: http://127.0.0.1:{args.port}/admin/dashboard")
     print("\nDefault Admin Credentials:")
     print("  Username: admin")
     print("  Password: AdminPass123")
     print("\nPress Ctrl+C to stop the server\n")
     print("=" * 60 + "\n")
     
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    if args.mode == "async":
+        from asgi import serve
+        serve(host="0.0.0.0", port=args.port)
+    else:
+        from app import create_app
+        from werkzeug.serving import is_running_from_reloader
+        # With debug=True this process only runs the reloader; the child it starts serves and opens the journal
+        app = create_app(open_journal=is_running_from_reloader())
+        app.run(host="0.0.0.0", port=args.port, debug=True)
 
@@ -0,0 +1,43 @@
+"""
+Shared fixtures. Tests never touch the application database: those that need
+a real MongoDB use MONGO_DB_NAME=ballot_hub_test (and are skipped when no
+server is reachable at MONGO_URI); the rest run on mongomock.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_DB_NAME", "ballot_hub_test")
+
+import pytest
+from pymongo.errors import PyMongoError
+import database.connection as connection
+
+
+@pytest.fixture(scope="session")
+def _mongo_error():
+    """Why the real MongoDB cannot be used (checked once per session), or None"""
+    try:
+        connection.get_client().admin.command("ping")
+        return None
+    except (ConnectionError, PyMongoError) as e:
+        connection._client = None
+        return str(e).split(",")[0]
+
+
+@pytest.fixture
+def mongo(_mongo_error):
+    """The real MongoDB test database, dropped afterwards"""
+    if _mongo_error:
+        pytest.skip(f"MongoDB not available: {_mongo_error}")
+    db = connection.get_db()
+    yield db
+    db.client.drop_database(db.name)
+
+
+@pytest.fixture
+def mock_mongo(monkeypatch):
+    """An in-memory mongomock client in place of the real one"""
+    mongomock = pytest.importorskip("mongomock")
+    monkeypatch.setattr(connection, "_client", mongomock.MongoClient())
+    return connection.get_db()
@@ -0,0 +1,42 @@
+"""The email lookups must be index scans on email_key, never collection scans."""
+import pytest
+from pymongo.errors import OperationFailure
+import models.user_model as user_model
+from database.backfill_email_key import ensure_email_key_index
+from database.check_email_index import _stages
+
+
+class _RecordingUsers:
+    """Wraps the users collection and records the filters find_one is called with"""
+
+    def __init__(self, users):
+        self.users = users
+        self.filters = []
+
+    def find_one(self, filter, *args, **kwargs):
+        self.filters.append(filter)
+        return self.users.find_one(filter, *args, **kwargs)
+
+
+@pytest.mark.parametrize("projection", [None, {"status": 1}])
+def test_find_user_by_email_uses_email_key_index(mongo, monkeypatch, projection):
+    users = mongo["users"]
+    users.insert_one({"name": "A", "email": "Someone@Example.com", "email_key": "someone@example.com"})
+    ensure_email_key_index()
+    # Backfill finished: only the indexed lookup runs
+    monkeypatch.setattr(user_model, "_email_keys_backfilled", True)
+    recording = _RecordingUsers(users)
+    real_get_collection = user_model.get_collection
+    monkeypatch.setattr(
+        user_model, "get_collection", lambda name: recording if name == "users" else real_get_collection(name)
+    )
+
+    assert user_model.find_user_by_email(" SOMEONE@example.com ", projection) is not None
+    assert len(recording.filters) == 1
+
+    try:
+        plan = users.find(recording.filters[0], projection).explain()["queryPlanner"]["winningPlan"]
+    except (OperationFailure, AttributeError, KeyError) as e:
+        pytest.skip(f"explain() not supported here: {e}")
+    stages = _stages(plan)
+    assert "IXSCAN" in stages and "COLLSCAN" not in stages, stages
@@ -0,0 +1,117 @@
+"""OTP backends: attempt limits, single use under concurrency, TTL index and the timing wheel."""
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+import utils.otp_store as otp_store
+from utils.otp_store import MemoryOtpStore, MongoOtpStore, TimingWheel
+from utils.otp_service import ensure_otp_indexes, hash_otp
+
+CODE, WRONG = hash_otp("123456"), hash_otp("654321")
+
+
+@pytest.fixture(params=["mongo", "memory"])
+def store(request, mock_mongo):
+    if request.param == "mongo":
+        ensure_otp_indexes()
+        return MongoOtpStore()
+    return MemoryOtpStore()
+
+
+def _issue(store, user_id: str, otp_hash: str = CODE, minutes: float = 5) -> None:
+    store.store(user_id, "voter@example.com", otp_hash, datetime.utcnow() + timedelta(minutes=minutes))
+
+
+def test_otp_is_invalidated_after_max_attempts(store):
+    user_id = str(ObjectId())
+    _issue(store, user_id)
+    for _ in range(otp_store.OTP_MAX_ATTEMPTS):
+        assert not store.verify(user_id, WRONG)
+    # The right code no longer works once the attempts are used up
+    assert not store.verify(user_id, CODE)
+
+
+def test_correct_code_after_some_misses_is_accepted_once(store):
+    user_id = str(ObjectId())
+    _issue(store, user_id)
+    for _ in range(otp_store.OTP_MAX_ATTEMPTS - 1):
+        assert not store.verify(user_id, WRONG)
+    assert store.verify(user_id, CODE)
+    assert not store.verify(user_id, CODE)
+
+
+def test_newest_otp_is_the_one_verified(store):
+    user_id = str(ObjectId())
+    _issue(store, user_id, hash_otp("111111"))
+    _issue(store, user_id)
+    assert not store.verify(user_id, hash_otp("111111"))
+    assert store.verify(user_id, CODE)
+
+
+def test_concurrent_verifies_cannot_both_succeed(store):
+    user_id = str(ObjectId())
+    _issue(store, user_id)
+    callers = 8
+    barrier = threading.Barrier(callers)
+    results = []
+
+    def submit():
+        barrier.wait()
+        results.append(store.verify(user_id, CODE))
+
+    threads = [threading.Thread(target=submit) for _ in range(callers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    assert sorted(results) == [False] * (callers - 1) + [True]
+
+
+def test_expired_otp_is_rejected(store):
+    user_id = str(ObjectId())
+    _issue(store, user_id, minutes=-1)
+    assert not store.verify(user_id, CODE)
+
+
+def test_mongo_otps_expire_through_the_ttl_index(mock_mongo):
+    ensure_otp_indexes()
+    indexes = mock_mongo["otps"].index_information()
+    assert indexes["expires_at_1"]["expireAfterSeconds"] == 0
+    assert ("user_id", 1) in indexes["user_id_1_used_1_created_at_-1_expires_at_1"]["key"]
+
+    # The TTL monitor is what removes OTPs; verification only marks them used
+    store, user_id = MongoOtpStore(), str(ObjectId())
+    _issue(store, user_id)
+    assert store.verify(user_id, CODE)
+    assert mock_mongo["otps"].find_one({"user_id": ObjectId(user_id)})["used"]
+    assert mock_mongo["otps"].count_documents(MongoOtpStore.match(user_id)) == 0
+
+
+def test_memory_store_expires_through_the_wheel():
+    store, user_id = MemoryOtpStore(), str(ObjectId())
+    _issue(store, user_id, minutes=-1)
+    _issue(store, user_id, hash_otp("111111"))
+    assert store.stats()["outstanding"] == 2
+    with store._lock:
+        store._advance(time.monotonic() + 2 * MemoryOtpStore.TICK_SECONDS)
+    assert store.stats() == {"outstanding": 1, "users": 1, "expired": 1, "invalidated": 0}
+
+
+def test_timing_wheel_expires_on_each_level():
+    wheel = TimingWheel(tick_seconds=1.0)
+    base = wheel._tick
+    soon, later, overflow = object(), object(), object()
+    wheel.schedule(base + 3.5, soon)
+    # Beyond the current page: held on level 1 and cascaded down
+    wheel.schedule(base + TimingWheel.SLOTS * 2 + 0.5, later)
+    # Beyond level 1 entirely: held on the overflow list
+    wheel.schedule(base + TimingWheel.SLOTS ** 2 + 10.5, overflow)
+
+    assert wheel.advance(base + 3.9) == []
+    assert wheel.advance(base + 4) == [soon]
+    assert wheel.advance(base + TimingWheel.SLOTS * 2 + 0.9) == []
+    assert wheel.advance(base + TimingWheel.SLOTS * 2 + 1) == [later]
+    assert wheel.advance(base + TimingWheel.SLOTS ** 2 + 10.9) == []
+    assert wheel.advance(base + TimingWheel.SLOTS ** 2 + 11) == [overflow]
+    assert wheel.advance(base + TimingWheel.SLOTS ** 3) == []
@@ -0,0 +1,112 @@
+"""Materialized tallies: backfill of existing votes, striped counters and reconcile."""
+import pytest
+from bson import ObjectId
+import models.tally_model as tally_model
+from models.votes_model import count_votes, count_votes_aggregate
+from database.backfill_tallies import backfill_tallies
+
+
+@pytest.fixture
+def db(mock_mongo, monkeypatch):
+    monkeypatch.setattr(tally_model, "_tallies_backfilled", False)
+    monkeypatch.setattr(tally_model, "TALLY_RECONCILE_SETTLE_SECONDS", 0)
+    return mock_mongo
+
+
+def _election(db, candidates: int = 2, stripes: int = 1):
+    election_oid = db["elections"].insert_one({"election_name": "E", "status": "active", "tally_stripes": stripes}).inserted_id
+    candidate_oids = db["candidates"].insert_many(
+        [{"candidate_name": f"c{i}", "election_id": election_oid} for i in range(candidates)]
+    ).inserted_ids
+    return str(election_oid), candidate_oids
+
+
+def _seed_votes(db, election_id: str, candidate_oid: ObjectId, count: int) -> None:
+    db["votes"].insert_many([
+        {"user_id": ObjectId(), "candidate_id": candidate_oid, "election_id": ObjectId(election_id)}
+        for _ in range(count)
+    ])
+
+
+def _totals(results) -> dict:
+    return {r["candidate_id"]: r["total_votes"] for r in results}
+
+
+def test_votes_recorded_before_tallies_are_backfilled(db):
+    election_id, (first, second) = _election(db)
+    _seed_votes(db, election_id, first, 5)
+    _seed_votes(db, election_id, second, 2)
+    expected = {str(first): 5, str(second): 2}
+
+    # No tallies yet: results are counted from the raw votes
+    assert _totals(count_votes(election_id)) == expected
+    assert backfill_tallies() == 2
+    assert tally_model.tallies_backfilled()
+    assert tally_model.get_tallies(ObjectId(election_id)) == {first: 5, second: 2}
+    assert _totals(count_votes(election_id)) == _totals(count_votes_aggregate(election_id)) == expected
+    # Finished: a second run does nothing
+    assert backfill_tallies() == 0
+
+
+def test_backfill_resumes_after_the_last_election_done(db):
+    done_id, (done_candidate, _) = _election(db)
+    todo_id, (todo_candidate, _) = _election(db)
+    _seed_votes(db, done_id, done_candidate, 3)
+    _seed_votes(db, todo_id, todo_candidate, 4)
+    db["settings"].insert_one({"_id": tally_model.TALLY_BACKFILL_ID, "last_id": ObjectId(done_id)})
+
+    assert backfill_tallies() == 1
+    assert tally_model.get_tallies(ObjectId(done_id)) == {}
+    assert tally_model.get_tallies(ObjectId(todo_id)) == {todo_candidate: 4}
+
+
+def test_striped_increments_sum_across_stripes(db):
+    election_id, (first, second) = _election(db, stripes=8)
+    election_oid = ObjectId(election_id)
+    voters = [ObjectId() for _ in range(200)]
+    for user_oid in voters[:150]:
+        tally_model.increment_tally(election_oid, first, user_oid)
+    tally_model.increment_tallies([
+        {"user_id": user_oid, "candidate_id": second, "election_id": election_oid} for user_oid in voters[150:]
+    ])
+
+    per_stripe = {doc["stripe"]: doc["count"] for doc in db["tallies"].find({"election_id": election_oid, "candidate_id": first})}
+    expected = {}
+    for user_oid in voters[:150]:
+        stripe = tally_model.pick_stripe(user_oid, 8)
+        expected[stripe] = expected.get(stripe, 0) + 1
+    assert len(per_stripe) > 1 and per_stripe == expected
+    assert tally_model.get_tallies(election_oid) == {first: 150, second: 50}
+
+
+def test_reconcile_corrects_drift_confirmed_on_both_passes(db):
+    election_id, (first, second) = _election(db, stripes=4)
+    election_oid = ObjectId(election_id)
+    _seed_votes(db, election_id, first, 6)
+    _seed_votes(db, election_id, second, 3)
+    tally_model.increment_tallies(list(db["votes"].find({"election_id": election_oid})))
+    # A lost $inc on one candidate, a double-applied one on the other
+    db["tallies"].update_one({"election_id": election_oid, "candidate_id": first}, {"$inc": {"count": -2}})
+    db["tallies"].update_one({"election_id": election_oid, "candidate_id": second}, {"$inc": {"count": 1}})
+
+    report = tally_model.reconcile_tallies(election_id)
+    assert report["corrected"] == 2 and report["unconfirmed"] == []
+    assert {d["candidate_id"]: d["delta"] for d in report["drift"]} == {str(first): 2, str(second): -1}
+    assert tally_model.get_tallies(election_oid) == {first: 6, second: 3}
+    assert tally_model.reconcile_tallies(election_id)["drift"] == []
+
+
+def test_reconcile_leaves_drift_that_settles_unconfirmed(db, monkeypatch):
+    election_id, (first, _) = _election(db)
+    election_oid = ObjectId(election_id)
+    _seed_votes(db, election_id, first, 2)
+    tally_model.increment_tallies(list(db["votes"].find({"election_id": election_oid})))
+    # A vote inserted but not yet counted: its $inc lands between the two passes
+    in_flight = {"user_id": ObjectId(), "candidate_id": first, "election_id": election_oid}
+    db["votes"].insert_one(in_flight)
+    monkeypatch.setattr(tally_model.time, "sleep", lambda seconds: tally_model.increment_tallies([in_flight]))
+
+    report = tally_model.reconcile_tallies(election_id)
+    assert report["drift"] == [] and report["corrected"] == 0
+    assert [d["candidate_id"] for d in report["unconfirmed"]] == [str(first)]
+    assert tally_model.get_tallies(election_oid) == {first: 3}
@@ -0,0 +1,51 @@
+"""Group commit: per-document outcomes of a batched insert_many."""
+import threading
+import pytest
+from bson import ObjectId
+from utils.vote_batcher import VoteBatcher
+
+
+@pytest.fixture
+def db(mock_mongo):
+    mock_mongo["votes"].create_index([("user_id", 1), ("election_id", 1)], unique=True)
+    return mock_mongo
+
+
+def _vote(election_oid: ObjectId, candidate_oid: ObjectId, user_oid: ObjectId = None) -> dict:
+    return {"user_id": user_oid or ObjectId(), "candidate_id": candidate_oid, "election_id": election_oid, "timestamp": None}
+
+
+def _submit_together(batcher: VoteBatcher, docs: list) -> list:
+    """Submit every doc from its own thread; returns each caller's result (or exception)"""
+    results = [None] * len(docs)
+
+    def caller(i):
+        try:
+            results[i] = batcher.submit(docs[i])
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(len(docs))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    return results
+
+
+def test_duplicate_in_batch_is_reported_to_its_caller_only(db):
+    election_oid, candidate_oid = ObjectId(), ObjectId()
+    repeat_voter = ObjectId()
+    db["votes"].insert_one(_vote(election_oid, candidate_oid, repeat_voter))
+    docs = [_vote(election_oid, candidate_oid) for _ in range(4)]
+    docs.insert(2, _vote(election_oid, candidate_oid, repeat_voter))
+
+    # The batch stays open until every caller has joined it
+    batcher = VoteBatcher(max_delay_ms=5000, max_size=len(docs))
+    results = _submit_together(batcher, docs)
+
+    assert [r is True for r in results] == [True, True, False, True, True]
+    assert results[2] is False
+    assert db["votes"].count_documents({"election_id": election_oid}) == 5
+    tallied = sum(doc["count"] for doc in db["tallies"].find({"election_id": election_oid}))
+    assert tallied == 4
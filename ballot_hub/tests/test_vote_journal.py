@@ -0,0 +1,151 @@
+"""Vote journal recovery: torn tails, crashes mid-drain and partially drained segments."""
+import glob
+import os
+import pytest
+from bson import ObjectId
+import models.votes_model as votes_model
+import utils.vote_journal as vote_journal
+from utils.vote_journal import VoteJournal, UNTALLIED
+
+SEGMENT_BYTES = 64 * 1024
+
+
+@pytest.fixture
+def db(mock_mongo, monkeypatch):
+    mock_mongo["votes"].create_index([("user_id", 1), ("election_id", 1)], unique=True)
+    recorded = []
+    monkeypatch.setattr(votes_model, "on_vote_recorded", recorded.append)
+    mock_mongo.recorded = recorded
+    return mock_mongo
+
+
+def _journal(tmp_path) -> VoteJournal:
+    return VoteJournal(directory=str(tmp_path), segment_bytes=SEGMENT_BYTES, drain=False)
+
+
+def _vote(election_oid: ObjectId, candidate_oid: ObjectId) -> dict:
+    return {"user_id": ObjectId(), "candidate_id": candidate_oid, "election_id": election_oid, "timestamp": None}
+
+
+def _append(journal: VoteJournal, count: int, election_oid: ObjectId, candidate_oid: ObjectId) -> list:
+    docs = [_vote(election_oid, candidate_oid) for _ in range(count)]
+    for doc in docs:
+        assert journal.append(doc)
+    return docs
+
+
+def _drain(journal: VoteJournal) -> None:
+    while journal._drain_once():
+        pass
+
+
+def _tally(db, election_oid: ObjectId) -> int:
+    return sum(doc["count"] for doc in db["tallies"].find({"election_id": election_oid}))
+
+
+def _segment_path(tmp_path) -> str:
+    (path,) = glob.glob(os.path.join(str(tmp_path), "votes-*.wal"))
+    return path
+
+
+def _record_end(journal: VoteJournal) -> int:
+    return journal._active.write_offset
+
+
+def test_truncated_tail_record_is_dropped(db, tmp_path):
+    election_oid, candidate_oid = ObjectId(), ObjectId()
+    journal = _journal(tmp_path)
+    _append(journal, 2, election_oid, candidate_oid)
+    intact_end = _record_end(journal)
+    _append(journal, 1, election_oid, candidate_oid)
+    torn_end = _record_end(journal)
+    path = _segment_path(tmp_path)
+    journal.close()
+
+    # The crash cut the last record short
+    os.truncate(path, intact_end + (torn_end - intact_end) // 2)
+    recovered = _journal(tmp_path)
+    assert recovered.backlog()["pending_votes"] == 2
+    _drain(recovered)
+    assert db["votes"].count_documents({"election_id": election_oid}) == 2
+    assert _tally(db, election_oid) == 2
+    recovered.close()
+
+
+def test_corrupted_tail_record_is_dropped(db, tmp_path):
+    election_oid, candidate_oid = ObjectId(), ObjectId()
+    journal = _journal(tmp_path)
+    _append(journal, 2, election_oid, candidate_oid)
+    intact_end = _record_end(journal)
+    _append(journal, 1, election_oid, candidate_oid)
+    path = _segment_path(tmp_path)
+    journal.close()
+
+    # A torn write: the last record's body no longer matches its crc
+    with open(path, "r+b") as f:
+        f.seek(intact_end + 12)
+        byte = f.read(1)
+        f.seek(intact_end + 12)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    recovered = _journal(tmp_path)
+    _drain(recovered)
+    assert db["votes"].count_documents({"election_id": election_oid}) == 2
+    assert _tally(db, election_oid) == 2
+    recovered.close()
+
+
+@pytest.mark.parametrize("tallied", [False, True])
+def test_crash_between_insert_and_mark_tallies_once(db, tmp_path, tallied):
+    election_oid, candidate_oid = ObjectId(), ObjectId()
+    journal = _journal(tmp_path)
+    _append(journal, 3, election_oid, candidate_oid)
+    segment = journal._active
+    docs, _ = segment.read(segment.drained, segment.write_offset, 100)
+    # Drain up to the crash: votes inserted (and maybe tallied), segment never marked drained
+    inserted = journal._replay(docs)
+    if tallied:
+        journal._apply_tallies(inserted)
+    journal.close()
+
+    recovered = _journal(tmp_path)
+    _drain(recovered)
+    assert db["votes"].count_documents({"election_id": election_oid}) == 3
+    assert db["votes"].count_documents({UNTALLIED: True}) == 0
+    assert _tally(db, election_oid) == 3
+    assert recovered.backlog()["repeats_dropped"] == 0
+    recovered.close()
+
+
+def test_restart_with_partially_drained_segment(db, tmp_path, monkeypatch):
+    election_oid, candidate_oid = ObjectId(), ObjectId()
+    monkeypatch.setattr(vote_journal, "VOTE_JOURNAL_DRAIN_BATCH", 2)
+    journal = _journal(tmp_path)
+    _append(journal, 5, election_oid, candidate_oid)
+    path = _segment_path(tmp_path)
+    assert journal._drain_once()
+    journal.close()
+
+    recovered = _journal(tmp_path)
+    assert recovered.backlog()["pending_votes"] == 3
+    _drain(recovered)
+    assert db["votes"].count_documents({"election_id": election_oid}) == 5
+    assert _tally(db, election_oid) == 5
+    assert len(db.recorded) == 5
+    # The recovered segment is deleted once fully drained
+    assert not os.path.exists(path)
+    recovered.close()
+
+
+def test_repeat_vote_is_rejected(db, tmp_path):
+    election_oid, candidate_oid = ObjectId(), ObjectId()
+    journal = _journal(tmp_path)
+    (first,) = _append(journal, 1, election_oid, candidate_oid)
+    repeat = dict(first, _id=ObjectId(), candidate_id=ObjectId())
+    # Still in this worker's journal
+    assert not journal.append(dict(repeat))
+    _drain(journal)
+    # Already in MongoDB
+    assert not journal.append(dict(repeat))
+    assert _tally(db, election_oid) == 1
+    journal.close()
+
@@ -0,0 +1,177 @@
+"""
+Adaptive admission control for the API.
+Requests are grouped into route classes (vote, login, read, admin). Each class
+has an in-flight limit that shrinks as the recent MongoDB latency observed by
+that class rises above ADMISSION_DB_LATENCY_TARGET_MS. Classes also have a
+priority: lower-priority classes may only use a share of the global in-flight
+budget, so admin listings are shed long before /api/vote is.
+Requests over a limit are rejected up front with 503 and Retry-After instead
+of timing out deep inside pymongo.
+"""
+import math
+import threading
+from contextvars import ContextVar
+from typing import Dict, Optional
+from flask import Flask, g, jsonify, request
+from pymongo import monitoring
+from config import (
+    ADMISSION_CONTROL_ENABLED, ADMISSION_MAX_INFLIGHT, ADMISSION_CLASS_LIMITS,
+    ADMISSION_DB_LATENCY_TARGET_MS
+)
+
+# Share of ADMISSION_MAX_INFLIGHT each class may occupy (higher = more priority)
+PRIORITY_SHARE = {"vote": 1.0, "login": 0.85, "read": 0.7, "admin": 0.5}
+LOGIN_PATHS = ("/api/login", "/api/register", "/api/admin/login")
+# Long-lived responses would pin a slot for their whole lifetime, and stats
+# must stay reachable while the server is shedding load
+UNMANAGED_SUFFIXES = ("/stream",)
+UNMANAGED_PREFIXES = ("/api/admin/export/", "/api/admin/stats/")
+EWMA_ALPHA = 0.2
+
+# Route class of the request being served. A ContextVar rather than a
+# thread-local: async handlers share one thread, and Motor and
+# asyncio.to_thread copy the context into the threads that run pymongo
+_route_class: ContextVar[Optional[str]] = ContextVar("admission_route_class", default=None)
+
+
+def classify(path: str) -> Optional[str]:
+    if not path.startswith("/api/") or path.endswith(UNMANAGED_SUFFIXES):
+        return None
+    if path == "/api/vote":
+        return "vote"
+    if path in LOGIN_PATHS:
+        return "login"
+    if path.startswith(UNMANAGED_PREFIXES):
+        return None
+    if path.startswith("/api/admin/"):
+        return "admin"
+    return "read"
+
+
+class _ClassState:
+    __slots__ = ("base_limit", "inflight", "admitted", "rejected", "db_latency_ms")
+
+    def __init__(self, base_limit: int):
+        self.base_limit = base_limit
+        self.inflight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.db_latency_ms = 0.0
+
+    def limit(self) -> int:
+        if self.db_latency_ms <= ADMISSION_DB_LATENCY_TARGET_MS:
+            return self.base_limit
+        scale = ADMISSION_DB_LATENCY_TARGET_MS / self.db_latency_ms
+        return max(1, int(self.base_limit * scale))
+
+
+class AdmissionController:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._classes: Dict[str, _ClassState] = {
+            name: _ClassState(limit) for name, limit in ADMISSION_CLASS_LIMITS.items()
+        }
+        self._inflight = 0
+
+    def try_admit(self, route_class: str) -> bool:
+        with self._lock:
+            state = self._classes[route_class]
+            share = int(ADMISSION_MAX_INFLIGHT * PRIORITY_SHARE.get(route_class, 0.5))
+            if state.inflight >= state.limit() or self._inflight >= max(1, share):
+                state.rejected += 1
+                return False
+            state.inflight += 1
+            state.admitted += 1
+            self._inflight += 1
+            return True
+
+    def release(self, route_class: str) -> None:
+        with self._lock:
+            self._classes[route_class].inflight -= 1
+            self._inflight -= 1
+
+    def record_db_latency(self, route_class: str, millis: float) -> None:
+        with self._lock:
+            state = self._classes.get(route_class)
+            if state is not None:
+                state.db_latency_ms += EWMA_ALPHA * (millis - state.db_latency_ms)
+
+    def retry_after(self, route_class: str) -> int:
+        """Seconds a rejected client should wait, longer when the database is slow"""
+        with self._lock:
+            latency = self._classes[route_class].db_latency_ms
+        return max(1, min(30, math.ceil(latency / max(ADMISSION_DB_LATENCY_TARGET_MS, 1.0))))
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "enabled": ADMISSION_CONTROL_ENABLED,
+                "max_inflight": ADMISSION_MAX_INFLIGHT,
+                "inflight": self._inflight,
+                "db_latency_target_ms": ADMISSION_DB_LATENCY_TARGET_MS,
+                "classes": {
+                    name: {
+                        "inflight": state.inflight,
+                        "limit": state.limit(),
+                        "base_limit": state.base_limit,
+                        "priority_share": PRIORITY_SHARE.get(name, 0.5),
+                        "db_latency_ms": round(state.db_latency_ms, 2),
+                        "admitted": state.admitted,
+                        "rejected": state.rejected,
+                    }
+                    for name, state in self._classes.items()
+                },
+            }
+
+
+controller = AdmissionController()
+
+
+class DBLatencyListener(monitoring.CommandListener):
+    """Attributes MongoDB command latency to the route class of the calling request"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        route_class = _route_class.get()
+        if route_class:
+            controller.record_db_latency(route_class, event.duration_micros / 1000.0)
+
+    def failed(self, event):
+        self.succeeded(event)
+
+
+def enter_route_class(route_class: str) -> None:
+    """Attribute the database latency of the current request to route_class"""
+    _route_class.set(route_class)
+
+
+def exit_route_class() -> None:
+    _route_class.set(None)
+
+
+def init_admission(app: Flask) -> None:
+    if not ADMISSION_CONTROL_ENABLED:
+        return
+
+    @app.before_request
+    def _admit():
+        route_class = classify(request.path)
+        if route_class is None:
+            return None
+        if not controller.try_admit(route_class):
+            response = jsonify({"error": "Server is busy. Please retry shortly."})
+            response.status_code = 503
+            response.headers["Retry-After"] = str(controller.retry_after(route_class))
+            return response
+        g.admission_class = route_class
+        enter_route_class(route_class)
+        return None
+
+    @app.teardown_request
+    def _release(exc):
+        route_class = g.pop("admission_class", None)
+        if route_class is not None:
+            exit_route_class()
+            controller.release(route_class)
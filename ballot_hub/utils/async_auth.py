@@ -0,0 +1,56 @@
+"""
+JWT handling for the async (Quart) handlers.
+Tokens are created and decoded by flask_jwt_extended inside the Flask app's
+context, so both serving modes issue and accept exactly the same tokens.
+"""
+from functools import wraps
+from typing import Any, Dict, Optional
+from flask import Flask
+from flask_jwt_extended import create_access_token, decode_token
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
+
+_flask_app: Optional[Flask] = None
+
+
+def init_async_auth(flask_app: Flask) -> None:
+    global _flask_app
+    _flask_app = flask_app
+
+
+def create_token(identity: str, claims: Dict[str, Any]) -> str:
+    with _flask_app.app_context():
+        return create_access_token(identity=identity, additional_claims=claims)
+
+
+def jwt_required(view):
+    """Async counterpart of flask_jwt_extended.jwt_required() with the same error responses"""
+    from quart import request, g
+
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        header = request.headers.get("Authorization", "")
+        if not header.startswith("Bearer "):
+            return {"msg": "Missing Authorization Header"}, 401
+        try:
+            with _flask_app.app_context():
+                claims = decode_token(header[len("Bearer "):])
+        except ExpiredSignatureError:
+            return {"msg": "Token has expired"}, 401
+        except (InvalidTokenError, JWTExtendedException) as e:
+            return {"msg": str(e)}, 422
+        if claims.get("type") != "access":
+            return {"msg": "Only non-refresh tokens are allowed"}, 422
+        g.jwt_claims = claims
+        return await view(*args, **kwargs)
+
+    return wrapper
+
+
+def get_jwt() -> Dict[str, Any]:
+    from quart import g
+    return g.jwt_claims
+
+
+def get_jwt_identity() -> Optional[str]:
+    return get_jwt().get("sub")
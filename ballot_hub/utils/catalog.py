@@ -0,0 +1,164 @@
+"""
+In-process catalog of election and candidate metadata.
+Elections and candidates are read on every ballot load and every vote but
+almost never change. All elections are held in memory in an interval index
+on (start_date, end_date), so "active now" is a bisect instead of a date-range
+query, and candidate lists are cached per election. Admin writes invalidate
+the affected entries; CATALOG_CACHE_TTL_SECONDS bounds staleness from writes
+made by other worker processes. record_vote checks elections against it
+(results_model.ensure_election_open); finalization re-reads the election
+document itself.
+Cached documents are shared; callers must copy before modifying them.
+"""
+import bisect
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import PyMongoError
+from database.connection import get_collection
+from config import CATALOG_CACHE_TTL_SECONDS
+
+ELECTION_FIELDS = {"election_name": 1, "start_date": 1, "end_date": 1, "status": 1}
+CANDIDATE_FIELDS = {"candidate_name": 1, "election_id": 1, "photo": 1}
+# After a failed reload, how long the stale election index is served before retrying
+STALE_RETRY_SECONDS = 5
+
+
+class _ElectionIndex:
+    """
+    Elections sorted by start_date, with a running maximum of end_date.
+    Intervals containing `now` all start at or before now; scanning back from
+    that point can stop as soon as the running max end_date is before now.
+    """
+
+    def __init__(self, docs: List[Dict[str, Any]]):
+        self.by_id: Dict[str, Dict[str, Any]] = {str(doc["_id"]): doc for doc in docs}
+        dated = [doc for doc in docs
+                 if isinstance(doc.get("start_date"), datetime) and isinstance(doc.get("end_date"), datetime)]
+        dated.sort(key=lambda doc: doc["start_date"])
+        self.sorted = dated
+        self.starts = [doc["start_date"] for doc in dated]
+        self.max_end: List[datetime] = []
+        for doc in dated:
+            self.max_end.append(max(self.max_end[-1], doc["end_date"]) if self.max_end else doc["end_date"])
+        self.expires_at = time.monotonic() + CATALOG_CACHE_TTL_SECONDS
+
+    def containing(self, now: datetime) -> List[Dict[str, Any]]:
+        """Elections whose [start_date, end_date] contains now, newest start first"""
+        found = []
+        i = bisect.bisect_right(self.starts, now) - 1
+        while i >= 0 and self.max_end[i] >= now:
+            if self.sorted[i]["end_date"] >= now:
+                found.append(self.sorted[i])
+            i -= 1
+        return found
+
+
+_lock = threading.Lock()
+_index: Optional[_ElectionIndex] = None
+# election_id -> (expires_at, candidates)
+_candidate_lists: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+# candidate_id -> (expires_at, candidate)
+_candidates: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+
+def _election_index() -> _ElectionIndex:
+    global _index
+    with _lock:
+        index = _index
+    if index is not None and index.expires_at > time.monotonic():
+        return index
+    try:
+        index = _ElectionIndex(list(get_collection("elections").find({}, ELECTION_FIELDS)))
+    except (PyMongoError, ConnectionError) as e:
+        if index is None:
+            raise
+        # Keep serving the stale index while MongoDB is unavailable, retrying shortly
+        print(f"⚠️  Could not reload the election catalog, serving the cached one: {e}")
+        with _lock:
+            index.expires_at = time.monotonic() + STALE_RETRY_SECONDS
+        return index
+    with _lock:
+        _index = index
+    return index
+
+
+def get_active_elections(now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Elections with status active whose polling window contains now"""
+    now = now or datetime.utcnow()
+    return [doc for doc in _election_index().containing(now) if doc.get("status") == "active"]
+
+
+def get_election(election_id: str) -> Optional[Dict[str, Any]]:
+    doc = _election_index().by_id.get(election_id)
+    if doc is not None:
+        return doc
+    # Possibly created by another worker since the index was loaded
+    try:
+        oid = ObjectId(election_id)
+    except (InvalidId, TypeError):
+        return None
+    doc = get_collection("elections").find_one({"_id": oid}, ELECTION_FIELDS)
+    if doc is not None:
+        invalidate_elections()
+    return doc
+
+
+def get_election_candidates(election_id: str) -> List[Dict[str, Any]]:
+    """Candidates for an election, raises ValueError for a malformed id"""
+    now = time.monotonic()
+    with _lock:
+        hit = _candidate_lists.get(election_id)
+    if hit is not None and hit[0] > now:
+        return hit[1]
+    try:
+        election_oid = ObjectId(election_id)
+    except (InvalidId, TypeError):
+        raise ValueError(f"Invalid election_id: {election_id}")
+    docs = list(get_collection("candidates").find({"election_id": election_oid}, CANDIDATE_FIELDS))
+    expires_at = now + CATALOG_CACHE_TTL_SECONDS
+    with _lock:
+        _candidate_lists[election_id] = (expires_at, docs)
+        for doc in docs:
+            _candidates[str(doc["_id"])] = (expires_at, doc)
+    return docs
+
+
+def get_candidate(candidate_id: str) -> Optional[Dict[str, Any]]:
+    now = time.monotonic()
+    with _lock:
+        hit = _candidates.get(candidate_id)
+    if hit is not None and hit[0] > now:
+        return hit[1]
+    try:
+        oid = ObjectId(candidate_id)
+    except (InvalidId, TypeError):
+        return None
+    doc = get_collection("candidates").find_one({"_id": oid}, CANDIDATE_FIELDS)
+    if doc is None:
+        return None
+    with _lock:
+        _candidates[candidate_id] = (now + CATALOG_CACHE_TTL_SECONDS, doc)
+    return doc
+
+
+def invalidate_elections() -> None:
+    global _index
+    with _lock:
+        _index = None
+
+
+def invalidate_candidates(election_id: Optional[str] = None) -> None:
+    """Drop cached candidates for one election, or for all elections"""
+    with _lock:
+        if election_id is None:
+            _candidate_lists.clear()
+            _candidates.clear()
+            return
+        _candidate_lists.pop(election_id, None)
+        for candidate_id in [cid for cid, (_, doc) in _candidates.items()
+                             if str(doc.get("election_id")) == election_id]:
+            del _candidates[candidate_id]
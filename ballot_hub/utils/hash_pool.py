@@ -0,0 +1,253 @@
+"""
+Password hashing: the one place bcrypt is called.
+
+Cost calibration
+    Unless PASSWORD_HASH_ROUNDS pins it, the bcrypt cost is calibrated so one
+    hash takes about PASSWORD_HASH_TARGET_MS on this hardware, within
+    [PASSWORD_HASH_MIN_ROUNDS, PASSWORD_HASH_MAX_ROUNDS]. The first worker to
+    calibrate stores the result in the `settings` collection and every other
+    worker uses it, so a heterogeneous fleet agrees on one cost. Changing
+    PASSWORD_HASH_TARGET_MS triggers a new calibration.
+    A bcrypt hash records its own parameters ("$2b$<rounds>$..."). When a user
+    logs in with a hash whose cost differs from the target, it is rehashed in
+    the background, so cost changes roll out without a mass password reset.
+
+Process pool
+    One bcrypt at the target cost is a quarter second or so of CPU. Run on
+    request threads, a login burst puts every core of the worker into bcrypt
+    and starves everything else it serves. Here at most PASSWORD_HASH_WORKERS
+    hashes run at once, in separate processes. At most
+    PASSWORD_HASH_MAX_QUEUE more may wait; beyond that HashingBusyError is
+    raised, so the caller can answer 503 immediately instead of queueing
+    without bound. PASSWORD_HASH_WORKERS=0 hashes on the calling thread.
+"""
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+import bcrypt
+from config import (
+    PASSWORD_HASH_ROUNDS, PASSWORD_HASH_TARGET_MS, PASSWORD_HASH_MIN_ROUNDS, PASSWORD_HASH_MAX_ROUNDS,
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE
+)
+from utils.latency import sample_window, percentile_ms
+
+SETTINGS_ID = "password_hash"
+CALIBRATION_SAMPLES = 3
+
+
+class HashingBusyError(Exception):
+    """Raised when the hashing queue is full"""
+
+
+def _hash(password: bytes, rounds: int) -> Tuple[bytes, float]:
+    start = time.perf_counter()
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+    return hashed, time.perf_counter() - start
+
+
+def _check(password: bytes, hashed: bytes) -> Tuple[bool, float]:
+    start = time.perf_counter()
+    ok = bcrypt.checkpw(password, hashed)
+    return ok, time.perf_counter() - start
+
+
+def _calibrate(target_seconds: float, min_rounds: int, max_rounds: int) -> Tuple[int, float]:
+    """Cost whose hash time is closest to target_seconds; each extra round doubles the work"""
+    start = time.perf_counter()
+    elapsed = min(_hash(b"calibration", min_rounds)[1] for _ in range(CALIBRATION_SAMPLES))
+    rounds = min_rounds + max(0, round(math.log2(max(target_seconds, elapsed) / elapsed)))
+    return min(max_rounds, rounds), time.perf_counter() - start
+
+
+def hash_params(hashed_password: str) -> Dict[str, Any]:
+    """Parameters recorded in a bcrypt hash string"""
+    parts = hashed_password.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return {"scheme": "unknown"}
+    return {"scheme": "bcrypt", "variant": parts[1], "rounds": int(parts[2])}
+
+
+class HashPool:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._errors = 0
+        self._hash_seconds = sample_window()
+        self._wait_seconds = sample_window()
+        self._rounds: Optional[int] = PASSWORD_HASH_ROUNDS or None
+        self._rounds_lock = threading.Lock()
+        self._rehashed = 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _submit(self, fn: Callable, *args, record: bool = True) -> Future:
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue and self.workers > 0:
+                self._rejected += 1
+                raise HashingBusyError("Password hashing queue is full")
+            self._pending += 1
+        submitted = time.perf_counter()
+        if self.workers <= 0:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            try:
+                future = self._pool_submit(fn, *args)
+            except Exception:
+                # Nothing was queued, so no callback will release the slot
+                with self._lock:
+                    self._pending -= 1
+                    self._errors += 1
+                raise
+        future.add_done_callback(lambda f: self._finished(f, submitted, record))
+        return future
+
+    def _pool_submit(self, fn: Callable, *args) -> Future:
+        try:
+            with self._lock:
+                pool = self._pool()
+            return pool.submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed by the OS); start a fresh pool once
+            print("⚠️  Password hashing pool was broken, restarting it")
+            with self._lock:
+                self._executor = None
+                pool = self._pool()
+            return pool.submit(fn, *args)
+
+    def _finished(self, future: Future, submitted: float, record: bool) -> None:
+        total = time.perf_counter() - submitted
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self._errors += 1
+                return
+            if not record:
+                return
+            _, elapsed = future.result()
+            self._completed += 1
+            self._hash_seconds.append(elapsed)
+            self._wait_seconds.append(max(0.0, total - elapsed))
+
+    def target_rounds(self) -> int:
+        """The bcrypt cost new hashes use (pinned, stored fleet-wide, or calibrated here)"""
+        if self._rounds is not None:
+            return self._rounds
+        with self._rounds_lock:
+            if self._rounds is None:
+                self._rounds = self._load_or_calibrate()
+        return self._rounds
+
+    def _load_or_calibrate(self) -> int:
+        from pymongo.errors import DuplicateKeyError, PyMongoError
+        from database.connection import get_collection
+        try:
+            settings = get_collection("settings")
+            stored = settings.find_one({"_id": SETTINGS_ID})
+        except (PyMongoError, ConnectionError) as e:
+            print(f"⚠️  Could not read password hash settings, calibrating locally: {e}")
+            settings, stored = None, None
+        if stored and stored.get("target_ms") == PASSWORD_HASH_TARGET_MS:
+            return int(stored["rounds"])
+
+        rounds, took = self._submit(
+            _calibrate, PASSWORD_HASH_TARGET_MS / 1000.0, PASSWORD_HASH_MIN_ROUNDS, PASSWORD_HASH_MAX_ROUNDS,
+            record=False,
+        ).result()
+        print(f"✓ Calibrated bcrypt cost {rounds} for ~{PASSWORD_HASH_TARGET_MS:g} ms per hash ({took:.2f}s)")
+        if settings is not None:
+            try:
+                # Only replace a missing or outdated calibration; a concurrent worker's result wins
+                settings.update_one(
+                    {"_id": SETTINGS_ID, "target_ms": {"$ne": PASSWORD_HASH_TARGET_MS}},
+                    {"$set": {"rounds": rounds, "target_ms": PASSWORD_HASH_TARGET_MS,
+                              "calibrated_at": datetime.utcnow()}},
+                    upsert=True,
+                )
+            except DuplicateKeyError:
+                # Another worker stored a calibration for this target first
+                return int(settings.find_one({"_id": SETTINGS_ID})["rounds"])
+            except PyMongoError as e:
+                print(f"⚠️  Could not store password hash settings: {e}")
+        return rounds
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        params = hash_params(hashed_password)
+        return params["scheme"] == "bcrypt" and params["rounds"] != self.target_rounds()
+
+    def hash_password(self, plain_password: str) -> str:
+        rounds = self.target_rounds()
+        hashed, _ = self._submit(_hash, plain_password.encode("utf-8"), rounds).result()
+        return hashed.decode("utf-8")
+
+    def rehash_later(self, plain_password: str, hashed_password: str, save: Callable[[str], Any]) -> None:
+        """
+        After a successful login, rehash at the target cost in the background
+        if the stored hash uses a different one; save(new_hash) persists it.
+        Skipped (until the next login) when the pool is busy. Never blocks the
+        caller: before the target cost is known the check itself runs in the
+        background thread.
+        """
+        if self._rounds is not None and not self.needs_rehash(hashed_password):
+            return
+
+        def _rehash():
+            try:
+                if not self.needs_rehash(hashed_password):
+                    return
+                save(self.hash_password(plain_password))
+                with self._lock:
+                    self._rehashed += 1
+            except HashingBusyError:
+                pass
+            except Exception as e:
+                print(f"⚠️  Password rehash failed: {e}")
+
+        threading.Thread(target=_rehash, name="password-rehash", daemon=True).start()
+
+    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        ok, _ = self._submit(_check, plain_password.encode("utf-8"), hashed_password.encode("utf-8")).result()
+        return ok
+
+    async def verify_password_async(self, plain_password: str, hashed_password: str) -> bool:
+        future = self._submit(_check, plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+        ok, _ = await asyncio.wrap_future(future)
+        return ok
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "rounds": self._rounds,
+                "target_ms": PASSWORD_HASH_TARGET_MS,
+                "rehashed": self._rehashed,
+                "in_progress": min(self._pending, max(self.workers, 0)),
+                "queued": max(0, self._pending - max(self.workers, 0)),
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "errors": self._errors,
+                "hash_ms_p50": percentile_ms(self._hash_seconds, 0.5),
+                "hash_ms_p99": percentile_ms(self._hash_seconds, 0.99),
+                "queue_wait_ms_p50": percentile_ms(self._wait_seconds, 0.5),
+                "queue_wait_ms_p99": percentile_ms(self._wait_seconds, 0.99),
+            }
+
+
+hash_pool = HashPool()
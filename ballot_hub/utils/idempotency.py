@@ -0,0 +1,186 @@
+"""
+Idempotency keys for retried POST requests.
+A client sends an `Idempotency-Key` header; the first request with that key
+runs normally and its response is kept in memory for IDEMPOTENCY_TTL_SECONDS.
+Retries with the same key (scoped to the authenticated user) replay the stored
+response without running the view. A retry that arrives while the original is
+still running waits for it instead of running the view a second time.
+Only final outcomes are stored: successes (2xx) and errors the view marks
+with mark_final(), such as "already voted". Any other error (an election
+that is not open yet, an unknown candidate, a server error) may not hold on
+a retry, so the retry runs the view again.
+A key is bound to a fingerprint of the request (method, path and body);
+reusing it for a different request is rejected with 422 instead of
+replaying a response that belongs to another request.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Optional, Tuple, Union
+from flask import request, make_response, Response
+from flask_jwt_extended import get_jwt_identity
+from config import IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_MAX_KEYS
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+KEY_REUSED_ERROR = {"error": f"{IDEMPOTENCY_HEADER} was already used for a different request"}
+
+
+class _Stored:
+    __slots__ = ("expires_at", "fingerprint", "status", "body", "mimetype")
+
+    def __init__(self, fingerprint: str, status: int, body: bytes, mimetype: str):
+        self.expires_at = time.monotonic() + IDEMPOTENCY_TTL_SECONDS
+        self.fingerprint = fingerprint
+        self.status = status
+        self.body = body
+        self.mimetype = mimetype
+
+
+_lock = threading.Lock()
+# Insertion order equals expiry order (constant TTL), so eviction pops from the front
+_responses: "OrderedDict[str, _Stored]" = OrderedDict()
+# scoped key -> (event set when the running request finishes, its fingerprint)
+_inflight: Dict[str, Tuple[threading.Event, str]] = {}
+# Set by mark_final() while an idempotent view runs
+_final: ContextVar[bool] = ContextVar("idempotent_final", default=False)
+
+
+def mark_final() -> None:
+    """Have the error response being returned stored and replayed like a success"""
+    _final.set(True)
+
+
+def _fingerprint(method: str, path: str, body: bytes) -> str:
+    digest = hashlib.sha256(f"{method} {path}\n".encode("utf-8"))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def _evict_expired(now: float) -> None:
+    while _responses:
+        stored = next(iter(_responses.values()))
+        if stored.expires_at > now and len(_responses) <= IDEMPOTENCY_MAX_KEYS:
+            break
+        _responses.popitem(last=False)
+
+
+def _claim(scoped: str, fingerprint: str) -> Tuple[str, Union[_Stored, threading.Event, None]]:
+    """
+    ("replay", stored), ("wait", event of the running request), ("run", our
+    event) or ("mismatch", None) if the key belongs to a different request
+    """
+    with _lock:
+        now = time.monotonic()
+        _evict_expired(now)
+        stored: Optional[_Stored] = _responses.get(scoped)
+        if stored is not None and stored.expires_at > now:
+            return ("replay", stored) if stored.fingerprint == fingerprint else ("mismatch", None)
+        running = _inflight.get(scoped)
+        if running is not None:
+            done, running_fingerprint = running
+            return ("wait", done) if running_fingerprint == fingerprint else ("mismatch", None)
+        done = threading.Event()
+        _inflight[scoped] = (done, fingerprint)
+        return "run", done
+
+
+def _store(scoped: str, fingerprint: str, status: int, body: bytes, mimetype: str) -> None:
+    if 200 <= status < 300 or _final.get():
+        with _lock:
+            _responses.pop(scoped, None)
+            _responses[scoped] = _Stored(fingerprint, status, body, mimetype)
+
+
+def _release(scoped: str, done: threading.Event) -> None:
+    with _lock:
+        _inflight.pop(scoped, None)
+    done.set()
+
+
+def _replay(stored: _Stored) -> Response:
+    response = Response(stored.body, status=stored.status, mimetype=stored.mimetype)
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(view):
+    """Decorator for JWT-protected views; apply it under @jwt_required()"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER, "").strip()
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return make_response({"error": f"{IDEMPOTENCY_HEADER} is too long"}, 400)
+        scoped = f"{get_jwt_identity()}:{request.path}:{key}"
+        fingerprint = _fingerprint(request.method, request.path, request.get_data(cache=True))
+
+        while True:
+            action, value = _claim(scoped, fingerprint)
+            if action == "mismatch":
+                return make_response(KEY_REUSED_ERROR, 422)
+            if action == "replay":
+                return _replay(value)
+            if action == "run":
+                done = value
+                break
+            # Same key already running: wait for it, then replay its outcome
+            value.wait()
+
+        token = _final.set(False)
+        try:
+            response = make_response(view(*args, **kwargs))
+            _store(scoped, fingerprint, response.status_code, response.get_data(), response.mimetype)
+            return response
+        finally:
+            _final.reset(token)
+            _release(scoped, done)
+
+    return wrapper
+
+
+def async_idempotent(view):
+    """idempotent for the async (Quart) handlers; apply it under utils.async_auth.jwt_required"""
+    from quart import request as async_request, make_response as async_make_response, Response as AsyncResponse
+    from utils.async_auth import get_jwt_identity as async_jwt_identity
+
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        key = async_request.headers.get(IDEMPOTENCY_HEADER, "").strip()
+        if not key:
+            return await view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return {"error": f"{IDEMPOTENCY_HEADER} is too long"}, 400
+        scoped = f"{async_jwt_identity()}:{async_request.path}:{key}"
+        fingerprint = _fingerprint(async_request.method, async_request.path, await async_request.get_data(cache=True))
+
+        while True:
+            action, value = _claim(scoped, fingerprint)
+            if action == "mismatch":
+                return KEY_REUSED_ERROR, 422
+            if action == "replay":
+                response = AsyncResponse(value.body, status=value.status, mimetype=value.mimetype)
+                response.headers["Idempotent-Replayed"] = "true"
+                return response
+            if action == "run":
+                done = value
+                break
+            # Poll instead of blocking the event loop on the other request's Event
+            while not value.is_set():
+                await asyncio.sleep(0.01)
+
+        token = _final.set(False)
+        try:
+            response = await async_make_response(await view(*args, **kwargs))
+            _store(scoped, fingerprint, response.status_code, await response.get_data(), response.mimetype)
+            return response
+        finally:
+            _final.reset(token)
+            _release(scoped, done)
+
+    return wrapper
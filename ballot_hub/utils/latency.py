@@ -0,0 +1,21 @@
+"""
+Latency samples for the stats() endpoints: a bounded window of recent
+durations in seconds, reported as millisecond percentiles.
+"""
+from collections import deque
+from typing import Iterable, Optional
+
+# Latency samples kept for the percentiles in stats()
+SAMPLE_WINDOW = 1000
+
+
+def sample_window() -> deque:
+    return deque(maxlen=SAMPLE_WINDOW)
+
+
+def percentile_ms(samples: Iterable[float], q: float) -> Optional[float]:
+    """q-th percentile of samples (seconds), in milliseconds; None if there are none"""
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 1)
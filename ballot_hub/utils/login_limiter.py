@@ -0,0 +1,202 @@
+"""
+Login throttling ahead of the password check.
+Every sign-in attempt is checked against the account (email or admin
+username) and the client IP before any database read or bcrypt work, so a
+credential-stuffing burst is turned away for the price of a dict lookup.
+
+Counts use a sliding window approximated from two fixed windows: the
+estimate is the current window's count plus the previous window's count
+weighted by how much of it still overlaps the sliding window. Each key costs
+one small list; keys are kept in least-recently-used order, and keys whose
+windows have both passed (or the oldest, beyond LOGIN_LIMIT_MAX_KEYS) are
+evicted from the front as attempts arrive, so a check stays O(1) however
+many keys a flood creates.
+
+Only attempts that are let through to the password check are counted.
+Rejected ones spend nothing, so retrying against a throttled account does not
+keep it locked: its owner gets back in once the window has moved on.
+
+With LOGIN_LIMIT_BACKEND=mongo the per-window counters live in the
+login_attempts collection (expired by a TTL index) so the limits hold across
+workers; if MongoDB is unreachable the in-memory counters are used. There
+the counts are read and then incremented, so concurrent attempts across
+workers can overshoot a limit by a few.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import (
+    LOGIN_LIMIT_ENABLED, LOGIN_LIMIT_BACKEND, LOGIN_LIMIT_WINDOW_SECONDS, LOGIN_LIMIT_PER_ACCOUNT,
+    LOGIN_LIMIT_PER_IP, LOGIN_LIMIT_MAX_KEYS, LOGIN_LIMIT_TRUST_PROXY
+)
+
+_lock = threading.Lock()
+# key -> [window index, previous window count, current window count], least recently used first
+_counters: "OrderedDict[str, List[int]]" = OrderedDict()
+_stats = {"checked": 0, "rejected_account": 0, "rejected_ip": 0, "evicted": 0, "backend_errors": 0}
+_backend_ok = True
+
+
+def client_ip(req) -> str:
+    """Client address of a Flask or Quart request"""
+    if LOGIN_LIMIT_TRUST_PROXY:
+        forwarded = req.headers.get("X-Forwarded-For", "")
+        if forwarded:
+            return forwarded.split(",")[-1].strip()
+    return req.remote_addr or "unknown"
+
+
+def _estimate(previous: int, current: int, now: float) -> float:
+    overlap = 1.0 - (now % LOGIN_LIMIT_WINDOW_SECONDS) / LOGIN_LIMIT_WINDOW_SECONDS
+    return previous * overlap + current
+
+
+def _retry_after(previous: int, current: int, limit: int, now: float) -> int:
+    """Seconds until one more attempt fits under the limit"""
+    elapsed = now % LOGIN_LIMIT_WINDOW_SECONDS
+    if current < limit:
+        # Wait for the previous window's weight to decay far enough
+        wait = (1.0 - (limit - current - 1) / previous) * LOGIN_LIMIT_WINDOW_SECONDS - elapsed
+    else:
+        # This window is full: wait for the next one, then for this one to decay
+        wait = (LOGIN_LIMIT_WINDOW_SECONDS - elapsed) + (1.0 - (limit - 1) / current) * LOGIN_LIMIT_WINDOW_SECONDS
+    return max(1, math.ceil(wait))
+
+
+def _evict(window: int) -> None:
+    """Drop expired keys (and the oldest, beyond LOGIN_LIMIT_MAX_KEYS) from the front"""
+    evicted = 0
+    while _counters:
+        key, counter = next(iter(_counters.items()))
+        if counter[0] >= window - 1 and len(_counters) <= LOGIN_LIMIT_MAX_KEYS:
+            break
+        del _counters[key]
+        evicted += 1
+    _stats["evicted"] += evicted
+
+
+def _roll(counter: List[int], window: int) -> None:
+    if counter[0] != window:
+        counter[1] = counter[2] if counter[0] == window - 1 else 0
+        counter[0], counter[2] = window, 0
+
+
+# Given each key's (previous, current) counts before this attempt: None to let it through, else (reason, retry_after)
+Verdict = Optional[Tuple[str, int]]
+
+
+def _admit_memory(keys: List[str], now: float, decide: Callable[[List[Tuple[int, int]]], Verdict]) -> Verdict:
+    window = int(now // LOGIN_LIMIT_WINDOW_SECONDS)
+    with _lock:
+        _evict(window)
+        counts = []
+        for key in keys:
+            counter = _counters.get(key)
+            if counter is None:
+                counts.append((0, 0))
+                continue
+            _roll(counter, window)
+            _counters.move_to_end(key)
+            counts.append((counter[1], counter[2]))
+        verdict = decide(counts)
+        if verdict is None:
+            for key in keys:
+                counter = _counters.get(key)
+                if counter is None:
+                    counter = _counters[key] = [window, 0, 0]
+                counter[2] += 1
+    return verdict
+
+
+def _admit_mongo(keys: List[str], now: float, decide: Callable[[List[Tuple[int, int]]], Verdict]) -> Verdict:
+    from pymongo import UpdateOne
+    from database.connection import get_collection
+    attempts = get_collection("login_attempts")
+    window = int(now // LOGIN_LIMIT_WINDOW_SECONDS)
+    ids = [f"{key}|{w}" for key in keys for w in (window - 1, window)]
+    found = {doc["_id"]: doc["count"] for doc in attempts.find({"_id": {"$in": ids}}, {"count": 1})}
+    verdict = decide([(found.get(f"{key}|{window - 1}", 0), found.get(f"{key}|{window}", 0)) for key in keys])
+    if verdict is None:
+        # Kept until the end of the next window, when it stops counting as "previous"
+        expires_at = datetime.utcfromtimestamp((window + 2) * LOGIN_LIMIT_WINDOW_SECONDS)
+        attempts.bulk_write([
+            UpdateOne({"_id": f"{key}|{window}"}, {"$inc": {"count": 1}, "$setOnInsert": {"expires_at": expires_at}},
+                      upsert=True)
+            for key in keys
+        ], ordered=False)
+    return verdict
+
+
+def _admit(keys: List[str], now: float, decide: Callable[[List[Tuple[int, int]]], Verdict]) -> Verdict:
+    global _backend_ok
+    if LOGIN_LIMIT_BACKEND != "mongo":
+        return _admit_memory(keys, now, decide)
+    try:
+        verdict = _admit_mongo(keys, now, decide)
+        _backend_ok = True
+        return verdict
+    except Exception as e:
+        with _lock:
+            _stats["backend_errors"] += 1
+        if _backend_ok:
+            print(f"⚠️  Login limiter cannot reach MongoDB, counting in memory: {e}")
+        _backend_ok = False
+        return _admit_memory(keys, now, decide)
+
+
+def check(account: str, ip: str) -> Optional[int]:
+    """
+    Check a login attempt for account ("email:..." / "admin:...") from ip.
+    Returns None if it may proceed (and counts it), else the seconds to wait
+    before retrying.
+    """
+    if not LOGIN_LIMIT_ENABLED:
+        return None
+    now = time.time()
+
+    def decide(counts: List[Tuple[int, int]]) -> Verdict:
+        (account_prev, account_cur), (ip_prev, ip_cur) = counts
+        # This attempt would be the current window's next one
+        if _estimate(account_prev, account_cur + 1, now) > LOGIN_LIMIT_PER_ACCOUNT:
+            return "rejected_account", _retry_after(account_prev, account_cur, LOGIN_LIMIT_PER_ACCOUNT, now)
+        if _estimate(ip_prev, ip_cur + 1, now) > LOGIN_LIMIT_PER_IP:
+            return "rejected_ip", _retry_after(ip_prev, ip_cur, LOGIN_LIMIT_PER_IP, now)
+        return None
+
+    verdict = _admit([account, f"ip:{ip}"], now, decide)
+    with _lock:
+        _stats["checked"] += 1
+        if verdict is not None:
+            _stats[verdict[0]] += 1
+    return verdict[1] if verdict is not None else None
+
+
+async def check_async(account: str, ip: str) -> Optional[int]:
+    """check() for async handlers; the MongoDB backend runs in a worker thread"""
+    if LOGIN_LIMIT_BACKEND == "mongo":
+        return await asyncio.to_thread(check, account, ip)
+    return check(account, ip)
+
+
+def ensure_indexes() -> None:
+    if LOGIN_LIMIT_BACKEND == "mongo":
+        from database.connection import get_collection
+        get_collection("login_attempts").create_index("expires_at", expireAfterSeconds=0)
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "enabled": LOGIN_LIMIT_ENABLED,
+            "backend": LOGIN_LIMIT_BACKEND,
+            "backend_ok": _backend_ok,
+            "window_seconds": LOGIN_LIMIT_WINDOW_SECONDS,
+            "per_account": LOGIN_LIMIT_PER_ACCOUNT,
+            "per_ip": LOGIN_LIMIT_PER_IP,
+            "keys": len(_counters),
+            **_stats,
+        }
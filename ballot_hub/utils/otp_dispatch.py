@@ -0,0 +1,129 @@
+"""
+Background delivery of OTP emails.
+Sending an OTP opens an SMTP connection, negotiates TLS and logs in, which
+takes seconds. Login step 1 now stores the OTP, hands the email to this
+queue and answers straight away; OTP_DISPATCH_WORKERS threads do the sending.
+The queue is bounded (OTP_DISPATCH_MAX_QUEUE) so an SMTP outage cannot pile
+up unbounded work; when it is full, submit() raises DispatchQueueFull.
+
+Each send gets an unguessable delivery id whose status (queued, sending,
+sent, failed) the login page can poll. The code itself is dropped from
+memory as soon as the send finishes.
+"""
+import queue
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from config import OTP_DISPATCH_WORKERS, OTP_DISPATCH_MAX_QUEUE, OTP_DISPATCH_RETRIES, OTP_DISPATCH_STATUS_MAX
+from utils.latency import sample_window, percentile_ms
+
+
+class DispatchQueueFull(Exception):
+    """Raised when the OTP send queue is full"""
+
+
+class _Delivery:
+    __slots__ = ("delivery_id", "user_id", "email", "otp", "user_name", "status", "attempts",
+                 "queued_at", "finished_at")
+
+    def __init__(self, user_id: str, email: str, otp: str, user_name: str):
+        self.delivery_id = secrets.token_urlsafe(16)
+        self.user_id = user_id
+        self.email = email
+        self.otp: Optional[str] = otp
+        self.user_name = user_name
+        self.status = "queued"
+        self.attempts = 0
+        self.queued_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+
+class OtpDispatcher:
+    def __init__(self, workers: int = OTP_DISPATCH_WORKERS, max_queue: int = OTP_DISPATCH_MAX_QUEUE):
+        self.workers = max(1, workers)
+        self._queue: "queue.Queue[_Delivery]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        # delivery_id -> delivery, oldest first
+        self._deliveries: "OrderedDict[str, _Delivery]" = OrderedDict()
+        self._sending = 0
+        self._counts = {"submitted": 0, "sent": 0, "failed": 0, "rejected": 0}
+        self._wait_seconds = sample_window()
+        self._delivery_seconds = sample_window()
+
+    def _start_workers(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"otp-dispatch-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, user_id: str, email: str, otp: str, user_name: str = "User") -> str:
+        """Queue an OTP email; returns the delivery id"""
+        delivery = _Delivery(user_id, email, otp, user_name)
+        with self._lock:
+            if not self._threads:
+                self._start_workers()
+            try:
+                self._queue.put_nowait(delivery)
+            except queue.Full:
+                self._counts["rejected"] += 1
+                raise DispatchQueueFull("OTP send queue is full")
+            self._counts["submitted"] += 1
+            self._deliveries[delivery.delivery_id] = delivery
+            while len(self._deliveries) > OTP_DISPATCH_STATUS_MAX:
+                self._deliveries.popitem(last=False)
+        return delivery.delivery_id
+
+    def _run(self) -> None:
+        from utils.email_service import send_otp_email
+        while True:
+            delivery = self._queue.get()
+            with self._lock:
+                delivery.status = "sending"
+                self._sending += 1
+                self._wait_seconds.append(time.monotonic() - delivery.queued_at)
+            sent = False
+            while not sent and delivery.attempts <= OTP_DISPATCH_RETRIES:
+                delivery.attempts += 1
+                try:
+                    sent = send_otp_email(delivery.email, delivery.otp, delivery.user_name)
+                except Exception as e:
+                    print(f"❌ OTP email to {delivery.email} failed (attempt {delivery.attempts}): {e}")
+            with self._lock:
+                delivery.otp = None
+                delivery.status = "sent" if sent else "failed"
+                delivery.finished_at = time.monotonic()
+                self._sending -= 1
+                self._counts["sent" if sent else "failed"] += 1
+                self._delivery_seconds.append(delivery.finished_at - delivery.queued_at)
+            self._queue.task_done()
+
+    def status(self, delivery_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a delivery, or None if unknown (or not this user's)"""
+        with self._lock:
+            delivery = self._deliveries.get(delivery_id)
+            if delivery is None or delivery.user_id != user_id:
+                return None
+            result = {"delivery_id": delivery_id, "status": delivery.status, "attempts": delivery.attempts}
+            if delivery.finished_at is not None:
+                result["delivered_in_ms"] = round((delivery.finished_at - delivery.queued_at) * 1000, 1)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self._queue.maxsize,
+                "queue_depth": self._queue.qsize(),
+                "sending": self._sending,
+                **self._counts,
+                "queue_wait_ms_p50": percentile_ms(self._wait_seconds, 0.5),
+                "queue_wait_ms_p99": percentile_ms(self._wait_seconds, 0.99),
+                "delivery_ms_p50": percentile_ms(self._delivery_seconds, 0.5),
+                "delivery_ms_p99": percentile_ms(self._delivery_seconds, 0.99),
+            }
+
+
+otp_dispatcher = OtpDispatcher()
@@ -5,6 +5,7 @@ import secrets
 import hashlib
 from datetime import datetime, timedelta
 from database.connection import get_collection
+from utils.otp_store import get_otp_store
 from config import JWT_SECRET_KEY
 
 
@@ -247,36 +248,36 @@ def _send_via_console(phone: str, otp: str) -> bool:
     return True
 
 
-def store_otp(user_id: str, identifier: str, otp: str, expires_in_minutes: int = 5) -> bool:
+def _expires_at(expires_in_minutes: int) -> datetime:
+    return datetime.utcnow() + timedelta(minutes=expires_in_minutes)
+
+
+def ensure_otp_indexes() -> None:
     """
-    Store OTP in database with expiration
+    Compound index for the verify_otp lookup (equality fields, then the
+    newest-first sort, then the expiry range) and a TTL index so MongoDB
+    deletes OTPs once expires_at passes. Using or invalidating an OTP moves
+    its expires_at to now, so those go too.
     """
-    from bson import ObjectId
     otps = get_collection("otps")
-    
-    # Hash the OTP before storing
-    otp_hash = hash_otp(otp)
-    
-    # Calculate expiration time
-    expires_at = datetime.utcnow() + timedelta(minutes=expires_in_minutes)
-    
-    # Convert user_id to ObjectId if it's a string
-    if isinstance(user_id, str):
-        try:
-            user_id = ObjectId(user_id)
-        except:
-            pass
-    
-    # Store OTP (identifier can be phone or email)
-    otps.insert_one({
-        "user_id": user_id,
-        "identifier": identifier,  # Store email or phone for reference
-        "otp_hash": otp_hash,
-        "expires_at": expires_at,
-        "used": False,
-        "created_at": datetime.utcnow()
-    })
-    
+    if "user_id_1_otp_hash_1_used_1_expires_at_1" in otps.index_information():
+        # Lookups no longer filter on otp_hash (misses are counted per OTP)
+        otps.drop_index("user_id_1_otp_hash_1_used_1_expires_at_1")
+    otps.create_index([("user_id", 1), ("used", 1), ("created_at", -1), ("expires_at", 1)])
+    otps.create_index("expires_at", expireAfterSeconds=0)
+
+
+def store_otp(user_id: str, identifier: str, otp: str, expires_in_minutes: int = 5) -> bool:
+    """
+    Store OTP (hashed) in the configured OTP backend with expiration
+    """
+    get_otp_store().store(str(user_id), identifier, hash_otp(otp), _expires_at(expires_in_minutes))
+    return True
+
+
+async def store_otp_async(user_id: str, identifier: str, otp: str, expires_in_minutes: int = 5) -> bool:
+    """store_otp for the async serving mode"""
+    await get_otp_store().store_async(str(user_id), identifier, hash_otp(otp), _expires_at(expires_in_minutes))
     return True
 
 
@@ -285,44 +286,19 @@ def verify_otp(user_id: str, otp: str) -> bool:
     Verify OTP for a user
     Returns True if OTP is valid and not expired
     """
-    from bson import ObjectId
-    otps = get_collection("otps")
-    
-    # Hash the provided OTP
-    otp_hash = hash_otp(otp)
-    
-    # Convert user_id to ObjectId if it's a string
-    user_id_obj = user_id
-    if isinstance(user_id, str):
-        try:
-            user_id_obj = ObjectId(user_id)
-        except:
-            pass
-    
-    # Find matching OTP
-    otp_record = otps.find_one({
-        "user_id": user_id_obj,
-        "otp_hash": otp_hash,
-        "used": False,
-        "expires_at": {"$gt": datetime.utcnow()}
-    })
-    
-    if not otp_record:
-        return False
-    
-    # Mark OTP as used
-    otps.update_one(
-        {"_id": otp_record["_id"]},
-        {"$set": {"used": True}}
-    )
-    
-    return True
+    return get_otp_store().verify(str(user_id), hash_otp(otp))
+
+
+async def verify_otp_async(user_id: str, otp: str) -> bool:
+    """verify_otp for the async serving mode"""
+    return await get_otp_store().verify_async(str(user_id), hash_otp(otp))
 
 
 def cleanup_expired_otps():
     """
     Clean up expired OTPs from database
-    Call this periodically (e.g., via cron job or scheduled task)
+    The TTL index from ensure_otp_indexes normally does this; call it to
+    purge immediately (the TTL monitor runs about once a minute)
     """
     otps = get_collection("otps")
     result = otps.delete_many({
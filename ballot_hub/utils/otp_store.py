@@ -0,0 +1,271 @@
+"""
+Where outstanding OTPs are kept (OTP_BACKEND).
+
+"mongo"   The otps collection: shared by every worker, lookups use the
+          compound index and the TTL index purges expired/used OTPs.
+"memory"  A dict in this process with expiry driven by a hierarchical
+          timing wheel. No database round trips at all, but an OTP is only
+          visible to the worker that issued it, so use it only when a single
+          process serves logins (or behind sticky sessions).
+
+Both store SHA-256 hashes of the codes (utils.otp_service.hash_otp), never
+the codes themselves. Verification checks the user's newest outstanding OTP
+and consumes it on a match; each miss counts against it, and after
+OTP_MAX_ATTEMPTS misses it is invalidated, so guessing gets a handful of
+tries per OTP rather than the whole code space.
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from config import OTP_BACKEND, OTP_MAX_ATTEMPTS
+
+
+def _user_oid(user_id: str):
+    # Stored as ObjectId when the id is one
+    try:
+        return ObjectId(user_id)
+    except (InvalidId, TypeError):
+        return user_id
+
+
+class OtpStore(ABC):
+    """Backend interface; user_id is the string form of the user's id"""
+
+    @abstractmethod
+    def store(self, user_id: str, identifier: str, otp_hash: str, expires_at: datetime) -> None:
+        """Keep a new OTP until expires_at"""
+
+    @abstractmethod
+    def verify(self, user_id: str, otp_hash: str) -> bool:
+        """True (and the OTP is consumed) if an unused, unexpired OTP matches"""
+
+    async def store_async(self, user_id: str, identifier: str, otp_hash: str, expires_at: datetime) -> None:
+        self.store(user_id, identifier, otp_hash, expires_at)
+
+    async def verify_async(self, user_id: str, otp_hash: str) -> bool:
+        return self.verify(user_id, otp_hash)
+
+
+class MongoOtpStore(OtpStore):
+    @staticmethod
+    def _doc(user_id: str, identifier: str, otp_hash: str, expires_at: datetime) -> Dict[str, Any]:
+        # Identifier can be phone or email
+        return {
+            "user_id": _user_oid(user_id),
+            "identifier": identifier,  # Store email or phone for reference
+            "otp_hash": otp_hash,
+            "expires_at": expires_at,
+            "used": False,
+            "created_at": datetime.utcnow()
+        }
+
+    @staticmethod
+    def match(user_id: str) -> Dict[str, Any]:
+        """Filter for the user's outstanding (unused, unexpired) OTPs"""
+        return {
+            "user_id": _user_oid(user_id),
+            "used": False,
+            "expires_at": {"$gt": datetime.utcnow()}
+        }
+
+    @staticmethod
+    def _attempt(otp_hash: str) -> List[Dict[str, Any]]:
+        """
+        Update pipeline for one verification attempt. A match marks the OTP
+        used; a miss counts a failed attempt and marks it used once
+        OTP_MAX_ATTEMPTS is reached. Used OTPs expire now (TTL purge).
+        """
+        matches = {"$eq": ["$otp_hash", otp_hash]}
+        failures = {"$add": [{"$ifNull": ["$attempts", 0]}, 1]}
+        used = {"$or": [matches, {"$gte": [failures, OTP_MAX_ATTEMPTS]}]}
+        return [{"$set": {
+            "attempts": {"$cond": [matches, {"$ifNull": ["$attempts", 0]}, failures]},
+            "used": used,
+            "expires_at": {"$cond": [used, "$$NOW", "$expires_at"]},
+        }}]
+
+    # The newest outstanding OTP is the one being verified; _id breaks
+    # ties between OTPs issued within the same millisecond
+    NEWEST_FIRST = [("created_at", -1), ("_id", -1)]
+
+    def store(self, user_id: str, identifier: str, otp_hash: str, expires_at: datetime) -> None:
+        from database.connection import get_collection
+        get_collection("otps").insert_one(self._doc(user_id, identifier, otp_hash, expires_at))
+
+    async def store_async(self, user_id: str, identifier: str, otp_hash: str, expires_at: datetime) -> None:
+        from database.async_connection import get_async_collection
+        await get_async_collection("otps").insert_one(self._doc(user_id, identifier, otp_hash, expires_at))
+
+    def verify(self, user_id: str, otp_hash: str) -> bool:
+        from database.connection import get_collection
+        # Check and consume in one atomic round trip, so two concurrent
+        # submissions of the same code cannot both succeed
+        otp_record = get_collection("otps").find_one_and_update(
+            self.match(user_id), self._attempt(otp_hash), sort=self.NEWEST_FIRST, projection={"otp_hash": 1}
+        )
+        return otp_record is not None and otp_record["otp_hash"] == otp_hash
+
+    async def verify_async(self, user_id: str, otp_hash: str) -> bool:
+        from database.async_connection import get_async_collection
+        otp_record = await get_async_collection("otps").find_one_and_update(
+            self.match(user_id), self._attempt(otp_hash), sort=self.NEWEST_FIRST, projection={"otp_hash": 1}
+        )
+        return otp_record is not None and otp_record["otp_hash"] == otp_hash
+
+
+class TimingWheel:
+    """
+    Two-level hierarchical timing wheel with an overflow list.
+    Level 0 has one slot per tick for the current page of SLOTS ticks; level 1
+    has one slot per page for the next SLOTS pages. When a page starts, its
+    level-1 slot is cascaded down into level 0, and every SLOTS pages the
+    overflow list is redistributed. Scheduling and expiring are O(1) per
+    entry; advancing costs one slot per tick regardless of how many entries
+    are pending.
+    """
+    SLOTS = 64
+
+    def __init__(self, tick_seconds: float = 1.0):
+        self.tick_seconds = tick_seconds
+        self._tick = int(time.monotonic() / tick_seconds)
+        self._level0: List[List[Tuple[int, Any]]] = [[] for _ in range(self.SLOTS)]
+        self._level1: List[List[Tuple[int, Any]]] = [[] for _ in range(self.SLOTS)]
+        self._overflow: List[Tuple[int, Any]] = []
+
+    def schedule(self, deadline: float, item: Any) -> None:
+        """Expire item once the monotonic clock passes deadline"""
+        self._place(max(self._tick + 1, int(deadline / self.tick_seconds) + 1), item)
+
+    def _place(self, due: int, item: Any) -> None:
+        pages_ahead = due // self.SLOTS - self._tick // self.SLOTS
+        if pages_ahead == 0:
+            self._level0[due % self.SLOTS].append((due, item))
+        elif pages_ahead < self.SLOTS:
+            self._level1[(due // self.SLOTS) % self.SLOTS].append((due, item))
+        else:
+            self._overflow.append((due, item))
+
+    def advance(self, now: float) -> List[Any]:
+        """Move the wheel to now; returns the items that expired"""
+        expired = []
+        target = int(now / self.tick_seconds)
+        while self._tick < target:
+            self._tick += 1
+            if self._tick % self.SLOTS == 0:
+                page = self._tick // self.SLOTS
+                if page % self.SLOTS == 0:
+                    overflow, self._overflow = self._overflow, []
+                    for due, item in overflow:
+                        self._place(due, item)
+                cascade, self._level1[page % self.SLOTS] = self._level1[page % self.SLOTS], []
+                for due, item in cascade:
+                    self._place(due, item)
+            slot = self._tick % self.SLOTS
+            expired.extend(item for _, item in self._level0[slot])
+            self._level0[slot] = []
+        return expired
+
+
+class _Otp:
+    __slots__ = ("user_id", "otp_hash", "deadline", "attempts")
+
+    def __init__(self, user_id: str, otp_hash: str, deadline: float):
+        self.user_id = user_id
+        self.otp_hash = otp_hash
+        self.deadline = deadline
+        self.attempts = 0
+
+
+class MemoryOtpStore(OtpStore):
+    TICK_SECONDS = 1.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # user_id -> outstanding OTPs, oldest first
+        self._otps: Dict[str, List[_Otp]] = {}
+        self._wheel = TimingWheel(self.TICK_SECONDS)
+        self._count = 0
+        self._expired = 0
+        self._invalidated = 0
+        self._ticker: Optional[threading.Thread] = None
+
+    def _start_ticker(self) -> None:
+        # Expire entries even while no logins arrive
+        def _run():
+            while True:
+                time.sleep(self.TICK_SECONDS)
+                with self._lock:
+                    self._advance(time.monotonic())
+
+        self._ticker = threading.Thread(target=_run, name="otp-timing-wheel", daemon=True)
+        self._ticker.start()
+
+    def _remove(self, entry: _Otp) -> bool:
+        user_otps = self._otps.get(entry.user_id)
+        # Already consumed or invalidated
+        if user_otps is None or entry not in user_otps:
+            return False
+        user_otps.remove(entry)
+        if not user_otps:
+            del self._otps[entry.user_id]
+        self._count -= 1
+        return True
+
+    def _advance(self, now: float) -> None:
+        for entry in self._wheel.advance(now):
+            if self._remove(entry):
+                self._expired += 1
+
+    def store(self, user_id: str, identifier: str, otp_hash: str, expires_at: datetime) -> None:
+        now = time.monotonic()
+        entry = _Otp(user_id, otp_hash, now + (expires_at - datetime.utcnow()).total_seconds())
+        with self._lock:
+            if self._ticker is None:
+                self._start_ticker()
+            self._advance(now)
+            self._otps.setdefault(user_id, []).append(entry)
+            self._count += 1
+            self._wheel.schedule(entry.deadline, entry)
+
+    def verify(self, user_id: str, otp_hash: str) -> bool:
+        """Same rules as the MongoDB backend: newest outstanding OTP, OTP_MAX_ATTEMPTS tries"""
+        now = time.monotonic()
+        with self._lock:
+            self._advance(now)
+            # The wheel expires on whole ticks; the deadline itself is exact
+            live = [entry for entry in self._otps.get(user_id, ()) if entry.deadline > now]
+            if not live:
+                return False
+            entry = live[-1]
+            if entry.otp_hash == otp_hash:
+                self._remove(entry)
+                return True
+            entry.attempts += 1
+            if entry.attempts >= OTP_MAX_ATTEMPTS:
+                self._remove(entry)
+                self._invalidated += 1
+            return False
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "outstanding": self._count, "users": len(self._otps),
+                "expired": self._expired, "invalidated": self._invalidated,
+            }
+
+
+_store: Optional[OtpStore] = None
+_store_lock = threading.Lock()
+
+
+def get_otp_store() -> OtpStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MemoryOtpStore() if OTP_BACKEND == "memory" else MongoOtpStore()
+    return _store
@@ -0,0 +1,13 @@
+"""
+Error responses shared by the user, async user and admin login controllers.
+Each is a Flask/Quart (body, status, headers) tuple.
+"""
+from typing import Any, Dict, Tuple
+
+# Body, status and headers when the hashing pool's queue is full
+HASHING_BUSY_RESPONSE = ({"error": "Too many sign-ins in progress. Please retry shortly."}, 503, {"Retry-After": "1"})
+
+
+def login_limited_response(retry_after: int) -> Tuple[Dict[str, Any], int, Dict[str, str]]:
+    """429 for a login throttled by utils.login_limiter"""
+    return {"error": "Too many login attempts. Please try again later."}, 429, {"Retry-After": str(retry_after)}
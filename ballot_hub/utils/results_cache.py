@@ -0,0 +1,94 @@
+"""
+Versioned cache for election results.
+record_vote bumps a per-election version; a cached result is fresh while its
+version matches and it is younger than RESULTS_CACHE_TTL_SECONDS. Stale
+results are served while a single background recompute runs
+(stale-while-revalidate); only a cold or badly stale entry makes readers
+wait, and then all concurrent readers share one recompute.
+Versions are per process, so the TTL bounds staleness across workers.
+"""
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import RESULTS_CACHE_TTL_SECONDS, RESULTS_CACHE_MAX_STALE_SECONDS
+
+Results = List[Dict[str, Any]]
+
+
+class _Entry:
+    __slots__ = ("version", "results", "etag", "computed_at")
+
+    def __init__(self, version: int, results: Results):
+        self.version = version
+        self.results = results
+        self.etag = hashlib.sha1(json.dumps(results, sort_keys=True).encode("utf-8")).hexdigest()[:20]
+        self.computed_at = time.monotonic()
+
+
+_lock = threading.Lock()
+_versions: Dict[str, int] = {}
+_entries: Dict[str, _Entry] = {}
+# election_id -> Event set when the in-flight recompute finishes
+_inflight: Dict[str, threading.Event] = {}
+
+
+def bump_results_version(election_id: str) -> None:
+    """Mark cached results for an election as outdated"""
+    with _lock:
+        _versions[election_id] = _versions.get(election_id, 0) + 1
+
+
+def invalidate_results(election_id: str) -> None:
+    with _lock:
+        _versions.pop(election_id, None)
+        _entries.pop(election_id, None)
+
+
+def _recompute(election_id: str, compute: Callable[[str], Results], done: threading.Event) -> None:
+    try:
+        with _lock:
+            version = _versions.get(election_id, 0)
+        results = compute(election_id)
+        with _lock:
+            _entries[election_id] = _Entry(version, results)
+    finally:
+        with _lock:
+            _inflight.pop(election_id, None)
+        done.set()
+
+
+def get_cached_results(election_id: str, compute: Callable[[str], Results]) -> Tuple[Results, str]:
+    """
+    Return (results, etag) for an election, recomputing at most once at a time.
+    The etag is an unquoted content hash, so identical results share it across workers.
+    """
+    while True:
+        with _lock:
+            entry: Optional[_Entry] = _entries.get(election_id)
+            version = _versions.get(election_id, 0)
+            if entry is not None:
+                age = time.monotonic() - entry.computed_at
+                if entry.version == version and age < RESULTS_CACHE_TTL_SECONDS:
+                    return entry.results, entry.etag
+            done = _inflight.get(election_id)
+            owner = done is None
+            if owner:
+                done = threading.Event()
+                _inflight[election_id] = done
+            if entry is not None and age < RESULTS_CACHE_MAX_STALE_SECONDS:
+                # Stale-while-revalidate: serve what we have, refresh in the background
+                if owner:
+                    threading.Thread(target=_recompute, args=(election_id, compute, done), daemon=True).start()
+                return entry.results, entry.etag
+
+        if owner:
+            _recompute(election_id, compute, done)
+        else:
+            done.wait()
+        with _lock:
+            entry = _entries.get(election_id)
+        if entry is not None:
+            return entry.results, entry.etag
+        # The shared recompute failed; retry (the next caller becomes the owner)
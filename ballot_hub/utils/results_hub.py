@@ -0,0 +1,165 @@
+"""
+In-process fan-out hub for live election results.
+One upstream watcher per election feeds every subscribed admin stream, so
+N dashboards cost one tally read per tick instead of N. The watcher wakes
+on MongoDB change streams over `tallies` when the server is a replica set,
+and falls back to a low-frequency poller otherwise. A failing watcher backs
+off exponentially (up to RESULTS_WATCHER_MAX_BACKOFF_SECONDS) and retries
+for as long as it has subscribers.
+"""
+import queue
+import threading
+from typing import Any, Dict, List, Optional, Set
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+from database.connection import get_client, get_collection
+from config import RESULTS_POLL_INTERVAL_SECONDS, RESULTS_WATCHER_MAX_BACKOFF_SECONDS
+
+
+def _supports_change_streams() -> bool:
+    try:
+        hello = get_client().admin.command("hello")
+    except Exception:
+        # Unknown server capabilities: polling works everywhere
+        return False
+    return bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+
+
+def _diff(previous: List[Dict[str, Any]], current: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    before = {r["candidate_id"]: r for r in previous}
+    changes = []
+    for r in current:
+        old = before.pop(r["candidate_id"], None)
+        delta = r["total_votes"] - (old["total_votes"] if old else 0)
+        if delta or old is None:
+            changes.append({
+                "candidate_id": r["candidate_id"],
+                "candidate_name": r["candidate_name"],
+                "total_votes": r["total_votes"],
+                "delta": delta,
+            })
+    # Whatever is left was deleted since the last read
+    for r in before.values():
+        changes.append({
+            "candidate_id": r["candidate_id"],
+            "candidate_name": r["candidate_name"],
+            "total_votes": 0,
+            "delta": -r["total_votes"],
+            "removed": True,
+        })
+    return changes
+
+
+class _ElectionWatcher:
+    def __init__(self, hub: "ResultsHub", election_id: str):
+        self.hub = hub
+        self.election_id = election_id
+        self.subscribers: Set[queue.Queue] = set()
+        self.results: Optional[List[Dict[str, Any]]] = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"results-{election_id}", daemon=True)
+
+    def _refresh(self) -> None:
+        from models.votes_model import count_votes
+        results = count_votes(self.election_id)
+        with self.hub.lock:
+            previous = self.results
+            self.results = results
+            if previous is None:
+                # First read: subscribers that joined before it are waiting for a snapshot
+                snapshot = {"type": "snapshot", "election_id": self.election_id, "results": results}
+                for q in self.subscribers:
+                    q.put(snapshot)
+                return
+            changes = _diff(previous, results)
+            if not changes:
+                return
+            event = {
+                "type": "delta",
+                "election_id": self.election_id,
+                "changes": changes,
+                "total_votes": sum(r["total_votes"] for r in results),
+            }
+            for q in self.subscribers:
+                q.put(event)
+
+    def _run(self) -> None:
+        use_change_stream = _supports_change_streams()
+        backoff = RESULTS_POLL_INTERVAL_SECONDS
+        while not self.stopped.is_set():
+            try:
+                if use_change_stream:
+                    self._watch_changes()
+                else:
+                    self._refresh()
+                    self.stopped.wait(RESULTS_POLL_INTERVAL_SECONDS)
+                backoff = RESULTS_POLL_INTERVAL_SECONDS
+            except Exception as e:
+                # Any failure (not just driver errors) must not kill the thread, or
+                # its subscribers would hang on an empty queue forever
+                level = "⚠️ " if isinstance(e, PyMongoError) else "❌"
+                print(f"{level} Results watcher for {self.election_id} failed, retrying in {backoff:g}s: {e}")
+                self.stopped.wait(backoff)
+                backoff = min(backoff * 2, RESULTS_WATCHER_MAX_BACKOFF_SECONDS)
+
+    def _watch_changes(self) -> None:
+        tallies = get_collection("tallies")
+        pipeline = [{"$match": {"fullDocument.election_id": ObjectId(self.election_id)}}]
+        wait_ms = int(RESULTS_POLL_INTERVAL_SECONDS * 1000)
+        with tallies.watch(pipeline, full_document="updateLookup", max_await_time_ms=wait_ms) as stream:
+            self._refresh()
+            while not self.stopped.is_set() and stream.alive:
+                if stream.try_next() is None:
+                    continue
+                # Drain whatever else is ready so a burst of votes costs one read
+                while stream.try_next() is not None:
+                    pass
+                self._refresh()
+
+
+class ResultsHub:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._watchers: Dict[str, _ElectionWatcher] = {}
+
+    def subscribe(self, election_id: str) -> queue.Queue:
+        """Register a subscriber; the first event on the queue is a full snapshot"""
+        q: queue.Queue = queue.Queue()
+        with self.lock:
+            watcher = self._watchers.get(election_id)
+            if watcher is None:
+                watcher = _ElectionWatcher(self, election_id)
+                self._watchers[election_id] = watcher
+                watcher.thread.start()
+            watcher.subscribers.add(q)
+            # Otherwise the watcher's first read delivers the snapshot
+            if watcher.results is not None:
+                q.put({"type": "snapshot", "election_id": election_id, "results": watcher.results})
+        return q
+
+    def unsubscribe(self, election_id: str, q: queue.Queue) -> None:
+        with self.lock:
+            watcher = self._watchers.get(election_id)
+            if watcher is None:
+                return
+            watcher.subscribers.discard(q)
+            if not watcher.subscribers:
+                watcher.stopped.set()
+                del self._watchers[election_id]
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {eid: len(w.subscribers) for eid, w in self._watchers.items()}
+
+
+_hub: Optional[ResultsHub] = None
+_hub_lock = threading.Lock()
+
+
+def get_results_hub() -> ResultsHub:
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = ResultsHub()
+    return _hub
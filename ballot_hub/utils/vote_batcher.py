@@ -0,0 +1,118 @@
+"""
+Group commit for vote ingestion.
+Concurrent record_vote callers hand their vote document to a shared batcher
+and block until the batch containing it has been acknowledged by MongoDB.
+Each batch is a single unordered insert_many; per-document duplicate-key
+errors are mapped back to the caller that submitted that document.
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from pymongo.errors import BulkWriteError, PyMongoError
+from database.connection import get_collection
+from config import VOTE_BATCH_MAX_DELAY_MS, VOTE_BATCH_MAX_SIZE
+
+DUPLICATE_KEY_CODE = 11000
+
+
+class _PendingVote:
+    __slots__ = ("doc", "done", "inserted", "error")
+
+    def __init__(self, doc: Dict[str, Any]):
+        self.doc = doc
+        self.done = threading.Event()
+        self.inserted = False
+        self.error: Optional[Exception] = None
+
+
+class VoteBatcher:
+    def __init__(self, max_delay_ms: int = VOTE_BATCH_MAX_DELAY_MS, max_size: int = VOTE_BATCH_MAX_SIZE):
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_size = max(1, max_size)
+        self._pending: List[_PendingVote] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, doc: Dict[str, Any]) -> bool:
+        """
+        Queue a vote and wait for its batch to be acknowledged.
+        Returns False if the (user_id, election_id) index rejected it as a duplicate.
+        """
+        pending = _PendingVote(doc)
+        with self._cond:
+            self._ensure_started()
+            self._pending.append(pending)
+            self._cond.notify()
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.inserted
+
+    def _ensure_started(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="vote-batcher", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # Hold the batch open until it is full or the oldest vote has waited max_delay
+                deadline = time.monotonic() + self.max_delay
+                while len(self._pending) < self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_size]
+                del self._pending[:self.max_size]
+            self._flush(batch)
+
+    def _flush(self, batch: List[_PendingVote]) -> None:
+        from models.tally_model import increment_tallies
+        votes = get_collection("votes")
+        try:
+            try:
+                votes.insert_many([p.doc for p in batch], ordered=False)
+                for p in batch:
+                    p.inserted = True
+            except BulkWriteError as e:
+                details = e.details or {}
+                if details.get("writeConcernErrors"):
+                    raise
+                failed = {err["index"]: err for err in details.get("writeErrors", [])}
+                for index, p in enumerate(batch):
+                    err = failed.get(index)
+                    if err is None:
+                        p.inserted = True
+                    elif err.get("code") != DUPLICATE_KEY_CODE:
+                        p.error = PyMongoError(err.get("errmsg", "Vote insert failed"))
+        except Exception as e:
+            # Not acknowledged: every caller in the batch sees the failure
+            for p in batch:
+                p.inserted = False
+                p.error = e
+
+        inserted = [p.doc for p in batch if p.inserted]
+        if inserted:
+            try:
+                increment_tallies(inserted)
+            except Exception as e:
+                print(f"⚠️  Tally update failed for batch of {len(inserted)} vote(s): {e}")
+
+        for p in batch:
+            p.done.set()
+
+
+_batcher: Optional[VoteBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_vote_batcher() -> VoteBatcher:
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = VoteBatcher()
+    return _batcher
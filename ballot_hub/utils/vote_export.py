@@ -0,0 +1,102 @@
+"""
+Streaming audit export of an election's raw votes.
+Votes are read through a batched, projected cursor and encoded one row at a
+time as NDJSON or CSV, optionally gzipped on the fly, so memory stays flat
+regardless of how many votes the election has.
+"""
+import csv
+import io
+import json
+import zlib
+from typing import Any, Dict, Iterable, Iterator
+from bson import ObjectId
+from database.connection import get_collection
+from config import EXPORT_BATCH_SIZE
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_FIELDS = ["vote_id", "user_id", "candidate_id", "election_id", "timestamp"]
+
+# Emit compressed output in chunks of roughly this many bytes
+_CHUNK_BYTES = 64 * 1024
+
+
+def iter_votes(election_oid: ObjectId, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    votes = get_collection("votes")
+    cursor = votes.find(
+        {"election_id": election_oid},
+        {"user_id": 1, "candidate_id": 1, "election_id": 1, "timestamp": 1},
+        batch_size=batch_size,
+    )
+    try:
+        for doc in cursor:
+            timestamp = doc.get("timestamp")
+            yield {
+                "vote_id": str(doc["_id"]),
+                "user_id": str(doc.get("user_id", "")),
+                "candidate_id": str(doc.get("candidate_id", "")),
+                "election_id": str(doc.get("election_id", "")),
+                "timestamp": timestamp.isoformat() if timestamp else "",
+            }
+    finally:
+        cursor.close()
+
+
+def _ndjson_lines(records: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    for record in records:
+        yield (json.dumps(record) + "\n").encode("utf-8")
+
+
+def _csv_lines(records: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for record in records:
+        writer.writerow(record)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, for an election without votes
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _chunked(lines: Iterable[bytes]) -> Iterator[bytes]:
+    """Coalesce small rows into larger chunks for the response"""
+    pending = []
+    size = 0
+    for line in lines:
+        pending.append(line)
+        size += len(line)
+        if size >= _CHUNK_BYTES:
+            yield b"".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b"".join(pending)
+
+
+def _gzipped(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_votes(election_id: str, fmt: str = "ndjson", gzip: bool = False) -> Iterator[bytes]:
+    """Yield the encoded export for an election as byte chunks"""
+    from bson.errors import InvalidId
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Invalid format: {fmt}. Must be one of {', '.join(EXPORT_FORMATS)}")
+    try:
+        election_oid = ObjectId(election_id)
+    except (InvalidId, ValueError):
+        raise ValueError(f"Invalid election_id: {election_id}")
+
+    encode = _ndjson_lines if fmt == "ndjson" else _csv_lines
+    chunks = _chunked(encode(iter_votes(election_oid)))
+    return _gzipped(chunks) if gzip else chunks
+
+
+def export_filename(election_id: str, fmt: str, gzip: bool) -> str:
+    return f"votes_{election_id}.{fmt}" + (".gz" if gzip else "")
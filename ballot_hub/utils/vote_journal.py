@@ -0,0 +1,429 @@
+"""
+Local write-ahead journal for votes.
+Each worker appends votes to its own preallocated, memory-mapped segment file
+and flushes the written pages before acknowledging, so a vote survives a
+process crash even while MongoDB is stalled. A background drainer replays
+journaled votes into MongoDB with unordered insert_many and records how far
+it got in the segment header.
+
+Repeat votes: before journaling, append() rejects a vote if this worker still
+holds an undrained vote by the same user in the same election, or if the
+votes collection already has one (a point read on the unique index, bounded
+by VOTE_JOURNAL_CHECK_TIMEOUT_MS). Only when MongoDB does not answer in time,
+or two workers journal the same voter within one drain interval, can a
+repeat still be acknowledged; the drainer then drops it against the unique
+index and the first vote stands.
+
+Replay is idempotent: every vote gets its ObjectId when it is journaled, so
+a replayed vote is a duplicate-key error on _id. Votes are inserted with an
+`untallied` flag that is removed in the same step that applies their tally
+increments, and the segment is only marked drained after that. A worker that
+crashes in between leaves votes that are in MongoDB but still flagged; replay
+finds them by _id and applies their tallies then. (In the eventual
+TALLY_WRITE_MODE the increment and the flag removal are two writes, so a
+crash exactly between them counts those votes twice; reconcile_tallies
+repairs that. In transactional mode they commit together.)
+
+Finalizing: each worker publishes the elections its journal still holds
+votes for in `vote_journal_backlog`, refreshed at least every
+VOTE_JOURNAL_HEARTBEAT_SECONDS. wait_for_backlog() lets the finalize job wait
+for those votes before counting; entries not refreshed for three heartbeats
+belong to dead workers and are ignored.
+
+Segment layout:
+    header  8 bytes magic + 8 bytes little-endian drained offset
+    records 4 bytes length + 4 bytes crc32 + BSON vote document
+A zero length marks the end of written data; a record with a bad crc is a
+torn write from a crash and ends recovery of that segment.
+"""
+import glob
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+import bson
+import pymongo
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, PyMongoError
+from database.connection import get_client, get_collection
+from utils import voted_filter
+from config import (
+    VOTE_JOURNAL_DIR, VOTE_JOURNAL_SEGMENT_BYTES, VOTE_JOURNAL_DRAIN_INTERVAL_MS, VOTE_JOURNAL_DRAIN_BATCH,
+    VOTE_JOURNAL_CHECK_TIMEOUT_MS, VOTE_JOURNAL_HEARTBEAT_SECONDS, TALLY_WRITE_MODE
+)
+
+MAGIC = b"BHWAL1\x00\x00"
+HEADER = struct.Struct("<8sQ")
+RECORD = struct.Struct("<II")
+DUPLICATE_KEY_CODE = 11000
+# Set on journaled votes until their tally increments have been applied
+UNTALLIED = "untallied"
+BACKLOG_COLLECTION = "vote_journal_backlog"
+BACKLOG_POLL_SECONDS = 0.2
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+try:
+    import fcntl
+
+    def _try_lock(fd: int) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+except ImportError:  # Windows
+    import msvcrt
+
+    def _try_lock(fd: int) -> bool:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+
+class Segment:
+    """One preallocated journal file, locked by the worker that owns it"""
+
+    def __init__(self, path: str, size: int, create: bool):
+        self.path = path
+        flags = os.O_RDWR | (os.O_CREAT | os.O_EXCL if create else 0)
+        self.fd = os.open(path, flags | getattr(os, "O_BINARY", 0), 0o600)
+        if not _try_lock(self.fd):
+            os.close(self.fd)
+            raise BlockingIOError(f"Journal segment {path} is owned by a live worker")
+        if create:
+            os.ftruncate(self.fd, size)
+        self.size = os.fstat(self.fd).st_size
+        self.mm = mmap.mmap(self.fd, self.size)
+        if create:
+            self.mm[:HEADER.size] = HEADER.pack(MAGIC, HEADER.size)
+            self._sync(0, HEADER.size)
+        magic, self.drained = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Not a vote journal segment: {path}")
+        self.write_offset = self._scan_end(self.drained)
+        self.sealed = not create
+
+    def _scan_end(self, offset: int) -> int:
+        """Offset just past the last intact record"""
+        while offset + RECORD.size <= self.size:
+            length, crc = RECORD.unpack_from(self.mm, offset)
+            end = offset + RECORD.size + length
+            if length == 0 or end > self.size or zlib.crc32(self.mm[offset + RECORD.size:end]) != crc:
+                break
+            offset = end
+        return offset
+
+    def _sync(self, start: int, end: int) -> None:
+        aligned = start - start % mmap.ALLOCATIONGRANULARITY
+        self.mm.flush(aligned, end - aligned)
+
+    def append(self, payload: bytes) -> bool:
+        """Write and flush one record; False if the segment is full"""
+        end = self.write_offset + RECORD.size + len(payload)
+        if end > self.size:
+            return False
+        start = self.write_offset
+        self.mm[start + RECORD.size:end] = payload
+        RECORD.pack_into(self.mm, start, len(payload), zlib.crc32(payload))
+        self._sync(start, end)
+        self.write_offset = end
+        return True
+
+    def read(self, start: int, end: int, limit: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Decode up to limit records in [start, end); returns (docs, next offset)"""
+        docs = []
+        offset = start
+        while offset < end and len(docs) < limit:
+            length, _ = RECORD.unpack_from(self.mm, offset)
+            body_start = offset + RECORD.size
+            docs.append(bson.decode(self.mm[body_start:body_start + length]))
+            offset = body_start + length
+        return docs, offset
+
+    def mark_drained(self, offset: int) -> None:
+        HEADER.pack_into(self.mm, 0, MAGIC, offset)
+        self._sync(0, HEADER.size)
+        self.drained = offset
+
+    def close(self) -> None:
+        try:
+            self.mm.close()
+        finally:
+            os.close(self.fd)
+
+    def remove(self) -> None:
+        self.close()
+        os.remove(self.path)
+
+
+class VoteJournal:
+    def __init__(self, directory: str = VOTE_JOURNAL_DIR, segment_bytes: int = VOTE_JOURNAL_SEGMENT_BYTES,
+                 drain: bool = True):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._seq = 0
+        # (user_id, election_id) journaled but not yet drained
+        self._pending: Set[Tuple[ObjectId, ObjectId]] = set()
+        self._repeats_dropped = 0
+        self._unchecked = 0
+        self._published: Optional[List[ObjectId]] = None
+        self._published_at = 0.0
+        self._segments: List[Segment] = self._recover()
+        self._active = self._new_segment()
+        self._segments.append(self._active)
+        self._thread: Optional[threading.Thread] = None
+        if drain:
+            self._thread = threading.Thread(target=self._drain_loop, name="vote-journal", daemon=True)
+            self._thread.start()
+
+    def _recover(self) -> List[Segment]:
+        """Claim segments left behind by crashed workers (their lock is free)"""
+        recovered = []
+        for path in sorted(glob.glob(os.path.join(self.directory, "votes-*.wal"))):
+            try:
+                segment = Segment(path, 0, create=False)
+            except (BlockingIOError, ValueError, OSError):
+                continue
+            if segment.write_offset > segment.drained:
+                print(f"ℹ️  Recovering {segment.write_offset - segment.drained} bytes of journaled votes from {path}")
+                docs, _ = segment.read(segment.drained, segment.write_offset, segment.size)
+                self._pending.update((doc["user_id"], doc["election_id"]) for doc in docs)
+            recovered.append(segment)
+        return recovered
+
+    def _new_segment(self) -> Segment:
+        self._seq += 1
+        name = f"votes-{os.getpid()}-{int(time.time() * 1000)}-{self._seq}.wal"
+        return Segment(os.path.join(self.directory, name), self.segment_bytes, create=True)
+
+    def _voted_in_db(self, user_oid: ObjectId, election_oid: ObjectId) -> bool:
+        """Point read on the unique (user_id, election_id) index; False if MongoDB does not answer in time"""
+        try:
+            with pymongo.timeout(VOTE_JOURNAL_CHECK_TIMEOUT_MS / 1000.0):
+                votes = get_collection("votes")
+                return votes.find_one({"user_id": user_oid, "election_id": election_oid}, {"_id": 1}) is not None
+        except (PyMongoError, ConnectionError):
+            with self._lock:
+                self._unchecked += 1
+            return False
+
+    def append(self, vote_doc: Dict[str, Any]) -> bool:
+        """
+        Journal a vote. Returns False if the user already has a vote in the
+        election, undrained in this worker's journal or in MongoDB.
+        """
+        vote_doc.setdefault("_id", ObjectId())
+        vote_doc[UNTALLIED] = True
+        key = (vote_doc["user_id"], vote_doc["election_id"])
+        payload = bson.encode(vote_doc)
+        if RECORD.size + len(payload) > self.segment_bytes - HEADER.size:
+            raise ValueError("Vote record larger than a journal segment")
+        with self._lock:
+            if key in self._pending:
+                return False
+        if self._voted_in_db(*key):
+            return False
+        with self._lock:
+            # Checked again: the same voter may have been journaled during the lookup
+            if key in self._pending:
+                return False
+            if not self._active.append(payload):
+                self._active.sealed = True
+                self._active = self._new_segment()
+                self._segments.append(self._active)
+                self._active.append(payload)
+            self._pending.add(key)
+        self._wake.set()
+        return True
+
+    def has_pending(self, election_oid: ObjectId) -> bool:
+        """True while this worker's journal holds undrained votes for the election"""
+        with self._lock:
+            return any(election == election_oid for _, election in self._pending)
+
+    def _drain_loop(self) -> None:
+        interval = VOTE_JOURNAL_DRAIN_INTERVAL_MS / 1000.0
+        while not self._stop.is_set():
+            self._wake.wait(interval)
+            self._wake.clear()
+            try:
+                # Published before draining too, in case inserts stall while other writes still work
+                self._publish_backlog()
+                while self._drain_once():
+                    pass
+                self._publish_backlog()
+            except PyMongoError as e:
+                # MongoDB is unavailable or slow: keep votes journaled and retry
+                print(f"⚠️  Vote journal drain failed, will retry: {e}")
+                time.sleep(min(1.0, interval * 10))
+            except Exception as e:
+                print(f"❌ Vote journal drainer error: {e}")
+                time.sleep(1.0)
+
+    def _drain_once(self) -> bool:
+        """Replay one batch; returns True if there may be more to drain"""
+        with self._lock:
+            segments = list(self._segments)
+        for segment in segments:
+            with self._lock:
+                end = segment.write_offset
+                sealed = segment.sealed
+            if segment.drained >= end:
+                if sealed:
+                    with self._lock:
+                        self._segments.remove(segment)
+                    segment.remove()
+                continue
+            docs, offset = segment.read(segment.drained, end, VOTE_JOURNAL_DRAIN_BATCH)
+            to_tally = self._replay(docs)
+            # Raises on failure, leaving the batch to be replayed (and tallied) again
+            self._apply_tallies(to_tally)
+            voted_filter.report_late_votes(to_tally)
+            segment.mark_drained(offset)
+            with self._lock:
+                for doc in docs:
+                    self._pending.discard((doc["user_id"], doc["election_id"]))
+            self._after_insert(to_tally)
+            return True
+        return False
+
+    def _replay(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        insert_many that treats duplicate keys as already applied. Returns the
+        votes whose tallies still need applying: those inserted now, plus
+        those an earlier drain inserted but did not get to tally.
+        """
+        votes = get_collection("votes")
+        try:
+            votes.insert_many(docs, ordered=False)
+            return docs
+        except BulkWriteError as e:
+            details = e.details or {}
+            errors = details.get("writeErrors", [])
+            if details.get("writeConcernErrors") or any(err.get("code") != DUPLICATE_KEY_CODE for err in errors):
+                raise
+            failed = {err["index"] for err in errors}
+        duplicates = [doc for i, doc in enumerate(docs) if i in failed]
+        stored = {
+            doc["_id"]: doc.get(UNTALLIED, False)
+            for doc in votes.find({"_id": {"$in": [d["_id"] for d in duplicates]}}, {UNTALLIED: 1})
+        }
+        # No vote with this _id: the user's earlier vote holds the unique index
+        repeats = [doc for doc in duplicates if doc["_id"] not in stored]
+        if repeats:
+            with self._lock:
+                self._repeats_dropped += len(repeats)
+            print(f"⚠️  Dropped {len(repeats)} repeat vote(s) from the journal")
+        return [doc for i, doc in enumerate(docs) if i not in failed or stored.get(doc["_id"])]
+
+    @staticmethod
+    def _apply_tallies(docs: List[Dict[str, Any]]) -> None:
+        """Apply the votes' tally increments and clear their untallied flag"""
+        from models.tally_model import increment_tallies
+        if not docs:
+            return
+        votes = get_collection("votes")
+        ids = [doc["_id"] for doc in docs]
+        if TALLY_WRITE_MODE == "transactional":
+            def _txn(session):
+                increment_tallies(docs, session=session)
+                votes.update_many({"_id": {"$in": ids}}, {"$unset": {UNTALLIED: ""}}, session=session)
+
+            with get_client().start_session() as session:
+                session.with_transaction(_txn)
+            return
+        increment_tallies(docs)
+        votes.update_many({"_id": {"$in": ids}}, {"$unset": {UNTALLIED: ""}})
+
+    @staticmethod
+    def _after_insert(inserted: List[Dict[str, Any]]) -> None:
+        from models.votes_model import on_vote_recorded
+        for doc in inserted:
+            try:
+                on_vote_recorded(doc)
+            except Exception as e:
+                print(f"⚠️  Post-vote update failed for journaled vote {doc.get('_id')}: {e}")
+
+    def _publish_backlog(self) -> None:
+        """Record which elections this worker still holds journaled votes for, if changed or due"""
+        with self._lock:
+            elections = sorted({election for _, election in self._pending})
+        now = time.monotonic()
+        if elections == self._published and now - self._published_at < VOTE_JOURNAL_HEARTBEAT_SECONDS:
+            return
+        get_collection(BACKLOG_COLLECTION).update_one(
+            {"_id": _OWNER},
+            {"$set": {"elections": elections, "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+        self._published, self._published_at = elections, now
+
+    def close(self) -> None:
+        """Stop the drainer and release the segments (undrained votes stay on disk)"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+            self._segments = []
+
+    def backlog(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "pending_votes": len(self._pending),
+                "pending_bytes": sum(s.write_offset - s.drained for s in self._segments),
+                "repeats_dropped": self._repeats_dropped,
+                "unchecked_appends": self._unchecked,
+            }
+
+
+_journal: Optional[VoteJournal] = None
+_journal_lock = threading.Lock()
+
+
+def get_vote_journal() -> VoteJournal:
+    global _journal
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                _journal = VoteJournal()
+    return _journal
+
+
+def _backlogged(election_oid: ObjectId) -> bool:
+    if _journal is not None and _journal.has_pending(election_oid):
+        return True
+    live_since = datetime.utcnow() - timedelta(seconds=3 * VOTE_JOURNAL_HEARTBEAT_SECONDS)
+    return get_collection(BACKLOG_COLLECTION).find_one(
+        {"_id": {"$ne": _OWNER}, "elections": election_oid, "updated_at": {"$gt": live_since}}, {"_id": 1}
+    ) is not None
+
+
+def wait_for_backlog(election_oid: ObjectId, timeout: float) -> bool:
+    """
+    Wait until no live worker's journal holds undrained votes for the
+    election. Returns False if some still do after timeout seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while _backlogged(election_oid):
+        if time.monotonic() >= deadline:
+            return False
+        if _journal is not None:
+            _journal._wake.set()
+        time.sleep(BACKLOG_POLL_SECONDS)
+    return True
@@ -0,0 +1,92 @@
+"""
+Per-user cache of "has voted" flags.
+The ballot page needs the voted flag for every active election. The first
+request loads all unknown flags for a user with one indexed $in query on
+votes (user_id, election_id); later requests are answered from memory.
+record_vote marks the election as voted for that user as soon as the vote is
+acknowledged, so a user's own vote is never reported as missing by the worker
+that took it. VOTED_CACHE_TTL_SECONDS bounds staleness for votes taken by
+other worker processes.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Set, Tuple
+from config import VOTED_CACHE_TTL_SECONDS, VOTED_CACHE_MAX_USERS
+
+
+class _Entry:
+    __slots__ = ("expires_at", "checked", "voted")
+
+    def __init__(self):
+        self.expires_at = time.monotonic() + VOTED_CACHE_TTL_SECONDS
+        self.checked: Set[str] = set()
+        self.voted: Set[str] = set()
+
+
+_lock = threading.Lock()
+# user_id -> entry, least recently used first
+_entries: "OrderedDict[str, _Entry]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _entry(user_id: str, now: float) -> _Entry:
+    entry = _entries.get(user_id)
+    if entry is None or entry.expires_at <= now:
+        entry = _Entry()
+        _entries[user_id] = entry
+    _entries.move_to_end(user_id)
+    while len(_entries) > VOTED_CACHE_MAX_USERS:
+        _entries.popitem(last=False)
+    return entry
+
+
+def _missing(user_id: str, election_ids: List[str]) -> Tuple[_Entry, List[str]]:
+    with _lock:
+        entry = _entry(user_id, time.monotonic())
+        missing = [eid for eid in election_ids if eid not in entry.checked]
+        _stats["hits" if not missing else "misses"] += 1
+    return entry, missing
+
+
+def _fill(entry: _Entry, election_ids: List[str], missing: List[str], voted: Set[str]) -> Dict[str, bool]:
+    with _lock:
+        entry.checked.update(missing)
+        entry.voted.update(voted)
+        return {eid: eid in entry.voted for eid in election_ids}
+
+
+def get_vote_status(user_id: str, election_ids: Iterable[str],
+                    load: Callable[[str, List[str]], Set[str]]) -> Dict[str, bool]:
+    """
+    Voted flag per election. load(user_id, election_ids) is called once with
+    only the ids not already cached and returns the ids the user voted in.
+    """
+    election_ids = list(dict.fromkeys(election_ids))
+    entry, missing = _missing(user_id, election_ids)
+    return _fill(entry, election_ids, missing, load(user_id, missing) if missing else set())
+
+
+async def get_vote_status_async(user_id: str, election_ids: Iterable[str],
+                                load: Callable[[str, List[str]], Awaitable[Set[str]]]) -> Dict[str, bool]:
+    """get_vote_status with an awaitable loader (async serving mode)"""
+    election_ids = list(dict.fromkeys(election_ids))
+    entry, missing = _missing(user_id, election_ids)
+    return _fill(entry, election_ids, missing, await load(user_id, missing) if missing else set())
+
+
+def mark_voted(user_id: str, election_id: str) -> None:
+    with _lock:
+        entry = _entry(user_id, time.monotonic())
+        entry.checked.add(election_id)
+        entry.voted.add(election_id)
+
+
+def forget_user(user_id: str) -> None:
+    with _lock:
+        _entries.pop(user_id, None)
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        return {"users": len(_entries), **_stats}
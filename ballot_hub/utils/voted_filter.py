@@ -0,0 +1,286 @@
+"""
+Per-election Bloom filters of the users who have voted.
+Most "has this user voted?" lookups during an election are for users who
+have not, and each one is an index probe on votes that finds nothing. A
+negative from the filter is answered without touching MongoDB; a positive
+(which may be false at VOTED_FILTER_FP_RATE) still goes to the database.
+
+Filters are built in the background from the votes collection, at startup
+for active elections and on first use for others, and every vote acknowledged
+by this process is added immediately. Votes taken by other worker processes
+are picked up every VOTED_FILTER_REFRESH_SECONDS by an incremental catch-up
+that scans only votes whose _id is newer than the previous scan. A filter is
+rebuilt from scratch only when it outgrows the capacity it was sized for.
+A vote's _id is assigned when it is journaled (utils.vote_journal), so one
+replayed long after that is older than the overlap a catch-up scans back;
+the drainer reports such votes in `late_votes` and every worker's next
+catch-up for that election scans back to the oldest one reported.
+Voters added by this process are kept until a scan has seen their vote in
+the collection, so a vote still waiting in the journal is never lost from
+the filter by a rebuild. The filter only answers the "has voted" display;
+the unique (user_id, election_id) index still decides whether a vote is
+accepted.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from bson import ObjectId
+from database.connection import get_collection
+from config import (
+    VOTED_FILTER_ENABLED, VOTED_FILTER_FP_RATE, VOTED_FILTER_MAX_BYTES,
+    VOTED_FILTER_REFRESH_SECONDS, VOTED_FILTER_CATCHUP_OVERLAP_SECONDS, EXPORT_BATCH_SIZE
+)
+
+MIN_CAPACITY = 1024
+# election_id -> oldest late vote reported and a counter bumped with each report
+LATE_VOTES_COLLECTION = "late_votes"
+
+
+class BloomFilter:
+    """Bit array with k probe positions derived from one blake2b digest (double hashing)"""
+
+    def __init__(self, capacity: int, fp_rate: float, max_bytes: int):
+        capacity = max(1, capacity)
+        wanted_bits = math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))
+        nbytes = max(64, min(math.ceil(wanted_bits / 8), max_bytes))
+        self.capacity = capacity
+        self.bits = nbytes * 8
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.array = bytearray(nbytes)
+        self.count = 0
+
+    def _positions(self, key: bytes) -> List[int]:
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key: bytes) -> None:
+        positions = self._positions(key)
+        # Catch-up scans overlap, so only count keys that were not already present
+        if not all(self.array[pos >> 3] & (1 << (pos & 7)) for pos in positions):
+            self.count += 1
+        for pos in positions:
+            self.array[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(self.array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def estimated_fp_rate(self) -> float:
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+
+class _Entry:
+    __slots__ = ("bloom", "scanned_from", "late_seq", "refreshed_at")
+
+    def __init__(self, bloom: BloomFilter, scanned_from: datetime, late_seq: int):
+        self.bloom = bloom
+        # Wall-clock start of the last scan; the next one reads votes from here on
+        self.scanned_from = scanned_from
+        # Late-vote reports already covered by a scan
+        self.late_seq = late_seq
+        self.refreshed_at = time.monotonic()
+
+
+_lock = threading.Lock()
+_filters: Dict[str, _Entry] = {}
+# Elections with a build or catch-up in progress
+_refreshing: Set[str] = set()
+# election_id -> voters added by this process that no scan has seen in the votes collection yet
+_local: Dict[str, Set[bytes]] = {}
+_stats = {"negatives": 0, "positives": 0, "unfiltered": 0, "false_positives": 0, "rebuilds": 0, "catchups": 0}
+
+
+def _new_filter(election_oid: ObjectId) -> BloomFilter:
+    eligible = get_collection("users").count_documents({"status": "approved"})
+    existing = get_collection("votes").count_documents({"election_id": election_oid})
+    return BloomFilter(max(MIN_CAPACITY, eligible, existing * 2), VOTED_FILTER_FP_RATE, VOTED_FILTER_MAX_BYTES)
+
+
+def _scan(election_oid: ObjectId, since: Optional[datetime], bloom: BloomFilter, local: Set[bytes]) -> None:
+    """Add the voters of votes newer than since (all votes if None) to bloom"""
+    query: Dict[str, Any] = {"election_id": election_oid}
+    if since is not None:
+        overlap = timedelta(seconds=VOTED_FILTER_CATCHUP_OVERLAP_SECONDS)
+        query["_id"] = {"$gte": ObjectId.from_datetime(since - overlap)}
+    cursor = get_collection("votes").find(query, {"_id": 0, "user_id": 1}, batch_size=EXPORT_BATCH_SIZE)
+    batch = []
+    for doc in cursor:
+        batch.append(doc["user_id"].binary)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            _add_scanned(batch, bloom, local)
+            batch = []
+    _add_scanned(batch, bloom, local)
+
+
+def _add_scanned(keys: List[bytes], bloom: BloomFilter, local: Set[bytes]) -> None:
+    # Under the lock: bloom may be the live filter that requests are reading
+    with _lock:
+        for key in keys:
+            bloom.add(key)
+            local.discard(key)
+
+
+def _refresh(election_id: str) -> None:
+    """Catch an election's filter up with new votes, or build it if missing or full"""
+    try:
+        election_oid = ObjectId(election_id)
+        with _lock:
+            entry = _filters.get(election_id)
+            local = _local.setdefault(election_id, set())
+        started = datetime.utcnow()
+        late = get_collection(LATE_VOTES_COLLECTION).find_one({"_id": election_oid}) or {}
+        late_seq = late.get("seq", 0)
+        if entry is not None and entry.bloom.count <= entry.bloom.capacity:
+            since = entry.scanned_from
+            if late_seq != entry.late_seq:
+                since = min(since, late["oldest"])
+            _scan(election_oid, since, entry.bloom, local)
+            with _lock:
+                entry.scanned_from = started
+                entry.late_seq = late_seq
+                entry.refreshed_at = time.monotonic()
+                _stats["catchups"] += 1
+            return
+        bloom = _new_filter(election_oid)
+        _scan(election_oid, None, bloom, local)
+        with _lock:
+            # Local votes the scan has not seen (e.g. still journaled) carry over
+            for key in local:
+                bloom.add(key)
+            _filters[election_id] = _Entry(bloom, started, late_seq)
+            _stats["rebuilds"] += 1
+    except Exception as e:
+        print(f"⚠️  Voted filter refresh failed for election {election_id}: {e}")
+    finally:
+        with _lock:
+            _refreshing.discard(election_id)
+
+
+def _schedule_refresh(election_id: str) -> None:
+    """Start a background refresh unless one is already running; caller holds _lock"""
+    if election_id in _refreshing:
+        return
+    _refreshing.add(election_id)
+    threading.Thread(target=_refresh, args=(election_id,), name="voted-filter", daemon=True).start()
+
+
+def _lookup(election_id: str) -> Optional[BloomFilter]:
+    """Current filter for an election (caller holds _lock); stale or missing ones are refreshed"""
+    entry = _filters.get(election_id)
+    if entry is None or time.monotonic() - entry.refreshed_at > VOTED_FILTER_REFRESH_SECONDS:
+        _schedule_refresh(election_id)
+    return entry.bloom if entry is not None else None
+
+
+def maybe_voted(user_oid: ObjectId, election_ids: Iterable[str]) -> Tuple[List[str], Set[str]]:
+    """
+    (elections the user may have voted in, the subset the filter reported
+    positive); the rest definitely have no vote. Elections without a filter
+    yet are in the first list only.
+    """
+    election_ids = list(election_ids)
+    if not VOTED_FILTER_ENABLED:
+        return election_ids, set()
+    key = user_oid.binary
+    result = []
+    positives = set()
+    with _lock:
+        for election_id in election_ids:
+            bloom = _lookup(election_id)
+            if bloom is None:
+                _stats["unfiltered"] += 1
+                result.append(election_id)
+            elif key in bloom:
+                _stats["positives"] += 1
+                result.append(election_id)
+                positives.add(election_id)
+            else:
+                _stats["negatives"] += 1
+    return result, positives
+
+
+def record_false_positives(count: int) -> None:
+    """Report filter positives that the database lookup did not confirm"""
+    if count > 0:
+        with _lock:
+            _stats["false_positives"] += count
+
+
+def add(user_oid: ObjectId, election_id: str) -> None:
+    if not VOTED_FILTER_ENABLED:
+        return
+    key = user_oid.binary
+    with _lock:
+        entry = _filters.get(election_id)
+        if entry is not None:
+            entry.bloom.add(key)
+        _local.setdefault(election_id, set()).add(key)
+
+
+def report_late_votes(vote_docs: List[Dict[str, Any]]) -> None:
+    """
+    Record elections that just got votes whose _id is older than a catch-up
+    scan reaches back (replayed from a vote journal), so the next catch-up in
+    every worker scans back far enough to see them.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=VOTED_FILTER_CATCHUP_OVERLAP_SECONDS / 2)
+    oldest: Dict[ObjectId, datetime] = {}
+    for doc in vote_docs:
+        created = doc["_id"].generation_time.replace(tzinfo=None)
+        if created < cutoff:
+            election_oid = doc["election_id"]
+            oldest[election_oid] = min(created, oldest.get(election_oid, created))
+    late = get_collection(LATE_VOTES_COLLECTION)
+    for election_oid, created in oldest.items():
+        late.update_one({"_id": election_oid}, {"$min": {"oldest": created}, "$inc": {"seq": 1}}, upsert=True)
+
+
+def forget_election(election_id: str) -> None:
+    with _lock:
+        _filters.pop(election_id, None)
+        _local.pop(election_id, None)
+    get_collection(LATE_VOTES_COLLECTION).delete_one({"_id": ObjectId(election_id)})
+
+
+def warm_filters() -> None:
+    """Build filters for the currently active elections in the background"""
+    if not VOTED_FILTER_ENABLED:
+        return
+    from utils import catalog
+    try:
+        election_ids = [str(doc["_id"]) for doc in catalog.get_active_elections()]
+    except Exception as e:
+        print(f"⚠️  Could not load active elections for voted filters: {e}")
+        return
+    with _lock:
+        for election_id in election_ids:
+            _schedule_refresh(election_id)
+
+
+def stats() -> Dict[str, Any]:
+    now = time.monotonic()
+    with _lock:
+        elections = {
+            election_id: {
+                "voters": entry.bloom.count,
+                "capacity": entry.bloom.capacity,
+                "bytes": len(entry.bloom.array),
+                "hashes": entry.bloom.hashes,
+                "estimated_fp_rate": round(entry.bloom.estimated_fp_rate(), 6),
+                "age_seconds": round(now - entry.refreshed_at, 1),
+            }
+            for election_id, entry in _filters.items()
+        }
+        return {
+            "enabled": VOTED_FILTER_ENABLED,
+            "target_fp_rate": VOTED_FILTER_FP_RATE,
+            "max_bytes_per_election": VOTED_FILTER_MAX_BYTES,
+            "total_bytes": sum(e["bytes"] for e in elections.values()),
+            "unconfirmed_local_voters": sum(len(keys) for keys in _local.values()),
+            **_stats,
+            "elections": elections,
+        }
@@ -47,6 +47,7 @@ def fix_registration_issue():
         test_user = {
             "name": "Test User",
             "email": test_email,
+            "email_key": test_email.strip().lower(),  # normalized key the app looks users up by
             "password": "hashed_password_here",
             "status": "test"
         }
@@ -56,6 +56,7 @@ def reset_auth_system():
         admin_user = {
             "name": "Admin User",
             "email": admin_email,
+            "email_key": admin_email.strip().lower(),  # normalized key the app looks users up by
             "password": hashed_password,
             "status": "approved",
             "is_admin": True,
@@ -75,6 +76,7 @@ def reset_auth_system():
         regular_user = {
             "name": "Test User",
             "email": user_email,
+            "email_key": user_email.strip().lower(),  # normalized key the app looks users up by
             "password": hashed_user_pw,
             "status": "approved",
             "is_admin": False,